@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+#########################################################
+# Name: probe_benchmark.py
+# Porpose: compare the ffprobe and PyAV probing backends
+# Compatibility: Python3
+# Author: Gianluca Pernigoto <jeanlucperni@gmail.com>
+# Copyright: (c) 2020 Gianluca Pernigoto <jeanlucperni@gmail.com>
+# license: GPL3
+# Rev: December.10.2020
+#########################################################
+
+# This file is part of Videomass.
+
+#    Videomass is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+
+#    Videomass is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+
+#    You should have received a copy of the GNU General Public License
+#    along with Videomass.  If not, see <http://www.gnu.org/licenses/>.
+
+#########################################################
+"""
+Probe the same corpus of media files with the two backends of the
+file list (ffprobe subprocesses and PyAV in-process) on a pool of
+threads, as the ProbeFiles thread does, and print the timings and
+the records that do not match. The probe cache is not used, e.g.
+
+    python3 develop/tools/probe_benchmark.py ~/Videos --limit 1000
+
+"""
+import os
+import sys
+import time
+import argparse
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+
+this = os.path.realpath(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(this))))
+
+from videomass3.vdms_threads.ffprobe_parser import FFProbe
+from videomass3.vdms_io.media_record import MediaRecord
+from videomass3.vdms_io import av_probe
+from videomass3.vdms_utils.utils import scan_files
+
+EXTENSIONS = {'3gp', 'aac', 'ac3', 'aiff', 'avi', 'flac', 'flv', 'm4a',
+              'm4v', 'mka', 'mkv', 'mov', 'mp3', 'mp4', 'mpg', 'mts', 'ogg',
+              'opus', 'ts', 'vob', 'wav', 'webm', 'wmv'}
+
+
+def ffprobe_record(ffprobe, filename):
+    """
+    The subprocess backend, as IO_tools.probeRecord without cache
+    """
+    data = FFProbe(ffprobe, filename, parse=False, pretty=False,
+                   entries=MediaRecord.ENTRIES, show_format=False,
+                   show_streams=False, writer='json')
+    if data.ERROR():
+        return None
+    return MediaRecord.from_json(data.custom_output())
+
+
+def av_record(filename):
+    """
+    The in-process backend
+    """
+    try:
+        return MediaRecord.from_dict(av_probe.probe_dict(filename))
+    except av_probe.AV_ERRORS:
+        return None
+
+
+def run(name, probe, files, workers):
+    """
+    Probe all the files, print and return the records
+    """
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        records = list(pool.map(probe, files))
+    elapsed = time.perf_counter() - start
+    errors = len([x for x in records if x is None])
+    print('%-8s %6d files  %8.2f s  %8.1f files/s  %7.1f ms/file  '
+          '%d errors' % (name, len(files), elapsed, len(files) / elapsed,
+                         elapsed * 1000 / len(files), errors))
+    return records
+
+
+def main():
+    """
+    Parse the command line and run the benchmark
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('corpus', help='directory of the media files')
+    parser.add_argument('--limit', type=int, default=1000,
+                        help='max number of files (default 1000)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help='threads of the pool (default: cpus)')
+    parser.add_argument('--ffprobe', default='ffprobe',
+                        help='ffprobe executable (default: ffprobe)')
+    args = parser.parse_args()
+
+    files = list(islice(scan_files(args.corpus, EXTENSIONS), args.limit))
+    if not files:
+        sys.exit('No media files found in %s' % args.corpus)
+    if not av_probe.available():
+        sys.exit('PyAV is not installed (pip install av)')
+
+    probes = run('ffprobe', lambda x: ffprobe_record(args.ffprobe, x),
+                 files, args.workers)
+    avs = run('PyAV', av_record, files, args.workers)
+
+    for name, one, two in zip(files, probes, avs):
+        if one is None or two is None:
+            continue
+        if (abs(one.duration - two.duration) > 0.05 or
+                len(one.streams) != len(two.streams) or
+                one.media_type != two.media_type):
+            print('MISMATCH %s\n  ffprobe: %r\n  PyAV:    %r' % (name, one,
+                                                                two))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+#########################################################
+# Name: sampled_benchmark.py
+# Porpose: compare the sampled and the full audio analysis
+# Compatibility: Python3
+# Author: Gianluca Pernigoto <jeanlucperni@gmail.com>
+# Copyright: (c) 2020 Gianluca Pernigoto <jeanlucperni@gmail.com>
+# license: GPL3
+# Rev: December.10.2020
+#########################################################
+
+# This file is part of Videomass.
+
+#    Videomass is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+
+#    Videomass is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+
+#    You should have received a copy of the GNU General Public License
+#    along with Videomass.  If not, see <http://www.gnu.org/licenses/>.
+
+#########################################################
+"""
+Analyze the same media files with the full and the sampled audio
+analysis of the VolumeDetectThread and print the timings and the
+differences of the estimated levels, with the confidence bound of
+each sampled estimate. The analysis cache is not used, e.g.
+
+    python3 develop/tools/sampled_benchmark.py ~/Recordings --windows 12
+
+"""
+import os
+import sys
+import time
+import tempfile
+import argparse
+from itertools import islice
+
+this = os.path.realpath(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(this))))
+
+from videomass3.vdms_threads.ffprobe_parser import FFProbe
+from videomass3.vdms_threads.volumedetect import (VolumeDetectThread,
+                                                  sample_windows)
+from videomass3.vdms_io.media_record import MediaRecord
+from videomass3.vdms_utils.utils import scan_files
+
+EXTENSIONS = {'aac', 'ac3', 'avi', 'flac', 'flv', 'm4a', 'mka', 'mkv',
+              'mov', 'mp3', 'mp4', 'mpg', 'mts', 'ogg', 'opus', 'ts',
+              'wav', 'webm', 'wmv'}
+
+
+def duration(ffprobe, filename):
+    """
+    Return the duration of a file in seconds (0 if not available)
+    """
+    data = FFProbe(ffprobe, filename, parse=False, pretty=False,
+                   entries=MediaRecord.ENTRIES, show_format=False,
+                   show_streams=False, writer='json')
+    if data.ERROR():
+        return 0
+    return MediaRecord.from_json(data.custom_output()).duration
+
+
+def analyze(name, args, files, windows):
+    """
+    Analyze all the files, print and return the records
+    """
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory() as logdir:
+        thread = VolumeDetectThread('', files, args.map, logdir,
+                                    args.ffmpeg, workers=args.workers,
+                                    windows=windows)
+        thread.join()
+    elapsed = time.perf_counter() - start
+    if thread.status:
+        print('%s errors:\n%s' % (name, thread.status))
+    print('%-8s %5d files  %9.2f s' % (name, len(files), elapsed))
+    return thread.results
+
+
+def main():
+    """
+    Parse the command line and run the benchmark
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('corpus', help='directory of the media files')
+    parser.add_argument('--limit', type=int, default=20,
+                        help='max number of files (default 20)')
+    parser.add_argument('--windows', type=int,
+                        default=VolumeDetectThread.SAMPLES,
+                        help='sampled windows of each file (default %s)'
+                        % VolumeDetectThread.SAMPLES)
+    parser.add_argument('--length', type=float,
+                        default=VolumeDetectThread.WINDOW,
+                        help='seconds of each window (default %s)'
+                        % VolumeDetectThread.WINDOW)
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help='concurrent ffmpeg processes (default: cpus)')
+    parser.add_argument('--map', default='',
+                        help='audio stream map, e.g. "-map 0:1"')
+    parser.add_argument('--ffmpeg', default='ffmpeg',
+                        help='ffmpeg executable (default: ffmpeg)')
+    parser.add_argument('--ffprobe', default='ffprobe',
+                        help='ffprobe executable (default: ffprobe)')
+    args = parser.parse_args()
+
+    files = list(islice(scan_files(args.corpus, EXTENSIONS), args.limit))
+    if not files:
+        sys.exit('No media files found in %s' % args.corpus)
+    windows = [sample_windows('', duration(args.ffprobe, x), args.windows,
+                              args.length) for x in files]
+
+    full = analyze('full', args, files, None)
+    sampled = analyze('sampled', args, files, windows)
+
+    print('\n%-40s %8s %8s %8s %8s %s' % ('file', 'mean', 'max', 'I',
+                                          'bound', 'within'))
+    for name, one, two in zip(files, full, sampled):
+        if not one or not two or 'sampled' not in two:
+            continue  # no audio or too short to be sampled
+        diffs = [float(two[key]) - float(one[key])
+                 for key in ('mean_volume', 'max_volume')]
+        loudness = [x.get('ebur128', {}).get('I') for x in (one, two)]
+        diffs.append(float(loudness[1]) - float(loudness[0])
+                     if None not in loudness else float('nan'))
+        bound = float(two['sampled']['confidence'])
+        print('%-40s %+8.2f %+8.2f %+8.2f %8.2f %s' % (
+              os.path.basename(name)[-40:], diffs[0], diffs[1], diffs[2],
+              bound, 'yes' if abs(diffs[0]) <= bound else 'NO'))
+
+
+if __name__ == '__main__':
+    main()
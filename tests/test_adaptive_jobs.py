@@ -0,0 +1,74 @@
+# -*- coding: UTF-8 -*-
+
+# Porpose: Contains test cases for the adaptive_jobs.py object.
+# Rev: December.10.2020 *PEP8 compatible*
+
+import sys
+import os.path
+import unittest
+
+PATH = os.path.realpath(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(os.path.dirname(PATH)))
+
+try:
+    from videomass3.vdms_threads.adaptive_jobs import JobsController
+    from videomass3.vdms_threads.ffmpeg_runner import Progress
+except ImportError as error:
+    sys.exit(error)
+
+
+def progress(speed):
+    """Return a Progress record with the given speed"""
+    rec = Progress()
+    rec.speed = speed
+    return rec
+
+
+class TestJobsController(unittest.TestCase):
+    """Test case for the JobsController class."""
+
+    def setUp(self):
+        self.now = 0
+        self.load = 0.5
+        self.log = []
+        self.ctrl = JobsController(4, window=10, log=self.log.append,
+                                   load=lambda: self.load,
+                                   memory=lambda: 0.5,
+                                   clock=lambda: self.now)
+
+    def window(self, speeds):
+        """
+        Fill all the slots, sample the given speeds, then the
+        last one again at the end of the window.
+        """
+        while self.ctrl.running < self.ctrl.limit:
+            self.ctrl.acquire()
+        for job, speed in enumerate(speeds):
+            self.ctrl.sample(job, progress(speed))
+        self.now += 10
+        self.ctrl.sample(job, progress(speed))
+
+    def test_ramp_up_and_back(self):
+        self.assertEqual(self.ctrl.limit, 2)
+        self.window([1.0, 1.0])
+        self.assertEqual(self.ctrl.limit, 3)
+        self.window([1.0, 1.0, 1.0])  # gain: 3.0x > 2.0x
+        self.assertEqual(self.ctrl.limit, 4)
+        self.window([0.8, 0.8, 0.8, 0.7])  # no gain: 3.1x < 3.0x * 1.05
+        self.assertEqual(self.ctrl.limit, 3)
+        self.assertEqual(len(self.log), 3)
+        self.assertIn('3 -> 4', self.log[1])
+
+    def test_overload(self):
+        self.load = 2.0
+        self.window([1.0, 1.0])
+        self.assertEqual(self.ctrl.limit, 1)
+        self.assertIn('system overloaded', self.log[0])
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+# -*- coding: UTF-8 -*-
+
+# Porpose: Contains test cases for the analysis_cache.py object.
+# Rev: December.10.2020 *PEP8 compatible*
+
+import sys
+import os.path
+import tempfile
+import shutil
+import time
+import unittest
+
+PATH = os.path.realpath(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(os.path.dirname(PATH)))
+
+try:
+    from videomass3.vdms_io.analysis_cache import AnalysisCache
+except ImportError as error:
+    sys.exit(error)
+
+
+class TestAnalysisCache(unittest.TestCase):
+    """Test case for the AnalysisCache class."""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.cache = AnalysisCache(os.path.join(self.tmp, 'cache'),
+                                   maxrows=2)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_get_put(self):
+        opt = 'volumedetect -map 0:a:0'
+        self.assertIsNone(self.cache.get('fp1', '', opt))
+        self.cache.put('fp1', '', opt, ['-0.5 dB', '-20.1 dB'])
+        self.assertEqual(self.cache.get('fp1', '', opt),
+                         ['-0.5 dB', '-20.1 dB'])
+        self.assertEqual(self.cache.get('fp1', '', ' volumedetect  '
+                                        '-map 0:a:0'),
+                         ['-0.5 dB', '-20.1 dB'])
+        self.assertIsNone(self.cache.get('fp1', '-ss 00:00:10 -t 00:00:20',
+                                         opt))
+        self.assertIsNone(self.cache.get('fp1', '', 'volumedetect '
+                                         '-map 0:a:1'))
+        self.assertIsNone(self.cache.get('fp2', '', opt))
+
+    def test_no_fingerprint(self):
+        self.cache.put(None, '', 'volumedetect', ['-0.5 dB', '-20.1 dB'])
+        self.assertIsNone(self.cache.get(None, '', 'volumedetect'))
+
+    def test_evict(self):
+        for name in ('fp1', 'fp2'):
+            self.cache.put(name, '', 'loudnorm', {'input_i': '-23.0'})
+            time.sleep(0.01)
+        self.cache.get('fp1', '', 'loudnorm')  # now fp2 is the oldest
+        time.sleep(0.01)
+        self.cache.put('fp3', '', 'loudnorm', {'input_i': '-16.0'})
+        self.assertIsNone(self.cache.get('fp2', '', 'loudnorm'))
+        self.assertEqual(self.cache.get('fp1', '', 'loudnorm'),
+                         {'input_i': '-23.0'})
+        self.assertEqual(self.cache.get('fp3', '', 'loudnorm'),
+                         {'input_i': '-16.0'})
+
+
+if __name__ == '__main__':
+    unittest.main()
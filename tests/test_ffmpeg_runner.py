@@ -0,0 +1,80 @@
+# -*- coding: UTF-8 -*-
+
+# Porpose: Contains test cases for the ffmpeg_runner.py object.
+# Rev: December.10.2020 *PEP8 compatible*
+
+import sys
+import os.path
+import unittest
+
+PATH = os.path.realpath(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(os.path.dirname(PATH)))
+
+try:
+    from videomass3.vdms_threads.ffmpeg_runner import ProgressParser
+    from videomass3.vdms_threads.ffmpeg_runner import FFmpegRunner
+except ImportError as error:
+    sys.exit(error)
+
+
+class TestProgressParser(unittest.TestCase):
+    """Test case for the ProgressParser class."""
+
+    BLOCK = ['frame=1178\n',
+             'fps=155.20\n',
+             'stream_0_0_q=29.0\n',
+             'bitrate= 435.0kbits/s\n',
+             'total_size=2121728\n',
+             'out_time_us=39020000\n',
+             'out_time_ms=39020000\n',
+             'out_time=00:00:39.020000\n',
+             'dup_frames=0\n',
+             'drop_frames=0\n',
+             'speed=5.15x\n',
+             'progress=continue\n',
+             ]
+
+    def test_feed(self):
+        parser = ProgressParser()
+        records = [parser.feed(line) for line in TestProgressParser.BLOCK]
+        self.assertEqual(records[:-1], [None] * 11)
+        rec = records[-1]
+        self.assertEqual(rec.frame, 1178)
+        self.assertEqual(rec.fps, 155.2)
+        self.assertEqual(rec.bitrate, 435.0)
+        self.assertEqual(rec.total_size, 2121728)
+        self.assertEqual(rec.out_time_us, 39020000)
+        self.assertEqual(rec.seconds, 39.02)
+        self.assertEqual(rec.speed, 5.15)
+        self.assertEqual(rec.progress, 'continue')
+
+    def test_feed_not_available(self):
+        parser = ProgressParser()
+        for line in ('bitrate=N/A\n', 'total_size=N/A\n',
+                     'out_time=00:01:00.500000\n', 'speed=N/A\n'):
+            self.assertIsNone(parser.feed(line))
+        rec = parser.feed('progress=end\n')
+        self.assertIsNone(rec.bitrate)
+        self.assertIsNone(rec.total_size)
+        self.assertIsNone(rec.speed)
+        self.assertEqual(rec.seconds, 60.5)
+        self.assertEqual(rec.progress, 'end')
+
+
+class TestFFmpegRunner(unittest.TestCase):
+    """Test case for the FFmpegRunner command line."""
+
+    def test_cmd(self):
+        runner = FFmpegRunner('ffmpeg', '-loglevel warning -stats '
+                              '-hide_banner -i "in.mkv" -y "out-stats.mp4"')
+        self.assertEqual(runner.cmd, 'ffmpeg -progress pipe:1 -nostats '
+                         '-loglevel warning -hide_banner -i "in.mkv" '
+                         '-y "out-stats.mp4"')
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
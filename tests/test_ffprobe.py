@@ -5,6 +5,7 @@
 
 import sys
 import os.path
+import json
 import unittest
 
 if sys.version_info[0] != 3:
@@ -15,7 +16,9 @@ PATH = os.path.realpath(os.path.abspath(__file__))
 sys.path.insert(0, os.path.dirname(os.path.dirname(PATH)))
 
 try:
-    from videomass3.vdms_threads.ffprobe_parser import FFProbe
+    from videomass3.vdms_threads.ffprobe_parser import (FFProbe,
+                                                        iter_sections,
+                                                        with_filename)
 except ImportError as error:
     sys.exit(error)
 
@@ -63,6 +66,56 @@ class FFprobeTestCase(unittest.TestCase):
             self.assertTrue(self.data.data_format())
 
 
+class IterSectionsTestCase(unittest.TestCase):
+    """Test case for the iter_sections generator"""
+
+    OUTPUT = ('[STREAM]\nindex=0\ncodec_type=video\n[SIDE_DATA]\n'
+              'rotation=90\n[/SIDE_DATA]\n[/STREAM]\n[STREAM]\nindex=1\n'
+              'codec_type=audio\n[/STREAM]\n[FORMAT]\nfilename=a.mkv\n'
+              'TAG:title=a=b\n[/FORMAT]\n')
+
+    def test_sections(self):
+        sections = list(iter_sections(self.OUTPUT.split('\n')))
+        self.assertEqual(sections, [
+            ('STREAM', ['index=0', 'codec_type=video', 'rotation=90']),
+            ('STREAM', ['index=1', 'codec_type=audio']),
+            ('FORMAT', ['filename=a.mkv', 'TAG:title=a=b'])])
+
+    def test_incremental(self):
+        """
+        a section is yielded as soon as its closing line is read
+        """
+        read = []
+
+        def lines():
+            for line in self.OUTPUT.splitlines(True):
+                read.append(line)
+                yield line
+
+        first = next(iter_sections(lines()))
+        self.assertEqual(first[0], 'STREAM')
+        self.assertEqual(read[-1], '[/STREAM]\n')
+
+    def test_parser(self):
+        data = FFProbe('', 'url', parse=True)
+        data.parser(self.OUTPUT)
+        self.assertEqual(len(data.mediastreams), 2)
+        self.assertEqual(data.mediaformat, [['filename=a.mkv',
+                                             'TAG:title=a=b']])
+        self.assertEqual(len(data.audio_stream()), 1)
+
+    def test_with_filename(self):
+        output = with_filename(self.OUTPUT, 'link.mkv')
+        self.assertIn('filename=link.mkv', output)
+        self.assertNotIn('filename=a.mkv', output)
+        output = with_filename('{"format": {"filename": "a.mkv"}}',
+                               'link.mkv')
+        self.assertEqual(json.loads(output)['format']['filename'],
+                         'link.mkv')
+        self.assertEqual(with_filename('{"streams": []}', 'link.mkv'),
+                         '{"streams": []}')
+
+
 def main():
     unittest.main()
 
@@ -0,0 +1,77 @@
+# -*- coding: UTF-8 -*-
+
+# Porpose: Contains test cases for the job_journal.py object.
+# Rev: December.10.2020 *PEP8 compatible*
+
+import sys
+import os.path
+import tempfile
+import shutil
+import unittest
+
+PATH = os.path.realpath(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(os.path.dirname(PATH)))
+
+try:
+    from videomass3.vdms_io.job_journal import JobJournal
+except ImportError as error:
+    sys.exit(error)
+
+
+class TestJobJournal(unittest.TestCase):
+    """Test case for the JobJournal class."""
+
+    def setUp(self):
+        """
+        Make a journal of three files with one pass: the first
+        is completed, the second is partial, the third is pending.
+        """
+        self.tmp = tempfile.mkdtemp()
+        self.out = [os.path.join(self.tmp, 'out%s.mkv' % n)
+                    for n in range(3)]
+        varargs = ['onepass', ['a.mp4', 'b.mp4', 'c.mp4'], 'mkv',
+                   [self.tmp] * 3, '-c:v libx264', None, '',
+                   ['', '', ''], 'AV_conversions.log', 3]
+        self.journal = JobJournal(self.tmp)
+        self.journal.create('Audio/Video Conversions', varargs,
+                            [10, 20, 30], '', {}, 1)
+        for n in (0, 1):
+            with open(self.out[n], 'w') as out:
+                out.write('data')
+            self.journal.update(n, 1, 'running', self.out[n])
+        self.journal.update(0, 1, 'done')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_resume(self):
+        data = JobJournal(self.tmp).load()
+        indexes = JobJournal.resumable(data)
+        self.assertEqual(indexes, [1, 2])
+
+        JobJournal.cleanup(data, indexes)
+        self.assertTrue(os.path.isfile(self.out[0]))
+        self.assertFalse(os.path.isfile(self.out[1]))
+
+        varargs, duration = JobJournal.requeue(data, indexes)
+        self.assertEqual(varargs[1], ['b.mp4', 'c.mp4'])
+        self.assertEqual(varargs[9], 2)
+        self.assertEqual(duration, [20, 30])
+
+    def test_verified(self):
+        with open(self.out[0], 'a') as out:
+            out.write('changed')
+        data = JobJournal(self.tmp).load()
+        self.assertEqual(JobJournal.resumable(data), [0, 1, 2])
+
+    def test_remove(self):
+        self.journal.remove()
+        self.assertIsNone(JobJournal(self.tmp).load())
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
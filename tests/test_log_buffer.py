@@ -0,0 +1,71 @@
+# -*- coding: UTF-8 -*-
+
+# Porpose: Contains test cases for the log_buffer.py object.
+# Rev: December.10.2020 *PEP8 compatible*
+
+import sys
+import os.path
+import unittest
+
+PATH = os.path.realpath(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(os.path.dirname(PATH)))
+
+try:
+    from videomass3.vdms_io.log_buffer import LogBuffer, severity
+except ImportError as error:
+    sys.exit(error)
+
+
+class TestLogBuffer(unittest.TestCase):
+    """Test case for the LogBuffer class."""
+
+    def setUp(self):
+        self.buf = LogBuffer(maxlines=4)
+
+    def test_severity(self):
+        self.assertEqual(severity('Error while decoding stream'), 'error')
+        self.assertEqual(severity('[info] Writing video'), 'info')
+        self.assertEqual(severity('Warning: deprecated option'), 'warning')
+        self.assertEqual(severity('Stream mapping:'), 'text')
+
+    def test_ring(self):
+        self.buf.write('one\ntwo\n', 'text', 'grey')
+        self.assertEqual(len(self.buf), 2)
+        self.assertEqual(self.buf.row(1), ('two', 'text', 'grey'))
+        self.buf.write('three\nfour\nfive', 'error', 'red')
+        self.assertEqual(len(self.buf), 4)
+        self.assertEqual(self.buf.dropped, 1)
+        self.assertEqual([self.buf.row(x)[0] for x in range(4)],
+                         ['two', 'three', 'four', 'five'])
+        self.assertIsNone(self.buf.row_of(0))
+        self.assertEqual(self.buf.row_of(4), 3)
+
+    def test_filter(self):
+        self.buf.write('one', 'text')
+        self.buf.write('two', 'error')
+        self.buf.write('three', 'warning')
+        self.buf.set_filter('warning')
+        self.assertEqual([self.buf.row(x)[0] for x in range(len(self.buf))],
+                         ['two', 'three'])
+        self.buf.write('four', 'text')
+        self.buf.write('five', 'error')  # drops 'one'
+        self.buf.write('six', 'info')  # drops 'two'
+        self.assertEqual([self.buf.row(x)[0] for x in range(len(self.buf))],
+                         ['three', 'five'])
+        self.buf.set_filter('text')
+        self.assertEqual(len(self.buf), 4)
+
+    def test_find(self):
+        for text, level in (('a', 'error'), ('b', 'text'), ('c', 'error')):
+            self.buf.write(text, level)
+        self.assertEqual(self.buf.find('error', -1), 0)
+        self.assertEqual(self.buf.find('error', 0), 2)
+        self.assertEqual(self.buf.find('error', 2), 0)  # wraps
+        self.assertEqual(self.buf.find('error', 0, forward=False), 2)
+        self.assertIsNone(self.buf.find('warning', -1))
+        self.buf.clear()
+        self.assertIsNone(self.buf.find('error', -1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+# -*- coding: UTF-8 -*-
+
+# Porpose: Contains test cases for the log_writer.py object.
+# Rev: December.10.2020 *PEP8 compatible*
+
+import sys
+import os.path
+import tempfile
+import shutil
+import unittest
+
+PATH = os.path.realpath(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(os.path.dirname(PATH)))
+
+try:
+    from videomass3.vdms_io.log_writer import log_writer
+except ImportError as error:
+    sys.exit(error)
+
+
+class TestLogWriter(unittest.TestCase):
+    """Test case for the log_writer function."""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_write_flush(self):
+        writer = log_writer('test.log', self.tmp)
+        self.assertIs(writer, log_writer('test.log', self.tmp))
+        for n in range(2000):  # more than the queue size
+            writer.write('line %s\n' % n)
+        writer.flush()
+        with open(os.path.join(self.tmp, 'test.log')) as log:
+            lines = log.readlines()
+        self.assertEqual(len(lines), 2000)
+        self.assertEqual(lines[-1], 'line 1999\n')
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
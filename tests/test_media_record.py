@@ -0,0 +1,121 @@
+# -*- coding: UTF-8 -*-
+
+# Porpose: Contains test cases for the media_record.py object.
+# Rev: December.10.2020 *PEP8 compatible*
+
+import sys
+import os.path
+import tempfile
+import unittest
+
+PATH = os.path.realpath(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(os.path.dirname(PATH)))
+
+try:
+    from videomass3.vdms_io.media_record import MediaRecord, fingerprint
+except ImportError as error:
+    sys.exit(error)
+
+OUTPUT = '''{
+    "streams": [
+        {
+            "index": 0,
+            "codec_name": "h264",
+            "codec_type": "video",
+            "width": 1280,
+            "height": 720,
+            "disposition": {"default": 1}
+        },
+        {
+            "index": 1,
+            "codec_name": "aac",
+            "codec_type": "audio",
+            "sample_rate": "48000",
+            "channels": 2
+        }
+    ],
+    "format": {
+        "filename": "/home/user/movie.mkv",
+        "nb_streams": 2,
+        "format_long_name": "Matroska / WebM",
+        "duration": "72.040000",
+        "size": "9909043",
+        "tags": {"title": "movie"}
+    }
+}
+'''
+
+
+class TestMediaRecord(unittest.TestCase):
+    """Test case for the MediaRecord class."""
+
+    def test_from_json(self):
+        rec = MediaRecord.from_json(OUTPUT)
+        self.assertEqual(rec.filename, '/home/user/movie.mkv')
+        self.assertEqual(rec.time, '0:01:12.040000')
+        self.assertAlmostEqual(rec.duration, 72.04)
+        self.assertEqual(rec.size, 9909043)
+        self.assertEqual(rec.format_name, 'Matroska / WebM')
+        self.assertEqual(rec.media_type, 'video')
+        self.assertEqual((rec.streams[0].width, rec.streams[0].height),
+                         (1280, 720))
+        self.assertEqual(rec.streams[1].channels, 2)
+        self.assertEqual(rec.streams[1].sample_rate, 48000)
+        self.assertIsNone(rec.streams[1].width)
+        self.assertFalse(hasattr(rec, '__dict__'))
+
+    def test_no_duration(self):
+        rec = MediaRecord.from_json('{"format": {"filename": "a.png", '
+                                    '"duration": "N/A"}, '
+                                    '"streams": []}')
+        self.assertEqual(rec.duration, 0)
+        self.assertIsNone(rec.time)
+        self.assertIsNone(rec.size)
+        self.assertEqual(rec.media_type, 'N/A')
+
+    def test_time(self):
+        rec = MediaRecord('a.mkv', duration=3725.5)
+        self.assertEqual(rec.time, '1:02:05.500000')
+
+    def test_not_json(self):
+        with self.assertRaises(ValueError):
+            MediaRecord.from_json("{'format': {}}")
+
+
+class TestFingerprint(unittest.TestCase):
+    """Test case for the fingerprint function."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.record = MediaRecord.from_json(OUTPUT)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, data):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, 'wb') as media:
+            media.write(data)
+        return path
+
+    def test_same_content(self):
+        data = bytes(range(256)) * 100
+        one = fingerprint(self.write('a.mkv', data), self.record, span=1000)
+        two = fingerprint(self.write('b.mkv', data), self.record, span=1000)
+        self.assertEqual(one, two)
+        self.assertTrue(one.startswith('25600 '))
+
+    def test_different_content(self):
+        data = bytes(range(256)) * 100
+        one = fingerprint(self.write('a.mkv', data), self.record, span=1000)
+        data = data[:-1] + b'x'  # the tail is hashed too
+        two = fingerprint(self.write('b.mkv', data), self.record, span=1000)
+        self.assertNotEqual(one, two)
+
+    def test_url(self):
+        with self.assertRaises(OSError):
+            fingerprint('http://example.com/a.mkv', self.record)
+
+
+if __name__ == '__main__':
+    unittest.main()
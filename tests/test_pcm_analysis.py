@@ -0,0 +1,105 @@
+# -*- coding: UTF-8 -*-
+
+# Porpose: Contains test cases for the pcm_analysis.py object.
+# Rev: December.10.2020 *PEP8 compatible*
+
+import sys
+import os.path
+import tempfile
+import shutil
+import unittest
+
+PATH = os.path.realpath(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(os.path.dirname(PATH)))
+
+try:
+    from videomass3.vdms_threads import pcm_analysis
+    from videomass3.vdms_threads.pcm_analysis import (PCMStats,
+                                                      BlockAccumulator)
+except ImportError as error:
+    sys.exit(error)
+
+numpy = pcm_analysis.numpy
+
+
+class TestCachePath(unittest.TestCase):
+    """Test case for the cache_path function."""
+
+    def test_cache_path(self):
+        one = pcm_analysis.cache_path('/cache', 'fp', '', '-map 0:1')
+        self.assertTrue(one.startswith(os.path.join('/cache', 'pcm_stats')))
+        self.assertEqual(one, pcm_analysis.cache_path('/cache', 'fp', ' ',
+                                                      ' -map  0:1'))
+        self.assertNotEqual(one, pcm_analysis.cache_path('/cache', 'fp', '',
+                                                         '-map 0:2'))
+        self.assertIsNone(pcm_analysis.cache_path('/cache', None, '', ''))
+
+    def test_prune_cache(self):
+        tmp = tempfile.mkdtemp()
+        try:
+            folder = os.path.join(tmp, pcm_analysis.CACHE_FOLDER)
+            os.makedirs(folder)
+            for n in range(3):
+                name = os.path.join(folder, '%s.npz' % n)
+                with open(name, 'wb') as npz:
+                    npz.write(b'0' * 10)
+                os.utime(name, (n, n))  # 0.npz is the least recent
+            pcm_analysis.prune_cache(tmp, maxbytes=20)
+            self.assertEqual(sorted(os.listdir(folder)), ['1.npz', '2.npz'])
+            pcm_analysis.prune_cache(os.path.join(tmp, 'none'))
+        finally:
+            shutil.rmtree(tmp)
+
+
+@unittest.skipUnless(pcm_analysis.available(), 'NumPy is not installed')
+class TestBlockAccumulator(unittest.TestCase):
+    """Test case for the BlockAccumulator and PCMStats classes."""
+
+    def setUp(self):
+        # 1 second of a 0.5 amplitude sine on the left channel and
+        # silence on the right one, with a clipped sample
+        rate = 1000
+        left = 0.5 * numpy.sin(2 * numpy.pi * 50 * numpy.arange(rate) /
+                               rate)
+        left[10] = 1.0
+        samples = numpy.stack((left, numpy.zeros(rate)), axis=1)
+        data = samples.astype(numpy.float32).tobytes()
+        acc = BlockAccumulator(rate, 2)
+        for start in range(0, len(data), 333):  # odd chunks
+            acc.feed(data[start:start + 333])
+        self.stats = acc.stats()
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_blocks(self):
+        self.assertEqual(self.stats.power.shape, (10, 2))
+        self.assertEqual(self.stats.clipped(), 1)
+        self.assertEqual(self.stats.histogram.sum(), 2000)
+
+    def test_levels(self):
+        self.assertAlmostEqual(self.stats.peak_db(), 0.0)
+        self.assertAlmostEqual(self.stats.peak_db(1), float('-inf'))
+        # sine RMS of the left channel -9.03 dB, -3.01 dB less on both
+        self.assertAlmostEqual(self.stats.rms_db(0), -9.03, places=1)
+        self.assertAlmostEqual(self.stats.rms_db(), -12.04, places=1)
+        self.assertAlmostEqual(self.stats.percentile_db(99.9), -6.0,
+                               delta=0.5)
+        self.assertEqual(self.stats.percentile_db(40), float('-inf'))
+
+    def test_little_endian(self):
+        acc = BlockAccumulator(10, 1)
+        acc.feed(numpy.full(10, 0.5, dtype='<f4').tobytes())
+        self.assertAlmostEqual(acc.stats().peak_db(), -6.02, places=2)
+
+    def test_save_load(self):
+        path = os.path.join(self.tmp, 'pcm_stats', 'stats.npz')
+        self.stats.save(path)
+        stats = PCMStats.load(path)
+        self.assertEqual(stats.record(), self.stats.record())
+        self.assertIsNone(PCMStats.load(os.path.join(self.tmp, 'none.npz')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+# -*- coding: UTF-8 -*-
+
+# Porpose: Contains test cases for the probe_cache.py object.
+# Rev: December.10.2020 *PEP8 compatible*
+
+import sys
+import os.path
+import tempfile
+import shutil
+import unittest
+
+PATH = os.path.realpath(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(os.path.dirname(PATH)))
+
+try:
+    from videomass3.vdms_io.probe_cache import ProbeCache
+except ImportError as error:
+    sys.exit(error)
+
+
+class TestProbeCache(unittest.TestCase):
+    """Test case for the ProbeCache class."""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.files = []
+        for n in range(3):
+            name = os.path.join(self.tmp, 'file%s.mkv' % n)
+            with open(name, 'w') as media:
+                media.write('data')
+            self.files.append(name)
+        self.cache = ProbeCache(os.path.join(self.tmp, 'cache'), maxbytes=20)
+
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.tmp)
+
+    def test_get_put(self):
+        self.assertIsNone(self.cache.get(self.files[0], 'json'))
+        self.cache.put(self.files[0], 'json', '{"format": 0}')
+        self.assertEqual(self.cache.get(self.files[0], 'json'),
+                         '{"format": 0}')
+        self.assertIsNone(self.cache.get(self.files[0], 'xml'))
+        self.assertIsNone(self.cache.get('http://url', 'json'))
+
+    def test_changed_file(self):
+        self.cache.put(self.files[0], 'json', '{"format": 0}')
+        with open(self.files[0], 'a') as media:
+            media.write('more data')
+        self.assertIsNone(self.cache.get(self.files[0], 'json'))
+
+    def test_eviction(self):
+        self.cache.put(self.files[0], 'json', '0123456789')
+        self.cache.put(self.files[1], 'json', '0123456789')
+        self.cache.get(self.files[0], 'json')  # now the most recent
+        self.cache.put(self.files[2], 'json', '0123456789')
+        self.assertIsNotNone(self.cache.get(self.files[0], 'json'))
+        self.assertIsNone(self.cache.get(self.files[1], 'json'))
+        self.assertIsNotNone(self.cache.get(self.files[2], 'json'))
+
+    def test_deferred_atime(self):
+        self.cache.put(self.files[0], 'json', '0123456789')
+        self.cache.get(self.files[0], 'json')
+        self.assertEqual(len(self.cache.touched), 1)  # not written yet
+        self.cache.close()
+        self.assertEqual(self.cache.touched, {})
+        self.assertIsNotNone(self.cache.get(self.files[0], 'json'))
+
+    def test_running_total(self):
+        self.cache.put(self.files[0], 'json', '0123456789')
+        self.cache.put(self.files[0], 'json', '01234')  # replaced
+        self.assertEqual(self.cache.total, 5)
+
+    def test_shared(self):
+        cachedir = os.path.join(self.tmp, 'cache')
+        shared = ProbeCache.shared(cachedir)
+        self.assertIs(ProbeCache.shared(cachedir), shared)
+        self.assertIsNot(ProbeCache.shared(self.tmp), shared)
+        ProbeCache.shared(self.tmp).close()
+        shared.close()
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
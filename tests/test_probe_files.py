@@ -0,0 +1,99 @@
+# -*- coding: UTF-8 -*-
+
+# Porpose: Contains test cases for the probe_files.py object.
+# Rev: December.10.2020 *PEP8 compatible*
+
+import sys
+import os.path
+import time
+import unittest
+from threading import Event
+
+PATH = os.path.realpath(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(os.path.dirname(PATH)))
+
+try:
+    from videomass3.vdms_threads.probe_files import ProbeFiles
+except ImportError as error:
+    sys.exit(error)
+
+
+class TestProbeFiles(unittest.TestCase):
+    """Test case for the ProbeFiles class."""
+
+    def setUp(self):
+        self.sent = []
+
+    def deliver(self, topic, **kwargs):
+        self.sent.append((topic, kwargs))
+
+    def test_order(self):
+        """
+        The first files are the slowest ones, the results
+        are delivered in the order of the list anyway
+        """
+        def probe(filename):
+            time.sleep(0.05 * (5 - int(filename)))
+            return ('data %s' % filename, None)
+
+        files = [str(n) for n in range(5)]
+        ProbeFiles(files, probe, self.deliver, workers=5).join()
+        self.assertEqual([x[1]['filename'] for x in self.sent[:-1]], files)
+        self.assertEqual([x[1]['index'] for x in self.sent[:-1]],
+                         list(range(5)))
+        self.assertEqual(self.sent[-1], ('PROBE_END_EVT',
+                                         {'count': 5, 'cancelled': False}))
+
+    def test_iterable(self):
+        """
+        A generator is read a few files ahead of the delivered
+        results, not all at once
+        """
+        read = []
+
+        def walk():
+            for n in range(1000):
+                read.append(n)
+                yield str(n)
+
+        def deliver(topic, **kwargs):
+            if topic == 'PROBE_EVT' and kwargs['index'] == 0:
+                self.first = len(read)
+            self.deliver(topic, **kwargs)
+
+        ProbeFiles(walk(), lambda x: (x, None), deliver, workers=2).join()
+        self.assertTrue(self.first <= 2 * ProbeFiles.AHEAD)
+        self.assertEqual([x[1]['data'] for x in self.sent[:-1]],
+                         [str(n) for n in range(1000)])
+
+    def test_error(self):
+        files = ['a.mkv', 'b.mkv']
+        probe = lambda x: (None, 'error') if x == 'a.mkv' else ('data', None)
+        ProbeFiles(files, probe, self.deliver, workers=2).join()
+        self.assertEqual(self.sent[0][1]['error'], 'error')
+        self.assertEqual(self.sent[1][1]['data'], 'data')
+
+    def test_cancel(self):
+        """
+        The pending files are never probed after a cancel
+        """
+        probed = []
+        release = Event()
+
+        def probe(filename):
+            probed.append(filename)
+            release.wait(5)
+            return ('data', None)
+
+        files = [str(n) for n in range(100)]
+        thread = ProbeFiles(files, probe, self.deliver, workers=2)
+        thread.cancel()
+        release.set()
+        thread.join()
+        self.assertTrue(len(probed) <= 2)
+        self.assertEqual(self.sent[-1], ('PROBE_END_EVT',
+                                         {'count': 0, 'cancelled': True}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+# -*- coding: UTF-8 -*-
+
+# Porpose: Contains test cases for the progress_bus.py object.
+# Rev: December.10.2020 *PEP8 compatible*
+
+import sys
+import os.path
+import unittest
+
+PATH = os.path.realpath(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(os.path.dirname(PATH)))
+
+try:
+    from videomass3.vdms_threads.progress_bus import ProgressBus
+except ImportError as error:
+    sys.exit(error)
+
+
+class TestProgressBus(unittest.TestCase):
+    """Test case for the ProgressBus class."""
+
+    def setUp(self):
+        """
+        The flusher never runs during the tests (one batch
+        every 1000 seconds), the messages are delivered by
+        the urgent messages and by close.
+        """
+        self.sent = []
+        self.bus = ProgressBus(lambda topic, **kw: self.sent.append(
+                               (topic, kw)), rate=0.001)
+
+    def tearDown(self):
+        self.bus.close()
+
+    def test_batch(self):
+        for n in range(3):
+            self.bus.output('line %s\n' % n, 10, job=1)
+            self.bus.progress(n, 10, job=1)
+        self.assertEqual(self.sent, [])
+        self.assertEqual(self.bus.close(), 4)
+        self.assertEqual([(t, kw.get('output', kw.get('progress')))
+                          for t, kw in self.sent],
+                         [('UPDATE_EVT', 'line 0\nline 1\nline 2\n'),
+                          ('PROGRESS_EVT', 2)])
+
+    def test_urgent(self):
+        self.bus.output('line\n', 10, job=0)
+        self.bus.output('Error while decoding\n', 10, job=0)
+        self.bus.progress(1, 10, job=0)
+        self.bus.status(1, 10, job=0)
+        self.bus.count('', '', '', 'ok', job=0)
+        self.assertEqual([(t, kw.get('output', kw.get('end')))
+                          for t, kw in self.sent],
+                         [('UPDATE_EVT', 'line\n'),
+                          ('UPDATE_EVT', 'Error while decoding\n'),
+                          ('PROGRESS_EVT', None),
+                          ('UPDATE_EVT', ''),
+                          ('COUNT_EVT', 'ok')])
+        self.assertEqual(self.sent[3][1]['status'], 1)
+        self.assertEqual(self.bus.close(), 0)
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
@@ -5,6 +5,7 @@
 
 import sys
 import os.path
+import tempfile
 import unittest
 
 PATH = os.path.realpath(os.path.abspath(__file__))
@@ -79,6 +80,183 @@ class TestTimeHuman(unittest.TestCase):
         self.assertEqual(utils.time_human(9050.0), '2:30:50')
 
 
+class TestPoolSize(unittest.TestCase):
+    """ Test case for the pool_size function"""
+
+    def test_pool_size(self):
+        self.assertEqual(utils.pool_size('1', '-threads 4', 10, 32), 1)
+        self.assertEqual(utils.pool_size('8', '-threads 4', 20, 16), 4)
+        self.assertEqual(utils.pool_size('8', '-threads 0', 20, 16), 8)
+        self.assertEqual(utils.pool_size('8', '-threads 2', 3, 16), 3)
+        self.assertEqual(utils.pool_size('4', '-threads 32', 5, 16), 1)
+        self.assertEqual(utils.pool_size('', '', 5, 16), 1)
+        self.assertEqual(utils.pool_size('0', '-threads 4', 20, 16), 4)
+        self.assertEqual(utils.pool_size('0', '-threads 0', 20, 16), 16)
+
+
+class TestSegmentRanges(unittest.TestCase):
+    """ Test case for the timeseq_range and segment_ranges functions"""
+
+    def test_timeseq_range(self):
+        self.assertEqual(utils.timeseq_range(''), (0, None))
+        self.assertEqual(utils.timeseq_range('-ss 00:01:00 -t 00:02:30'),
+                         (60.0, 150.0))
+
+    def test_segment_ranges(self):
+        keys = [float(k) for k in range(0, 600, 10)]
+        self.assertEqual(utils.segment_ranges(keys, 0, 600, 3),
+                         [(0, 200.0), (200.0, 200.0), (400.0, 200.0)])
+        self.assertEqual(utils.segment_ranges(keys, 95, 395, 2),
+                         [(95, 155.0), (250.0, 145.0)])
+
+    def test_segment_ranges_offset(self):
+        # MPEG-TS like timestamps starting at 1.4 seconds
+        keys = [1.4 + k for k in range(0, 600, 10)]
+        self.assertEqual(utils.segment_ranges(keys, 0, 600, 3, offset=1.4),
+                         [(0, 200.0), (200.0, 200.0), (400.0, 200.0)])
+
+    def test_segment_workers(self):
+        self.assertEqual(utils.segment_workers('-threads 4', 16), 4)
+        self.assertEqual(utils.segment_workers('-threads 0', 16), 4)
+        self.assertEqual(utils.segment_workers('-threads 8', 8), 2)
+        self.assertEqual(utils.segment_workers('', 32), 8)
+
+    def test_segment_ranges_short(self):
+        self.assertEqual(utils.segment_ranges([0.0, 10.0], 0, 40, 4),
+                         [(0, 40)])
+        self.assertEqual(utils.segment_ranges([], 0, 600, 4), [(0, 600)])
+
+
+class TestPasslogOption(unittest.TestCase):
+    """ Test case for the passlog_option function"""
+
+    def test_passlog_option(self):
+        self.assertEqual(utils.passlog_option('-c:v libx264 -pass 1',
+                                              '/tmp/a/passlog'),
+                         '-c:v libx264 -pass 1 -passlogfile '
+                         '"/tmp/a/passlog"')
+        self.assertEqual(utils.passlog_option('-c:v libx265 -x265-params '
+                                              'pass=2', '/tmp/a/passlog'),
+                         '-c:v libx265 -x265-params pass=2')
+
+
+class TestLoglevelInfo(unittest.TestCase):
+    """ Test case for the loglevel_info function"""
+
+    def test_loglevel_info(self):
+        self.assertEqual(utils.loglevel_info('-loglevel warning -stats '
+                                             '-hide_banner -nostdin'),
+                         '-loglevel info -stats -hide_banner -nostdin')
+        self.assertEqual(utils.loglevel_info('-loglevel repeat+error'),
+                         '-loglevel repeat+info')
+        self.assertEqual(utils.loglevel_info('-loglevel debug -stats'),
+                         '-loglevel debug -stats')
+        self.assertEqual(utils.loglevel_info('-stats'), '-stats')
+
+
+class TestLoudnormJson(unittest.TestCase):
+    """ Test case for the loudnorm_json function"""
+
+    OUTPUT = ('size=N/A time=00:00:10.00 bitrate=N/A speed= 412x\n'
+              '[Parsed_loudnorm_0 @ 0x55d5c2f0a2c0] \n'
+              '{\n'
+              '\t"input_i" : "-27.61",\n'
+              '\t"input_tp" : "-4.47",\n'
+              '\t"input_lra" : "18.06",\n'
+              '\t"input_thresh" : "-39.20",\n'
+              '\t"output_i" : "-16.58",\n'
+              '\t"output_tp" : "-1.50",\n'
+              '\t"output_lra" : "14.78",\n'
+              '\t"output_thresh" : "-27.71",\n'
+              '\t"normalization_type" : "dynamic",\n'
+              '\t"target_offset" : "0.58"\n'
+              '}\n')
+
+    def test_loudnorm_json(self):
+        data = utils.loudnorm_json(TestLoudnormJson.OUTPUT)
+        self.assertEqual(data['input_i'], '-27.61')
+        self.assertEqual(data['target_offset'], '0.58')
+
+    def test_loudnorm_json_missing(self):
+        self.assertIsNone(utils.loudnorm_json('size=N/A time=00:00:10.00'))
+        self.assertIsNone(utils.loudnorm_json('{\n"input_i" : \n'))
+
+    def test_loudnorm_targets(self):
+        self.assertEqual(utils.loudnorm_targets('-af loudnorm=I=-16:TP=-1.5'
+                                                ':print_format=json -vn'),
+                         {'I': -16.0, 'TP': -1.5, 'LRA': 7.0})
+        self.assertEqual(utils.loudnorm_targets('-af loudnorm'),
+                         {'I': -24.0, 'TP': -2.0, 'LRA': 7.0})
+
+
+class TestJobOrder(unittest.TestCase):
+    """ Test case for the job_order and batch_estimate functions"""
+
+    def test_job_order(self):
+        durations, sizes = [60, 30, 90, 30], [10, 20, 5, 5]
+        self.assertEqual(utils.job_order(durations, sizes, 'drop'),
+                         [0, 1, 2, 3])
+        self.assertEqual(utils.job_order(durations, sizes, 'longest'),
+                         [2, 0, 1, 3])
+        self.assertEqual(utils.job_order(durations, sizes, 'shortest'),
+                         [3, 1, 0, 2])
+
+    def test_batch_estimate(self):
+        self.assertEqual(utils.batch_estimate([90, 60, 30], 2),
+                         (90, 60, 80.0))
+        self.assertEqual(utils.batch_estimate([30, 60, 90], 2),
+                         (120, 30, 70.0))
+        self.assertEqual(utils.batch_estimate([], 2), (0, 0, 0))
+
+    def test_select_jobs(self):
+        varargs = ['onepass', ['a', 'b', 'c'], 'mkv', ['x', 'y', 'z'],
+                   '', '', '', ['  ', '-1', '-2'], '', 3]
+        varargs, duration = utils.select_jobs(varargs, [1, 2, 3], [2, 0])
+        self.assertEqual(varargs[1], ['c', 'a'])
+        self.assertEqual(varargs[7], ['-2', '  '])
+        self.assertEqual(varargs[9], 2)
+        self.assertEqual(duration, [3, 1])
+        varargs[7] = ['-2']  # a volume is missing
+        self.assertRaises(ValueError, utils.select_jobs, varargs,
+                          duration, [1, 0])
+
+
+class TestDuplicates(unittest.TestCase):
+    """ Test case for the duplicates function"""
+
+    def test_duplicates(self):
+        self.assertEqual(utils.duplicates(['a', None, 'b', 'a', None, 'b',
+                                           'a']), [3, 5, 6])
+        self.assertEqual(utils.duplicates([None, None]), [])
+
+
+class TestScanFiles(unittest.TestCase):
+    """ Test case for the scan_files function"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        for name in ('b.MKV', 'a.mp4', 'notes.txt', 'sub/c.mov',
+                     'sub/deep/d.mkv', 'z.wav'):
+            path = os.path.join(self.tmp.name, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            open(path, 'w').close()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_scan_files(self):
+        found = utils.scan_files(self.tmp.name, {'mkv', 'mp4', 'mov'})
+        self.assertEqual([os.path.relpath(x, self.tmp.name) for x in found],
+                         ['a.mp4', 'b.MKV', os.path.join('sub', 'c.mov'),
+                          os.path.join('sub', 'deep', 'd.mkv')])
+
+    def test_skip(self):
+        skip = set([os.path.join(self.tmp.name, 'a.mp4')])
+        found = list(utils.scan_files(self.tmp.name, {'mp4', 'wav'}, skip))
+        self.assertEqual(found, [os.path.join(self.tmp.name, 'z.wav')])
+        self.assertEqual(len(skip), 2)
+
+
 def main():
     unittest.main()
 
@@ -0,0 +1,216 @@
+# -*- coding: UTF-8 -*-
+
+# Porpose: Contains test cases for the volumedetect.py object.
+# Rev: December.10.2020 *PEP8 compatible*
+
+import sys
+import os
+import os.path
+import stat
+import shutil
+import tempfile
+import unittest
+
+PATH = os.path.realpath(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(os.path.dirname(PATH)))
+
+try:
+    from videomass3.vdms_threads.volumedetect import (VolumeDetectThread,
+                                                      parse_volume,
+                                                      parse_analysis,
+                                                      fused_output,
+                                                      gain_filter,
+                                                      sample_windows,
+                                                      coverage,
+                                                      combine_samples)
+except ImportError as error:
+    sys.exit(error)
+
+FAKE_FFMPEG = '''#!%s
+import sys, time
+name = sys.argv[sys.argv.index('-i') + 1]
+sys.stderr.write('  Duration: 00:00:10.00, start: 0.000000\\n')
+if 'bad' in name:
+    sys.stderr.write('%%s: Invalid data found\\n' %% name)
+    sys.exit(1)
+time.sleep(0.1 if name.startswith('1') else 0)
+print('out_time_us=10000000\\nprogress=end', flush=True)
+sys.stderr.write('[Parsed_volumedetect_0] mean_volume: -%%s.0 dB\\n'
+                 '[Parsed_volumedetect_0] max_volume: -%%s.5 dB\\n'
+                 %% (name[0], name[0]))
+''' % sys.executable
+
+ANALYSIS = '''\
+[Parsed_volumedetect_0 @ 0x55] mean_volume: -20.1 dB
+[Parsed_volumedetect_0 @ 0x55] max_volume: -0.5 dB
+[Parsed_astats_2 @ 0x56] Channel: 1
+[Parsed_astats_2 @ 0x56] Peak level dB: -0.6
+[Parsed_astats_2 @ 0x56] Overall
+[Parsed_astats_2 @ 0x56] Peak level dB: -0.5
+[Parsed_astats_2 @ 0x56] RMS level dB: -20.1
+[Parsed_astats_2 @ 0x56] Number of samples: 6354944
+[Parsed_loudnorm_3 @ 0x57]
+{
+	"input_i" : "-23.05",
+	"input_tp" : "-0.49",
+	"input_lra" : "5.40",
+	"input_thresh" : "-33.55",
+	"target_offset" : "0.05"
+}
+[Parsed_ebur128_1 @ 0x58] Summary:
+
+  Integrated loudness:
+    I:         -23.0 LUFS
+    Threshold: -33.5 LUFS
+
+  Loudness range:
+    LRA:         5.4 LU
+    Threshold: -43.6 LUFS
+
+  True peak:
+    Peak:       -0.4 dBFS
+'''
+
+
+class TestParseVolume(unittest.TestCase):
+    """Test case for the volumedetect output parsing."""
+
+    def test_parse_volume(self):
+        output = ('[Parsed_volumedetect_0 @ 0x55] n_samples: 6354944\n'
+                  '[Parsed_volumedetect_0 @ 0x55] mean_volume: -20.1 dB\n'
+                  '[Parsed_volumedetect_0 @ 0x55] max_volume: -0.5 dB\n')
+        self.assertEqual(parse_volume(output), ['-0.5 dB', '-20.1 dB'])
+        self.assertIsNone(parse_volume('Output file #0 does not '
+                                       'contain any stream\n'))
+
+    def test_parse_analysis(self):
+        rec = parse_analysis(ANALYSIS)
+        self.assertEqual((rec['max_volume'], rec['mean_volume']),
+                         ('-0.5', '-20.1'))
+        self.assertEqual(rec['ebur128'], {'I': '-23.0', 'LRA': '5.4',
+                                          'true_peak': '-0.4'})
+        self.assertEqual(rec['astats'], {'Peak level dB': '-0.5',
+                                         'RMS level dB': '-20.1',
+                                         'Number of samples': '6354944'})
+        self.assertEqual(rec['loudnorm']['input_i'], '-23.05')
+        self.assertIsNone(parse_analysis('no audio\n'))
+
+    def test_gain_filter(self):
+        rec = {'max_volume': '-1.5', 'mean_volume': '-20.0'}
+        self.assertEqual(gain_filter(rec, 'PEAK', -1.0, '1'),
+                         '-filter:a:1 volume=0.500000dB')
+        self.assertEqual(gain_filter(rec, 'RMS', -23.0, ''),
+                         '-filter:a: volume=-3.000000dB')
+        self.assertEqual(gain_filter(rec, 'RMS', -20.0, '1'), '')
+        self.assertEqual(gain_filter({'max_volume': '-inf'}, 'PEAK', -1.0,
+                                     '1'), '')
+
+    def test_sample_windows(self):
+        windows = sample_windows('', 3600, 3, 30)
+        self.assertEqual(windows, ['-ss 00:00:00.000 -t 00:00:30.000',
+                                   '-ss 00:29:45.000 -t 00:00:30.000',
+                                   '-ss 00:59:30.000 -t 00:00:30.000'])
+        self.assertAlmostEqual(coverage(windows), 0.025)
+        self.assertEqual(sample_windows('-ss 00:10:00 -t 00:20:00', 3600,
+                                        2, 30),
+                         ['-ss 00:10:00.000 -t 00:00:30.000',
+                          '-ss 00:29:30.000 -t 00:00:30.000'])
+        self.assertIsNone(sample_windows('', 60, 3, 30))
+
+    def test_combine_samples(self):
+        rec = combine_samples([{'max_volume': '-1.0', 'mean_volume': '-20.0',
+                                'ebur128': {'I': '-23.0'}},
+                               {'max_volume': '-3.0', 'mean_volume': '-20.0',
+                                'ebur128': {'I': '-23.0'}},
+                               None], 0.1)
+        self.assertEqual((rec['max_volume'], rec['mean_volume']),
+                         ('-1.0', '-20.0'))
+        self.assertEqual(rec['ebur128'], {'I': '-23.0'})
+        self.assertEqual(rec['sampled'], {'windows': 2, 'coverage': '0.100',
+                                          'confidence': '0.0'})
+        self.assertIsNone(rec['loudnorm'])
+        self.assertIsNone(combine_samples([None, None], 0.1))
+
+    def test_fused_output(self):
+        fused = {'inmap': '-map 0:1', 'audio': ['a.mkv']}
+        self.assertEqual(fused_output(fused, 'a.mkv', '/dev/null'),
+                         '-map 0:1 -vn -sn -dn -af %s -f null -y /dev/null'
+                         % VolumeDetectThread.FILTERS)
+        # a video only source: no analysis output, pass one still works
+        self.assertEqual(fused_output(fused, 'video.mkv', '/dev/null'), '')
+        self.assertEqual(fused_output({'inmap': ''}, 'a.mkv', 'NUL'), '')
+
+    def test_segment(self):
+        self.assertEqual(VolumeDetectThread.segment(
+                         '-ss 00:01:00 -t 00:00:30'), 30000000)
+        self.assertIsNone(VolumeDetectThread.segment(''))
+
+
+@unittest.skipIf(sys.platform.startswith('win'), 'needs a posix script')
+class TestVolumeDetectThread(unittest.TestCase):
+    """Test case for the VolumeDetectThread class."""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.ffmpeg = os.path.join(self.tmp, 'ffmpeg')
+        with open(self.ffmpeg, 'w') as fake:
+            fake.write(FAKE_FFMPEG)
+        os.chmod(self.ffmpeg, os.stat(self.ffmpeg).st_mode | stat.S_IEXEC)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_order(self):
+        files = ['1.mkv', '2.mkv', '3.mkv', '4.mkv']
+        thread = VolumeDetectThread('', files, '', self.tmp, self.ffmpeg,
+                                    workers=3)
+        thread.join()
+        self.assertEqual(thread.data, ([['-1.5 dB', '-1.0 dB'],
+                                        ['-2.5 dB', '-2.0 dB'],
+                                        ['-3.5 dB', '-3.0 dB'],
+                                        ['-4.5 dB', '-4.0 dB']], None))
+        self.assertEqual(thread.progress()[:2], (4, 1.0))
+        self.assertEqual([x['mean_volume'] for x in thread.results],
+                         ['-1.0', '-2.0', '-3.0', '-4.0'])
+
+    def test_sampled(self):
+        windows = [['-ss 00:00:00.000 -t 00:00:30.000',
+                    '-ss 00:01:00.000 -t 00:00:30.000'], None]
+        thread = VolumeDetectThread('', ['1.mkv', '2.mkv'], '', self.tmp,
+                                    self.ffmpeg, workers=3, windows=windows)
+        thread.join()
+        self.assertEqual(len(thread.tasks), 3)
+        self.assertEqual(thread.results[0]['sampled']['windows'], 2)
+        self.assertNotIn('sampled', thread.results[1])
+        self.assertEqual(thread.data[0], [['-1.5 dB', '-1.0 dB'],
+                                          ['-2.5 dB', '-2.0 dB']])
+        with open(os.path.join(self.tmp, VolumeDetectThread.LOGNAME)) as log:
+            cmds = [x for x in log if '-af ' in x]
+        self.assertEqual(len(cmds), 3)
+        for cmd in cmds:  # only the whole file needs loudnorm
+            self.assertEqual('loudnorm' in cmd, '2.mkv' in cmd)
+
+    def test_unexpected_error(self):
+        class Broken(VolumeDetectThread):
+            def detect(self, index, files, timeseq):
+                if files == '2.mkv':
+                    raise ValueError('unexpected output')
+                return VolumeDetectThread.detect(self, index, files,
+                                                 timeseq)
+
+        thread = Broken('', ['1.mkv', '2.mkv', '3.mkv'], '', self.tmp,
+                        self.ffmpeg, workers=2)
+        thread.join()
+        self.assertEqual(thread.data, ([['-1.5 dB', '-1.0 dB'], None,
+                                        ['-3.5 dB', '-3.0 dB']],
+                                       '2.mkv: unexpected output'))
+
+    def test_error(self):
+        thread = VolumeDetectThread('', ['1.mkv', 'bad.mkv'], '', self.tmp,
+                                    self.ffmpeg, workers=2)
+        thread.join()
+        self.assertIn('bad.mkv: Invalid data found', thread.data[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
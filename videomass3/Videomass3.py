@@ -111,6 +111,8 @@ class Videomass(wx.App):
         self.MPV_check = setui[4][11]
         self.MPV_url = setui[4][12]
         self.FFthreads = setui[4][2]
+        self.FFjobs = setui[4][19]  # max concurrent jobs
+        self.MEDIAext = setui[4][20]  # extensions imported from folders
         self.USERfilesave = None if setui[4][1] == 'none' else setui[4][1]
         self.LOGdir = setui[9]  # dir for logging
         self.CACHEdir = setui[10]  # dir cache for updates
@@ -37,6 +37,8 @@ class Setup(wx.Dialog):
     get = wx.GetApp()
     OS = get.OS
     FF_THREADS = get.FFthreads
+    FF_JOBS = get.FFjobs
+    MEDIA_EXT = get.MEDIAext
     PWD = get.WORKdir
     FILE_CONF = get.FILEconf
     FFMPEG_LINK = get.FFMPEG_url
@@ -156,6 +158,15 @@ class Setup(wx.Dialog):
                                        )
         sizeSamedest.Add(self.text_suffix, 0, wx.LEFT |
                                               wx.ALIGN_CENTER_VERTICAL, 5)
+        msg = _("File name extensions of the media files imported from "
+                "folders")
+        boxExt = wx.StaticBoxSizer(wx.StaticBox(tabOne, wx.ID_ANY,
+                                                (msg)), wx.VERTICAL)
+        sizerGeneral.Add(boxExt, 0, wx.ALL | wx.EXPAND, 15)
+        self.txtctrl_ext = wx.TextCtrl(tabOne, wx.ID_ANY,
+                                       Setup.MEDIA_EXT, size=(-1, -1)
+                                       )
+        boxExt.Add(self.txtctrl_ext, 0, wx.ALL | wx.EXPAND, 15)
         boxLabCache = wx.StaticBoxSizer(wx.StaticBox(tabOne, wx.ID_ANY, (
                                     _("Cache Settings"))), wx.VERTICAL)
         sizerGeneral.Add(boxLabCache, 1, wx.ALL | wx.EXPAND, 15)
@@ -199,6 +210,29 @@ class Setup(wx.Dialog):
                         wx.ALIGN_CENTER_VERTICAL |
                         wx.ALIGN_CENTER_HORIZONTAL, 5
                         )
+        boxLabJobs = wx.StaticBoxSizer(wx.StaticBox(tabTwo, wx.ID_ANY, (
+                                _("Max concurrent jobs"))), wx.VERTICAL)
+        sizerFFmpeg.Add(boxLabJobs, 1, wx.ALL | wx.EXPAND, 15)
+        gridJobs = wx.BoxSizer(wx.VERTICAL)
+        boxLabJobs.Add(gridJobs, 1, wx.ALL | wx.EXPAND, 15)
+        lab2_pane2 = wx.StaticText(tabTwo, wx.ID_ANY,
+                                   (_("Sets how many files are converted at "
+                                      "the same time (from 0 to 32, 0 = "
+                                      "automatic)")))
+        gridJobs.Add(lab2_pane2, 0,
+                     wx.ALL |
+                     wx.ALIGN_CENTER_VERTICAL |
+                     wx.ALIGN_CENTER_HORIZONTAL, 5
+                     )
+        self.spinctrl_jobs = wx.SpinCtrl(tabTwo, wx.ID_ANY,
+                                         "%s" % Setup.FF_JOBS,
+                                         size=(-1, -1), min=0, max=32,
+                                         style=wx.TE_PROCESS_ENTER
+                                         )
+        gridJobs.Add(self.spinctrl_jobs, 0, wx.ALL |
+                     wx.ALIGN_CENTER_VERTICAL |
+                     wx.ALIGN_CENTER_HORIZONTAL, 5
+                     )
         tabTwo.SetSizer(sizerFFmpeg)
         notebook.AddPage(tabTwo, _("FFmpeg"))
         # -----tab 3
@@ -330,9 +364,11 @@ class Setup(wx.Dialog):
         self.Bind(wx.EVT_RADIOBOX, self.logging_ffplay, self.rdbFFplay)
         self.Bind(wx.EVT_RADIOBOX, self.logging_ffmpeg, self.rdbFFmpeg)
         self.Bind(wx.EVT_SPINCTRL, self.on_threads, self.spinctrl_threads)
+        self.Bind(wx.EVT_SPINCTRL, self.on_jobs, self.spinctrl_jobs)
         self.Bind(wx.EVT_BUTTON, self.set_Userpath, self.btn_userpath)
         self.Bind(wx.EVT_CHECKBOX, self.set_Samedest, self.ckbx_dir)
         self.Bind(wx.EVT_TEXT, self.set_Suffix, self.text_suffix)
+        self.Bind(wx.EVT_TEXT, self.on_extensions, self.txtctrl_ext)
         self.Bind(wx.EVT_CHECKBOX, self.exeFFmpeg, self.checkbox_exeFFmpeg)
         self.Bind(wx.EVT_BUTTON, self.open_path_ffmpeg, self.btn_pathFFmpeg)
         self.Bind(wx.EVT_TEXT_ENTER, self.txtffmpeg, self.txtctrl_ffmpeg)
@@ -421,6 +457,22 @@ class Setup(wx.Dialog):
         self.full_list[self.rowsNum[2]] = '-threads %s\n' % sett
     # ---------------------------------------------------------------------#
 
+    def on_jobs(self, event):
+        """set max number of files converted at the same time"""
+        sett = self.spinctrl_jobs.GetValue()
+        self.full_list[self.rowsNum[19]] = '%s\n' % sett
+    # ---------------------------------------------------------------------#
+
+    def on_extensions(self, event):
+        """
+        set the file extensions imported from folders, e.g.
+        'mkv mp4 avi' (an empty value is not saved)
+        """
+        exts = ' '.join(self.txtctrl_ext.GetValue().replace('.', ' ').split())
+        if exts:
+            self.full_list[self.rowsNum[20]] = '%s\n' % exts.lower()
+    # ---------------------------------------------------------------------#
+
     def set_Userpath(self, event):
         """write a custom user path name where saving exported files"""
 
@@ -26,12 +26,16 @@
 #########################################################
 import wx
 import os
+import json
 import webbrowser
+from videomass3.vdms_io import IO_tools
 
 
 class Mediainfo(wx.MiniFrame):
     """
-    Display streams information from ffprobe json data.
+    Display streams information from ffprobe json data. The
+    imported files are MediaRecord objects: the full json data
+    of a file is loaded (by the probe cache) when it is selected.
     """
     def __init__(self, data, OS):
         """
@@ -39,6 +43,7 @@ class Mediainfo(wx.MiniFrame):
         With 'parent, -1' if close videomass also close mediainfo window
         """
         self.data = data
+        self.fulldata = {}  # {filename: ffprobe json data}
 
         wx.MiniFrame.__init__(self, None, style=wx.CAPTION | wx.CLOSE_BOX |
                               wx.RESIZE_BORDER | wx.SYSTEM_MENU
@@ -160,8 +165,7 @@ class Mediainfo(wx.MiniFrame):
         sizer_1.Fit(self)
         self.Layout()
 
-        flist = [x['format']['filename'] for x in self.data
-                 if x['format']['filename']]
+        flist = [x.filename for x in self.data if x.filename]
 
         index = 0
         for f in flist:
@@ -198,18 +202,19 @@ class Mediainfo(wx.MiniFrame):
         index = self.file_select.GetFocusedItem()
         item = self.file_select.GetItemText(index)
 
+        select = self.load_data(item)
+        if not select:
+            return
+
         index = 0
-        for x in self.data:
-            if x.get('format').get('filename') == item:
-                select = self.data[self.data.index(x)]
-                num_items = self.format_ctrl.GetItemCount()
-                self.format_ctrl.InsertItem(num_items, 'DATA FORMAT:')
-                self.format_ctrl.SetItemBackgroundColour(index, "ORANGE")
-                index += 1
-                for k, v in x.get('format').items():
-                    self.format_ctrl.InsertItem(index, str(k))
-                    self.format_ctrl.SetItem(index, 1, str(v))
-                    index += 1
+        num_items = self.format_ctrl.GetItemCount()
+        self.format_ctrl.InsertItem(num_items, 'DATA FORMAT:')
+        self.format_ctrl.SetItemBackgroundColour(index, "ORANGE")
+        index += 1
+        for k, v in select.get('format', {}).items():
+            self.format_ctrl.InsertItem(index, str(k))
+            self.format_ctrl.SetItem(index, 1, str(v))
+            index += 1
 
         if select.get('streams'):
             index = 0
@@ -252,5 +257,20 @@ class Mediainfo(wx.MiniFrame):
                         index += 1
     # ------------------------------------------------------------------#
 
+    def load_data(self, filename):
+        """
+        Return the full json data of a file, loaded once
+
+        """
+        if filename not in self.fulldata:
+            data, error = IO_tools.probeInfo(filename)
+            if error:
+                wx.MessageBox('%s' % error, 'Videomass', wx.ICON_ERROR, self)
+                return None
+            self.fulldata[filename] = json.loads(data)
+
+        return self.fulldata[filename]
+    # ------------------------------------------------------------------#
+
     def on_close(self, event):
         self.Destroy()
@@ -0,0 +1,131 @@
+# -*- coding: UTF-8 -*-
+# Name: pcmstatslist.py
+# Porpose: Show the statistics of the PCM audio analysis
+# Compatibility: Python3, wxPython4
+# Author: Gianluca Pernigoto <jeanlucperni@gmail.com>
+# Copyright: (c) 2018/2020 Gianluca Pernigoto <jeanlucperni@gmail.com>
+# license: GPL3
+# Rev: December.10.2020 *PEP8 compatible*
+#########################################################
+
+# This file is part of Videomass.
+
+#    Videomass is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+
+#    Videomass is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+
+#    You should have received a copy of the GNU General Public License
+#    along with Videomass.  If not, see <http://www.gnu.org/licenses/>.
+
+#########################################################
+import os
+import wx
+
+
+class PCMStatsList(wx.MiniFrame):
+    """
+    Show the levels of the cached PCMStats of the files analyzed
+    by the PCM audio analysis (see pcm_analysis and IO_tools
+    pcmStatistics). The percentile peak is computed again at
+    once when its percent is changed.
+
+    """
+    def __init__(self, data, OS):
+        """
+        data is a list of tuples (filename, PCMStats).
+
+        """
+        wx.MiniFrame.__init__(self, None, style=wx.RESIZE_BORDER | wx.CAPTION |
+                              wx.CLOSE_BOX | wx.SYSTEM_MENU
+                              )
+        """constructor"""
+        self.data = data
+        self.panel = wx.Panel(self, wx.ID_ANY, style=wx.TAB_TRAVERSAL)
+        self.statslist = wx.ListCtrl(self.panel,
+                                     wx.ID_ANY,
+                                     style=wx.LC_REPORT |
+                                     wx.SUNKEN_BORDER
+                                     )
+        lab_percent = wx.StaticText(self.panel, wx.ID_ANY,
+                                    (_('Percentile of the peak level:')))
+        self.spin_percent = wx.SpinCtrlDouble(self.panel, wx.ID_ANY,
+                                              min=50.0, max=100.0,
+                                              initial=99.9, inc=0.1,
+                                              size=(100, -1))
+        self.spin_percent.SetDigits(2)
+        self.button_close = wx.Button(self.panel, wx.ID_CLOSE, "")
+        # ----------------------Properties----------------------#
+        self.SetTitle(_('PCM audio statistics'))
+        self.SetMinSize((850, 400))
+        self.statslist.SetMinSize((850, 250))
+        self.statslist.InsertColumn(0, _('File name'), width=220)
+        self.statslist.InsertColumn(1, _('Peak dBFS'), width=90)
+        self.statslist.InsertColumn(2, _('Percentile peak dBFS'), width=150)
+        self.statslist.InsertColumn(3, _('RMS dBFS'), width=90)
+        self.statslist.InsertColumn(4, _('Gated RMS dBFS'), width=120)
+        self.statslist.InsertColumn(5, _('Clipped samples'), width=120)
+        self.statslist.InsertColumn(6, _('Channels peak/RMS dBFS'),
+                                    width=250)
+        self.spin_percent.SetToolTip(_('The peak level not exceeded by '
+                                       'this percent of the samples'))
+
+        sizer = wx.BoxSizer(wx.VERTICAL)
+        sizer.Add(self.statslist, 1, wx.EXPAND | wx.ALL, 5)
+        grid_percent = wx.BoxSizer(wx.HORIZONTAL)
+        grid_percent.Add(lab_percent, 0, wx.ALL | wx.ALIGN_CENTER_VERTICAL, 5)
+        grid_percent.Add(self.spin_percent, 0, wx.ALL, 5)
+        sizer.Add(grid_percent, 0, wx.ALL, 5)
+        gridbtn = wx.GridSizer(1, 1, 0, 0)
+        sizer.Add(gridbtn, flag=wx.ALIGN_RIGHT | wx.RIGHT, border=5)
+        gridbtn.Add(self.button_close, 1, wx.ALL, 5)
+
+        self.panel.SetSizer(sizer)
+        sizer.Fit(self)
+        self.Layout()
+
+        if OS == 'Darwin':
+            self.statslist.SetFont(wx.Font(12, wx.MODERN, wx.NORMAL,
+                                           wx.NORMAL))
+        else:
+            self.statslist.SetFont(wx.Font(9, wx.MODERN, wx.NORMAL,
+                                           wx.NORMAL))
+
+        self.Bind(wx.EVT_BUTTON, self.on_close, self.button_close)
+        self.Bind(wx.EVT_SPINCTRLDOUBLE, self.on_percent, self.spin_percent)
+        self.Bind(wx.EVT_CLOSE, self.on_close)  # controlla la chiusura (x)
+
+        for index, (filename, stats) in enumerate(self.data):
+            self.statslist.InsertItem(index, os.path.basename(filename))
+            self.statslist.SetItem(index, 1, '%.1f' % stats.peak_db())
+            self.statslist.SetItem(index, 3, '%.1f' % stats.rms_db())
+            self.statslist.SetItem(index, 4, '%.1f' % stats.gated_rms_db())
+            self.statslist.SetItem(index, 5, str(stats.clipped()))
+            self.statslist.SetItem(index, 6, '  '.join(
+                ['%.1f/%.1f' % (stats.peak_db(x), stats.rms_db(x))
+                 for x in range(stats.channels)]))
+            if stats.clipped():
+                self.statslist.SetItemBackgroundColour(index, '#e9504d')
+        self.on_percent(None)
+    # --------------------------------------------------------------#
+
+    def on_percent(self, event):
+        '''
+        Compute the percentile peak level of the files again
+        '''
+        percent = self.spin_percent.GetValue()
+        for index, (filename, stats) in enumerate(self.data):
+            self.statslist.SetItem(index, 2, '%.1f' %
+                                   stats.percentile_db(percent))
+    # --------------------------------------------------------------#
+
+    def on_close(self, event):
+        '''
+        destroy dialog by button and the X
+        '''
+        self.Destroy()
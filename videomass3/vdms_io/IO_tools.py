@@ -37,7 +37,14 @@ from videomass3.vdms_threads import (ffplay_url_exec,
                                      youtubedlupdater,
                                      )
 from videomass3.vdms_threads.ffprobe_parser import FFProbe
-from videomass3.vdms_threads.volumedetect import VolumeDetectThread
+from videomass3.vdms_io.probe_cache import ProbeCache
+from videomass3.vdms_io.analysis_cache import AnalysisCache
+from videomass3.vdms_io.media_record import MediaRecord, fingerprint
+from videomass3.vdms_io import av_probe
+from videomass3.vdms_threads import pcm_analysis
+from videomass3.vdms_threads.volumedetect import (VolumeDetectThread,
+                                                  volume_pair,
+                                                  sample_windows)
 from videomass3.vdms_threads.check_bin import (ff_conf,
                                                ff_formats,
                                                ff_codecs,
@@ -130,11 +137,13 @@ def url_play(url, quality):
 def probeInfo(filename):
     """
     Get data stream informations during dragNdrop action.
-    It is called by MyListCtrl(wx.ListCtrl) only.
-    Return tuple object with two items: (data, None) or (None, error).
+    Full probe of a file for the Mediainfo frame (the file list
+    uses probeRecord). Return tuple object with two items: (data,
+    None) or (None, error) where data is the json output of ffprobe.
     """
     get = wx.GetApp()
-    metadata = FFProbe(get.FFPROBE_url, filename, parse=False, writer='json')
+    metadata = FFProbe(get.FFPROBE_url, filename, parse=False, writer='json',
+                       cache=ProbeCache.shared(get.CACHEdir))
 
     if metadata.ERROR():  # first execute a control for errors:
         err = metadata.error
@@ -146,23 +155,202 @@ def probeInfo(filename):
 # -------------------------------------------------------------------------#
 
 
-def volumeDetectProcess(filelist, time_seq, audiomap):
+def probeRecord(filename):
     """
-    Run thread to get audio peak level data and show a
-    pop-up dialog with message.
+    Fast probe of the fields shown on the file list only, in
+    machine units. Return a tuple (MediaRecord, None) or (None,
+    error). The json output is parsed here, so that it runs on
+    the workers of the ProbeFiles thread. The full probe is made
+    by probeInfo when it is needed.
+
+    If PyAV is installed the file is read in-process, which saves
+    the startup of a ffprobe process; ffprobe is used when PyAV is
+    missing or cannot read the file.
+
+    The content fingerprint of the record (to find the duplicate
+    files) is computed here too and kept on the probe cache.
     """
     get = wx.GetApp()
-    thread = VolumeDetectThread(time_seq, filelist, audiomap,
-                                get.LOGdir, get.FFMPEG_url)
-    loadDlg = PopupDialog(None,
-                          _("Videomass - Loading..."),
-                          _("\nWait....\nAudio peak analysis.\n"))
-    loadDlg.ShowModal()
-    # thread.join()
-    data = thread.data
-    loadDlg.Destroy()
+    cache = ProbeCache.shared(get.CACHEdir)
+    record = None
+    if av_probe.available():
+        try:
+            record = MediaRecord.from_dict(av_probe.probe_dict(filename))
+        except av_probe.AV_ERRORS:
+            pass  # let ffprobe try and report the error
+
+    if record is None:
+        metadata = FFProbe(get.FFPROBE_url, filename, parse=False,
+                           pretty=False, entries=MediaRecord.ENTRIES,
+                           show_format=False, show_streams=False,
+                           writer='json', cache=cache)
+        if metadata.ERROR():
+            return (None, metadata.error)
+        try:
+            record = MediaRecord.from_json(metadata.custom_output())
+        except ValueError as err:
+            return (None, err)
+
+    record.fingerprint = cache.get(filename, 'fingerprint')
+    if record.fingerprint is None:
+        try:
+            record.fingerprint = fingerprint(filename, record)
+        except OSError:
+            pass  # e.g. an url, it is never a duplicate
+        else:
+            cache.put(filename, 'fingerprint', record.fingerprint)
+
+    return (record, None)
+# -------------------------------------------------------------------------#
+
+
+def audioChannels(record, audiomap):
+    """
+    Return the number of channels of the audio stream of a
+    MediaRecord selected by the 'audiomap' option (e.g. '-map 0:1'
+    or '' for the first audio stream), None if not available.
+    """
+    index = audiomap.split(':')[-1] if audiomap else None
+    for stream in record.streams:
+        if stream.codec_type != 'audio':
+            continue
+        if index is None or str(stream.index) == index:
+            return stream.channels
+    return None
+# -------------------------------------------------------------------------#
+
+
+def audioAnalysis(filelist, time_seq, audiomap, sampled=False, pcm=False):
+    """
+    Run thread to get the audio measurement records of the files
+    (volumedetect, ebur128, astats and loudnorm values, see
+    volumedetect.parse_analysis) and show a progress dialog until
+    the analysis is done. Return a tuple (records, status) where
+    records has a item (or None) for each file of the list.
+    The analysis can be aborted by the dialog: in this case an
+    error message is returned as status.
+
+    The records are kept on the analysis cache by the content
+    fingerprint of the files, so only the files never analyzed
+    with the same time segment and audio stream are decoded
+    (e.g. a new target level or normalization mode gets its
+    offsets at once).
+
+    If 'sampled' is True the long files are not decoded as a
+    whole, their records are estimated from a few windows (see
+    volumedetect.combine_samples).
+
+    If 'pcm' is True (and NumPy is installed) the decoded samples
+    are analyzed instead (see pcm_analysis, it is not sampled):
+    the PCMStats of the files are kept on the cache directory,
+    see pcmStatistics.
+    """
+    get = wx.GetApp()
+    cache = AnalysisCache(get.CACHEdir)
+    probes = ProbeCache.shared(get.CACHEdir)
+    options = 'analysis %s' % audiomap
+    pcm = pcm and pcm_analysis.available() and not sampled
+    if sampled:
+        options += ' sampled %s %s' % (VolumeDetectThread.SAMPLES,
+                                       VolumeDetectThread.WINDOW)
+    elif pcm:
+        options += ' pcm'
+    prints = [probes.get(f, 'fingerprint') for f in filelist]
+    results = [cache.get(x, time_seq, options) for x in prints]
+    missing = [i for i, x in enumerate(results) if x is None]
+    status = None
+
+    if missing:
+        windows, audio = None, None
+        if sampled:
+            windows = []
+            for index in missing:
+                record = probeRecord(filelist[index])[0]
+                windows.append(sample_windows(time_seq,
+                                              record.duration,
+                                              VolumeDetectThread.SAMPLES,
+                                              VolumeDetectThread.WINDOW)
+                               if record else None)
+        elif pcm:
+            audio = []
+            for index in missing:
+                record = probeRecord(filelist[index])[0]
+                audio.append((audioChannels(record, audiomap),
+                              record.duration) if record else (None, 0))
+        thread = VolumeDetectThread(time_seq,
+                                    [filelist[i] for i in missing],
+                                    audiomap, get.LOGdir, get.FFMPEG_url,
+                                    windows=windows, pcm=audio)
+        progress = wx.ProgressDialog(_("Videomass - Loading..."),
+                                     _("Audio peak analysis."),
+                                     maximum=1000,
+                                     style=wx.PD_CAN_ABORT |
+                                     wx.PD_APP_MODAL |
+                                     wx.PD_ELAPSED_TIME |
+                                     wx.PD_REMAINING_TIME
+                                     )
+        while thread.is_alive():
+            done, fraction, current = thread.progress()
+            msg = _("Audio peak analysis: file {0}/{1}\n{2}").format(
+                    done, len(missing), os.path.basename(current))
+            if not progress.Update(min(999, int(fraction * 1000)), msg)[0]:
+                thread.cancel()
+                progress.Update(999, _("Stopping..."))
+                thread.join()
+                break
+            thread.join(0.1)
+
+        progress.Destroy()
+        status = thread.data[1]
+        if thread.cancelled.is_set():
+            status = _("Audio peak analysis aborted by user")
+
+        for index, rec, stats in zip(missing, thread.results,
+                                     thread.stats):
+            if rec:
+                results[index] = rec
+                cache.put(prints[index], time_seq, options, rec)
+            path = pcm_analysis.cache_path(get.CACHEdir, prints[index],
+                                           time_seq, audiomap)
+            if stats and path:
+                try:
+                    stats.save(path)
+                except OSError:
+                    pass  # it will be analyzed again
+        if pcm:
+            pcm_analysis.prune_cache(get.CACHEdir)
+
+    return (results, status)
+# -------------------------------------------------------------------------#
+
+
+def pcmStatistics(filename, time_seq, audiomap):
+    """
+    Return the cached PCMStats of a file analyzed by
+    audioAnalysis with pcm=True, or None. Any level (e.g.
+    stats.percentile_db(99.9)) can be computed on it at once,
+    see the pcmstatslist frame.
+    """
+    if not pcm_analysis.available():
+        return None
+    get = wx.GetApp()
+    path = pcm_analysis.cache_path(get.CACHEdir,
+                                   ProbeCache.shared(get.CACHEdir).get(
+                                       filename, 'fingerprint'),
+                                   time_seq, audiomap)
+    return pcm_analysis.PCMStats.load(path) if path else None
+# -------------------------------------------------------------------------#
+
+
+def volumeDetectProcess(filelist, time_seq, audiomap, sampled=False):
+    """
+    Get audio peak level data of the files by audioAnalysis.
+    Return a tuple ([[maxvol, medvol], ...], status) with an item
+    for each file, None for the files without audio volume data.
+    """
+    records, status = audioAnalysis(filelist, time_seq, audiomap, sampled)
 
-    return data
+    return ([volume_pair(x) if x else None for x in records], status)
 # -------------------------------------------------------------------------#
 
 
@@ -0,0 +1,149 @@
+# -*- coding: UTF-8 -*-
+# Name: analysis_cache.py
+# Porpose: keeps the audio analysis results of the media files
+# Compatibility: Python3
+# Author: Gianluca Pernigoto <jeanlucperni@gmail.com>
+# Copyright: (c) 2018/2020 Gianluca Pernigoto <jeanlucperni@gmail.com>
+# license: GPL3
+# Rev: December.10.2020 *PEP8 compatible*
+#########################################################
+
+# This file is part of Videomass.
+
+#    Videomass is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+
+#    Videomass is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+
+#    You should have received a copy of the GNU General Public License
+#    along with Videomass.  If not, see <http://www.gnu.org/licenses/>.
+#########################################################
+
+import os
+import time
+import json
+import sqlite3
+from threading import Lock
+
+
+class AnalysisCache(object):
+    """
+    Keeps the audio analysis results (volumedetect, loudnorm
+    measurements) on a sqlite database in the cache directory.
+    A result is found by the content fingerprint of the file
+    (see media_record.fingerprint), the time segment analyzed
+    and the options of the analysis (the filter and the audio
+    stream map), so it is still valid if the file is renamed
+    or moved. The results are json values.
+
+        cache = AnalysisCache(CACHEDIR)
+        result = cache.get(fingerprint, timeseq, options)  # or None
+        cache.put(fingerprint, timeseq, options, result)
+
+    When the records exceed `maxrows` the least recently used
+    ones are removed. All the errors of the database are ignored:
+    in this case the files are analyzed as if there was not a
+    cache.
+
+    """
+    NAME = 'analysis_cache.sqlite'
+    MAXROWS = 20000
+
+    def __init__(self, cachedir, maxrows=MAXROWS):
+        """
+        cachedir: the Videomass cache directory
+        """
+        self.path = os.path.join(cachedir, AnalysisCache.NAME)
+        self.maxrows = maxrows
+        self.lock = Lock()
+        self.ready = False
+    # ----------------------------------------------------------------#
+
+    def connect(self):
+        """
+        Return a connection to the database, create it if needed
+        """
+        if not os.path.isdir(os.path.dirname(self.path)):
+            os.makedirs(os.path.dirname(self.path), mode=0o777)
+        conn = sqlite3.connect(self.path, timeout=5)
+        if not self.ready:
+            conn.execute('CREATE TABLE IF NOT EXISTS analyses ('
+                         'fingerprint TEXT, timeseq TEXT, options TEXT, '
+                         'result TEXT, atime REAL, '
+                         'PRIMARY KEY (fingerprint, timeseq, options))')
+            conn.commit()
+            self.ready = True
+        return conn
+    # ----------------------------------------------------------------#
+
+    @staticmethod
+    def key(fingerprint, timeseq, options):
+        """
+        Return the database key, the time segment and the options
+        are normalized so that the spaces do not matter.
+        """
+        return (fingerprint, ' '.join((timeseq or '').split()),
+                ' '.join((options or '').split()))
+    # ----------------------------------------------------------------#
+
+    def get(self, fingerprint, timeseq, options):
+        """
+        Return the cached result or None if it is not cached
+        (or the fingerprint is None)
+        """
+        if not fingerprint:
+            return None
+        key = AnalysisCache.key(fingerprint, timeseq, options)
+        with self.lock:
+            try:
+                conn = self.connect()
+                try:
+                    row = conn.execute('SELECT result FROM analyses WHERE '
+                                       'fingerprint=? AND timeseq=? AND '
+                                       'options=?', key).fetchone()
+                    if row:
+                        conn.execute('UPDATE analyses SET atime=? WHERE '
+                                     'fingerprint=? AND timeseq=? AND '
+                                     'options=?', (time.time(),) + key)
+                        conn.commit()
+                finally:
+                    conn.close()
+            except (sqlite3.Error, OSError):
+                return None
+        if not row:
+            return None
+        try:
+            return json.loads(row[0])
+        except ValueError:
+            return None
+    # ----------------------------------------------------------------#
+
+    def put(self, fingerprint, timeseq, options, result):
+        """
+        Store the result, then remove the least recently used
+        records beyond the max rows.
+        """
+        if not fingerprint:
+            return
+        key = AnalysisCache.key(fingerprint, timeseq, options)
+        with self.lock:
+            try:
+                conn = self.connect()
+                try:
+                    conn.execute('INSERT OR REPLACE INTO analyses VALUES '
+                                 '(?, ?, ?, ?, ?)',
+                                 key + (json.dumps(result), time.time()))
+                    conn.execute('DELETE FROM analyses WHERE rowid IN '
+                                 '(SELECT rowid FROM analyses ORDER BY '
+                                 'atime DESC LIMIT -1 OFFSET ?)',
+                                 (self.maxrows,))
+                    conn.commit()
+                finally:
+                    conn.close()
+            except (sqlite3.Error, OSError):
+                return
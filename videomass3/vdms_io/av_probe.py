@@ -0,0 +1,84 @@
+# -*- coding: UTF-8 -*-
+# Name: av_probe.py
+# Porpose: in-process probing of the media files by PyAV (optional)
+# Compatibility: Python3
+# Author: Gianluca Pernigoto <jeanlucperni@gmail.com>
+# Copyright: (c) 2018/2020 Gianluca Pernigoto <jeanlucperni@gmail.com>
+# license: GPL3
+# Rev: December.10.2020 *PEP8 compatible*
+#########################################################
+
+# This file is part of Videomass.
+
+#    Videomass is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+
+#    Videomass is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+
+#    You should have received a copy of the GNU General Public License
+#    along with Videomass.  If not, see <http://www.gnu.org/licenses/>.
+
+#########################################################
+
+import os
+try:
+    import av
+    AV_ERRORS = (OSError, ValueError, getattr(av, 'FFmpegError',
+                                              getattr(av, 'AVError', OSError)))
+except (ModuleNotFoundError, ImportError) as nomodule:
+    av = None
+    AV_ERRORS = (OSError, ValueError)
+
+
+def available():
+    """
+    Return True if the PyAV binding of the libav libraries
+    is installed
+    """
+    return av is not None
+
+
+def probe_dict(filename):
+    """
+    Read the container and streams metadata of a file in-process,
+    without running ffprobe. Return a dict with the same structure
+    and machine units of the ffprobe json output for the entries
+    of MediaRecord.ENTRIES, e.g.
+
+        {'format': {'filename': ..., 'duration': '72.040000', ...},
+         'streams': [{'index': 0, 'codec_type': 'video', ...}, ...]}
+
+    Raise one of AV_ERRORS if the file cannot be read.
+    """
+    with av.open(filename) as container:
+        fmt = {'filename': filename,
+               'format_long_name': container.format.long_name,
+               'duration': ('%f' % (container.duration / av.time_base)
+                            if container.duration else 'N/A'),
+               }
+        if os.path.isfile(filename):
+            fmt['size'] = str(os.path.getsize(filename))
+        streams = []
+        for stream in container.streams:
+            ctx = stream.codec_context
+            info = {'index': stream.index,
+                    'codec_type': stream.type,
+                    'codec_name': ctx.name if ctx else None,
+                    }
+            if stream.type == 'video' and ctx:
+                info['width'] = ctx.width
+                info['height'] = ctx.height
+            elif stream.type == 'audio' and ctx:
+                info['sample_rate'] = str(ctx.sample_rate)
+                layout = getattr(ctx, 'layout', None)
+                info['channels'] = (layout.nb_channels if layout and
+                                    hasattr(layout, 'nb_channels') else
+                                    getattr(ctx, 'channels', None))
+            streams.append(info)
+
+    return {'format': fmt, 'streams': streams}
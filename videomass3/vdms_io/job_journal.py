@@ -0,0 +1,196 @@
+# -*- coding: UTF-8 -*-
+# Name: job_journal.py
+# Porpose: persistent journal of the FFmpeg jobs to resume a batch
+# Compatibility: Python3
+# Author: Gianluca Pernigoto <jeanlucperni@gmail.com>
+# Copyright: (c) 2018/2020 Gianluca Pernigoto <jeanlucperni@gmail.com>
+# license: GPL3
+# Rev: December.10.2020 *PEP8 compatible*
+#########################################################
+
+# This file is part of Videomass.
+
+#    Videomass is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+
+#    Videomass is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+
+#    You should have received a copy of the GNU General Public License
+#    along with Videomass.  If not, see <http://www.gnu.org/licenses/>.
+
+#########################################################
+
+import os
+import json
+import time
+from threading import Lock
+from videomass3.vdms_utils.utils import select_jobs
+
+
+class JobJournal(object):
+    """
+    Keeps a journal of the current batch of FFmpeg jobs on the
+    cache directory, with a record for each file and its passes:
+
+        {'topic': panel name, 'varargs': [...], 'duration': [...],
+         'time_seq': '...', 'time_read': {...}, 'passes': 2,
+         'jobs': [{'file': pathname, 'output': pathname,
+                   'passes': {'1': 'done', '2': 'running'},
+                   'size': None}, ...]}
+
+    The threads update the records as they go; the journal file is
+    always replaced atomically, so that it is never left truncated
+    if the application dies. At the end of the batch the journal is
+    removed, then if it exists at startup the batch was interrupted
+    and can be resumed (see `resumable` and `cleanup` methods).
+
+    """
+    NAME = 'jobs_journal.json'
+    VERSION = 1
+
+    def __init__(self, cachedir):
+        """
+        cachedir: the Videomass cache directory
+        """
+        self.path = os.path.join(cachedir, JobJournal.NAME)
+        self.lock = Lock()
+        self.data = None
+    # ----------------------------------------------------------------#
+
+    def create(self, topic, varargs, duration, timeseq, timeread, passes):
+        """
+        Start a new journal for the given batch. 'passes' is the
+        number of passes of each file; the last one writes the
+        output file.
+        """
+        self.data = {'version': JobJournal.VERSION,
+                     'date': time.strftime("%c"),
+                     'topic': topic,
+                     'varargs': list(varargs),
+                     'duration': list(duration),
+                     'time_seq': timeseq,
+                     'time_read': timeread,
+                     'passes': passes,
+                     'jobs': [{'file': f,
+                               'output': None,
+                               'passes': {},
+                               'size': None} for f in varargs[1]],
+                     }
+        with self.lock:
+            self.write()
+    # ----------------------------------------------------------------#
+
+    def update(self, index, step, status, output=None):
+        """
+        Set the status ('running', 'done', 'failed') of the pass
+        'step' of the job at 'index'. When the last pass is done,
+        the size of the output file is recorded for the verification.
+        """
+        if not self.data:
+            return
+        with self.lock:
+            job = self.data['jobs'][index]
+            job['passes'][str(step)] = status
+            if output:
+                job['output'] = output
+            if (status == 'done' and step == self.data['passes'] and
+                    job['output'] and os.path.isfile(job['output'])):
+                job['size'] = os.path.getsize(job['output'])
+            self.write()
+    # ----------------------------------------------------------------#
+
+    def write(self):
+        """
+        Write the journal on a temporary file, then replace the
+        journal with it.
+        """
+        tmp = '%s.tmp' % self.path
+        try:
+            with open(tmp, 'w', encoding='utf8') as jfile:
+                json.dump(self.data, jfile, ensure_ascii=False)
+                jfile.flush()
+                os.fsync(jfile.fileno())
+            os.replace(tmp, self.path)
+        except OSError as err:
+            return err
+        return None
+    # ----------------------------------------------------------------#
+
+    def remove(self):
+        """
+        Remove the journal at the end of the batch.
+        """
+        self.data = None
+        with self.lock:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+    # ----------------------------------------------------------------#
+
+    def load(self):
+        """
+        Return the journal of an interrupted batch or None
+        if there is not or it is not readable.
+        """
+        if not os.path.isfile(self.path):
+            return None
+        try:
+            with open(self.path, 'r', encoding='utf8') as jfile:
+                data = json.load(jfile)
+        except (OSError, ValueError):
+            return None
+
+        if not isinstance(data, dict) or data.get('version') != 1:
+            return None
+        return data
+    # ----------------------------------------------------------------#
+
+    @staticmethod
+    def verified(data, job):
+        """
+        True if the job is completed and its output file still
+        exists with the same size.
+        """
+        last = job['passes'].get(str(data['passes']))
+        return bool(last == 'done' and job['output'] and
+                    os.path.isfile(job['output']) and
+                    os.path.getsize(job['output']) == job['size'])
+    # ----------------------------------------------------------------#
+
+    @staticmethod
+    def resumable(data):
+        """
+        Return the indexes of the jobs to re-queue, that is the
+        ones not completed or not verified.
+        """
+        return [i for i, job in enumerate(data['jobs'])
+                if not JobJournal.verified(data, job)]
+    # ----------------------------------------------------------------#
+
+    @staticmethod
+    def cleanup(data, indexes):
+        """
+        Delete the partial output files of the given jobs, only
+        if their last pass has been started.
+        """
+        for i in indexes:
+            job = data['jobs'][i]
+            started = str(data['passes']) in job['passes']
+            if started and job['output'] and os.path.isfile(job['output']):
+                try:
+                    os.remove(job['output'])
+                except OSError:
+                    continue
+    # ----------------------------------------------------------------#
+
+    @staticmethod
+    def requeue(data, indexes):
+        """
+        Return the varargs and the duration list of the batch
+        with the given jobs only.
+        """
+        return select_jobs(data['varargs'], data['duration'], indexes)
@@ -0,0 +1,184 @@
+# -*- coding: UTF-8 -*-
+# Name: log_buffer.py
+# Porpose: bounded buffer of the last lines shown by the output console
+# Compatibility: Python3
+# Author: Gianluca Pernigoto <jeanlucperni@gmail.com>
+# Copyright: (c) 2018/2020 Gianluca Pernigoto <jeanlucperni@gmail.com>
+# license: GPL3
+# Rev: December.10.2020 *PEP8 compatible*
+#########################################################
+
+# This file is part of Videomass.
+
+#    Videomass is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+
+#    Videomass is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+
+#    You should have received a copy of the GNU General Public License
+#    along with Videomass.  If not, see <http://www.gnu.org/licenses/>.
+
+#########################################################
+
+from bisect import bisect_left
+
+LEVELS = ('text', 'info', 'warning', 'error')  # by increasing severity
+
+
+def severity(line):
+    """
+    Return the severity level of an FFmpeg output line, by
+    the same keywords used to colour it on the console.
+    """
+    if [x for x in ('info', 'Info') if x in line]:
+        return 'info'
+    if [x for x in ('Failed', 'failed', 'Error', 'error') if x in line]:
+        return 'error'
+    if [x for x in ('warning', 'Warning') if x in line]:
+        return 'warning'
+    return 'text'
+
+
+class LogBuffer(object):
+    """
+    Keeps the last `maxlines` lines written on the output console
+    in a ring, the older ones are dropped (the whole output stays
+    on the log files). Each line has a severity level (see LEVELS)
+    and a style (e.g. its colour), and a sequence number that
+    never changes.
+
+    The rows are the lines of the ring with a level not lower
+    than the `threshold` of `set_filter`, so that a virtual view
+    can get any row in constant time, e.g.
+
+        buf = LogBuffer(5000)
+        buf.write('[FFMPEG]: Error while decoding\\n', 'error', RED)
+        text, level, style = buf.row(len(buf) - 1)
+
+    """
+    MAXLINES = 5000  # default lines kept in memory
+
+    def __init__(self, maxlines=MAXLINES):
+        """
+        maxlines: max number of lines kept in memory
+        """
+        self.maxlines = maxlines
+        self.threshold = 0  # index of the lowest level shown
+        self.clear()
+    # ----------------------------------------------------------------#
+
+    def clear(self):
+        """
+        Remove all the lines
+        """
+        self.ring = [None] * self.maxlines  # [(text, level, style), ...]
+        self.total = 0  # lines written, the next sequence number
+        self.index = []  # sequence numbers of the filtered lines
+        self.skip = 0  # items of index that are no longer in the ring
+    # ----------------------------------------------------------------#
+
+    @property
+    def first(self):
+        """
+        The sequence number of the oldest line in the ring
+        """
+        return max(0, self.total - self.maxlines)
+    # ----------------------------------------------------------------#
+
+    @property
+    def dropped(self):
+        """
+        The number of lines dropped from the ring
+        """
+        return self.first
+    # ----------------------------------------------------------------#
+
+    def write(self, text, level, style=None):
+        """
+        Append the lines of a text with the given level and style.
+        The final newline does not make an empty line, so that
+        'text\\n' and 'text' are both one line.
+        """
+        shown = LEVELS.index(level) >= self.threshold
+        for line in text.rstrip('\n').split('\n'):
+            self.ring[self.total % self.maxlines] = (line, level, style)
+            if shown:
+                self.index.append(self.total)
+            self.total += 1
+
+        first = self.first
+        while (self.skip < len(self.index) and
+               self.index[self.skip] < first):
+            self.skip += 1
+        if self.skip > len(self.index) // 2:  # compact it
+            self.index = self.index[self.skip:]
+            self.skip = 0
+    # ----------------------------------------------------------------#
+
+    def set_filter(self, level):
+        """
+        Show only the lines of the given level or higher
+        """
+        self.threshold = LEVELS.index(level)
+        self.index = [seq for seq in range(self.first, self.total) if
+                      LEVELS.index(self.line(seq)[1]) >= self.threshold]
+        self.skip = 0
+    # ----------------------------------------------------------------#
+
+    def __len__(self):
+        """
+        The number of rows
+        """
+        return len(self.index) - self.skip
+    # ----------------------------------------------------------------#
+
+    def line(self, seq):
+        """
+        Return the (text, level, style) line of a sequence number
+        """
+        return self.ring[seq % self.maxlines]
+    # ----------------------------------------------------------------#
+
+    def seq(self, row):
+        """
+        Return the sequence number of a row
+        """
+        return self.index[self.skip + row]
+    # ----------------------------------------------------------------#
+
+    def row(self, row):
+        """
+        Return the (text, level, style) line of a row
+        """
+        return self.line(self.seq(row))
+    # ----------------------------------------------------------------#
+
+    def row_of(self, seq):
+        """
+        Return the row of a sequence number, or None if that
+        line is dropped or filtered out
+        """
+        lo = bisect_left(self.index, seq, self.skip)
+        if lo < len(self.index) and self.index[lo] == seq:
+            return lo - self.skip
+        return None
+    # ----------------------------------------------------------------#
+
+    def find(self, level, start, forward=True):
+        """
+        Return the first row from `start` (excluded) with the given
+        level, searching forward or backward and wrapping at the
+        ends, or None if there is not.
+        """
+        rows = len(self)
+        step = 1 if forward else -1
+        for n in range(1, rows + 1):
+            row = (start + n * step) % rows
+            if self.row(row)[1] == level:
+                return row
+        return None
@@ -0,0 +1,140 @@
+# -*- coding: UTF-8 -*-
+# Name: log_writer.py
+# Porpose: buffered writing of the log files on a background thread
+# Compatibility: Python3
+# Author: Gianluca Pernigoto <jeanlucperni@gmail.com>
+# Copyright: (c) 2018/2020 Gianluca Pernigoto <jeanlucperni@gmail.com>
+# license: GPL3
+# Rev: December.10.2020 *PEP8 compatible*
+#########################################################
+
+# This file is part of Videomass.
+
+#    Videomass is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+
+#    Videomass is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+
+#    You should have received a copy of the GNU General Public License
+#    along with Videomass.  If not, see <http://www.gnu.org/licenses/>.
+
+#########################################################
+
+import os
+import time
+import queue
+import atexit
+from threading import Thread, Lock, Event
+
+WRITERS = {}  # {pathname: LogWriter}
+LOCK = Lock()
+
+
+class LogWriter(Thread):
+    """
+    Writes a log file on a background thread. The text is queued
+    by `write` and written as it comes on the file, which is kept
+    open and flushed at every `INTERVAL` seconds, until `flush` is
+    called (e.g. at the end of a process): then it is closed, so
+    that it can be removed or renamed. The queue is bounded: when
+    it is full the callers wait, nothing is lost.
+
+    Use the `log_writer` function to get the writer of a log file,
+    so that it is shared by all the threads and the console.
+
+    """
+    INTERVAL = 1.0  # seconds between two flushes
+    MAXSIZE = 1000  # max queued writes
+
+    def __init__(self, path):
+        """
+        path: pathname of the log file
+        """
+        self.path = path
+        self.queue = queue.Queue(maxsize=LogWriter.MAXSIZE)
+        self.error = None  # the last OSError, if any
+
+        Thread.__init__(self, daemon=True)
+        self.start()
+    # ----------------------------------------------------------------#
+
+    def run(self):
+        """
+        Get the queued text and write it on the file. An Event
+        object in the queue is a flush request.
+        """
+        log = None
+        last = time.monotonic()
+        while True:
+            try:
+                item = self.queue.get(timeout=LogWriter.INTERVAL)
+            except queue.Empty:
+                item = None
+            try:
+                if isinstance(item, str):
+                    if log is None:
+                        log = open(self.path, "a")
+                    log.write(item)
+                if log and isinstance(item, Event):
+                    log.close()  # flush request, reopened on next write
+                    log = None
+                elif log and time.monotonic() - last >= LogWriter.INTERVAL:
+                    log.flush()
+                    last = time.monotonic()
+            except OSError as err:
+                self.error = err
+                if log is not None:
+                    try:
+                        log.close()
+                    except OSError:
+                        pass  # the buffered text is lost anyway
+                log = None
+            if isinstance(item, Event):
+                item.set()
+    # ----------------------------------------------------------------#
+
+    def write(self, text):
+        """
+        Queue a text to append on the log file
+        """
+        self.queue.put(text)
+    # ----------------------------------------------------------------#
+
+    def flush(self, timeout=5.0):
+        """
+        Wait until the queued text is written on the file
+        """
+        done = Event()
+        self.queue.put(done)
+        done.wait(timeout)
+
+
+def log_writer(logname, logdir):
+    """
+    Return the LogWriter of the given log file, e.g.
+    log_writer('AV_conversions.log', LOGDIR).write('text\\n')
+    """
+    path = os.path.join(logdir, logname)
+    with LOCK:
+        if path not in WRITERS:
+            WRITERS[path] = LogWriter(path)
+        return WRITERS[path]
+
+
+def flush_all():
+    """
+    Flush all the log writers, it runs at the exit
+    of the interpreter too.
+    """
+    with LOCK:
+        writers = list(WRITERS.values())
+    for writer in writers:
+        writer.flush()
+
+
+atexit.register(flush_all)
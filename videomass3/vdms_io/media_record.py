@@ -0,0 +1,180 @@
+# -*- coding: UTF-8 -*-
+# Name: media_record.py
+# Porpose: compact records of the probed media files
+# Compatibility: Python3
+# Author: Gianluca Pernigoto <jeanlucperni@gmail.com>
+# Copyright: (c) 2018/2020 Gianluca Pernigoto <jeanlucperni@gmail.com>
+# license: GPL3
+# Rev: December.10.2020 *PEP8 compatible*
+#########################################################
+
+# This file is part of Videomass.
+
+#    Videomass is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+
+#    Videomass is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+
+#    You should have received a copy of the GNU General Public License
+#    along with Videomass.  If not, see <http://www.gnu.org/licenses/>.
+
+#########################################################
+
+import os
+import json
+import hashlib
+
+
+def number(value, cast=float):
+    """
+    Convert a machine value of ffprobe, return None if it is
+    not available (e.g. 'N/A' or missing)
+    """
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class StreamRecord(object):
+    """
+    The fields of a media stream used by Videomass. The
+    values not available are None.
+
+    """
+    __slots__ = ('index', 'codec_type', 'codec_name', 'width',
+                 'height', 'sample_rate', 'channels')
+
+    def __init__(self, stream):
+        """
+        stream: a stream dict of the ffprobe json output
+        """
+        self.index = stream.get('index')
+        self.codec_type = stream.get('codec_type')
+        self.codec_name = stream.get('codec_name')
+        self.width = stream.get('width')
+        self.height = stream.get('height')
+        self.sample_rate = number(stream.get('sample_rate'), int)
+        self.channels = stream.get('channels')
+    # ----------------------------------------------------------------#
+
+    def __repr__(self):
+        return 'StreamRecord(%s)' % ', '.join(
+            ['%s=%r' % (x, getattr(self, x)) for x in StreamRecord.__slots__])
+
+
+class MediaRecord(object):
+    """
+    The fields of a probed media file used by Videomass, as
+    parsed from the ffprobe json output in machine units (i.e.
+    without the -pretty option):
+
+        filename     the pathname of the file
+        duration     the duration in seconds (float), 0 if N/A
+        size         the size in bytes (int) or None
+        format_name  the long name of the container format
+        streams      a tuple of StreamRecord objects
+        fingerprint  a string to find the duplicate files (see
+                     the fingerprint function) or None
+
+    The ENTRIES attribute is the -show_entries option of ffprobe
+    which gets these fields only (see IO_tools.probeRecord). The
+    full ffprobe output is not kept: it is probed when it is
+    needed (e.g. on the Mediainfo frame).
+
+        record = MediaRecord.from_json(output)
+        record = MediaRecord.from_dict(av_probe.probe_dict(filename))
+
+    """
+    __slots__ = ('filename', 'duration', 'size', 'format_name',
+                 'streams', 'fingerprint')
+    ENTRIES = ('format=filename,duration,size,format_long_name:'
+               'stream=index,codec_type,codec_name,width,height,'
+               'sample_rate,channels')
+
+    def __init__(self, filename, duration=None, size=None, format_name='',
+                 streams=()):
+        self.filename = filename
+        self.duration = duration or 0
+        self.size = size
+        self.format_name = format_name
+        self.streams = tuple(streams)
+        self.fingerprint = None
+    # ----------------------------------------------------------------#
+
+    @classmethod
+    def from_json(cls, output):
+        """
+        Return a MediaRecord from the json text of ffprobe. Raise
+        ValueError if it is not a json text.
+        """
+        return cls.from_dict(json.loads(output))
+    # ----------------------------------------------------------------#
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Return a MediaRecord from the parsed json output of
+        ffprobe or from a dict with the same structure (see
+        av_probe.probe_dict).
+        """
+        fmt = data.get('format', {})
+        return cls(fmt.get('filename', ''),
+                   duration=number(fmt.get('duration')),
+                   size=number(fmt.get('size'), int),
+                   format_name=fmt.get('format_long_name', ''),
+                   streams=[StreamRecord(x) for x in data.get('streams', [])]
+                   )
+    # ----------------------------------------------------------------#
+
+    @property
+    def time(self):
+        """
+        The duration as ffprobe -pretty, e.g. '0:01:12.040000'
+        or None if N/A
+        """
+        if not self.duration:
+            return None
+        m, s = divmod(self.duration, 60)
+        h, m = divmod(int(m), 60)
+        return '%d:%02d:%09.6f' % (h, m, s)
+    # ----------------------------------------------------------------#
+
+    @property
+    def media_type(self):
+        """
+        The codec type of the first stream, e.g. 'video'
+        """
+        return self.streams[0].codec_type if self.streams else 'N/A'
+    # ----------------------------------------------------------------#
+
+    def __repr__(self):
+        return 'MediaRecord(%s)' % ', '.join(
+            ['%s=%r' % (x, getattr(self, x)) for x in MediaRecord.__slots__])
+
+
+def fingerprint(filename, record, span=4 * 1024 * 1024):
+    """
+    Return a string which is the same for the files with likely
+    the same content, even with different names or paths: the
+    size, a hash of the first and the last 'span' bytes, the
+    probed duration and the streams layout of the given record.
+    Raise OSError if the file cannot be read (e.g. an url).
+    """
+    size = os.path.getsize(filename)
+    digest = hashlib.blake2b(digest_size=16)
+    with open(filename, 'rb') as media:
+        digest.update(media.read(span))
+        if size > span:
+            media.seek(max(span, size - span))
+            digest.update(media.read(span))
+    layout = ','.join(['%s:%s' % (x.codec_type, x.codec_name)
+                       for x in record.streams])
+
+    return '%s %s %.1f %s' % (size, digest.hexdigest(), record.duration,
+                              layout)
@@ -0,0 +1,244 @@
+# -*- coding: UTF-8 -*-
+# Name: probe_cache.py
+# Porpose: persistent cache of the ffprobe outputs
+# Compatibility: Python3
+# Author: Gianluca Pernigoto <jeanlucperni@gmail.com>
+# Copyright: (c) 2018/2020 Gianluca Pernigoto <jeanlucperni@gmail.com>
+# license: GPL3
+# Rev: December.10.2020 *PEP8 compatible*
+#########################################################
+
+# This file is part of Videomass.
+
+#    Videomass is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+
+#    Videomass is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+
+#    You should have received a copy of the GNU General Public License
+#    along with Videomass.  If not, see <http://www.gnu.org/licenses/>.
+
+#########################################################
+
+import os
+import time
+import atexit
+import sqlite3
+from threading import Lock
+
+
+class ProbeCache(object):
+    """
+    Keeps the ffprobe outputs on a sqlite database in the cache
+    directory. A record is found by the real pathname of the file
+    and the ffprobe options used, and it is valid as long as the
+    size and the modification time (ns) of the file are the same.
+
+    When the outputs exceed `maxbytes` the least recently used
+    records are removed. The content fingerprints of the files are
+    kept here too, with the 'fingerprint' options (see IO_tools).
+
+        cache = ProbeCache.shared(CACHEDIR)
+        output = cache.get(filename, options)  # None if not cached
+        cache.put(filename, options, output)
+
+    The shared object of a cache directory keeps a connection open
+    for all the threads, the accesses are serialized by its lock.
+    The access times of the cache hits are written on the next
+    `put` (or every FLUSH hits, or at exit), and the size of the
+    outputs is kept as a running total, so that reading does not
+    need write transactions.
+
+    All the errors of the database are ignored: in this case the
+    files are probed as if there was not a cache.
+
+    """
+    NAME = 'probe_cache.sqlite'
+    MAXBYTES = 32 * 1024 * 1024  # 32 MiB of ffprobe outputs
+    FLUSH = 64  # deferred access times written at once
+    INSTANCES = {}  # the shared objects by database path
+    INSTANCES_LOCK = Lock()
+
+    def __init__(self, cachedir, maxbytes=MAXBYTES):
+        """
+        cachedir: the Videomass cache directory
+        """
+        self.path = os.path.join(cachedir, ProbeCache.NAME)
+        self.maxbytes = maxbytes
+        self.lock = Lock()
+        self.conn = None
+        self.total = 0  # bytes of the outputs
+        self.touched = {}  # (path, options): deferred access time
+    # ----------------------------------------------------------------#
+
+    @classmethod
+    def shared(cls, cachedir):
+        """
+        Return the object shared by all the callers of the given
+        cache directory
+        """
+        path = os.path.join(cachedir, cls.NAME)
+        with cls.INSTANCES_LOCK:
+            if path not in cls.INSTANCES:
+                cls.INSTANCES[path] = cls(cachedir)
+                atexit.register(cls.INSTANCES[path].close)
+            return cls.INSTANCES[path]
+    # ----------------------------------------------------------------#
+
+    def connect(self):
+        """
+        Return the connection to the database, open it (and create
+        the database) if needed. Call it with the lock held.
+        """
+        if self.conn is not None:
+            return self.conn
+        if not os.path.isdir(os.path.dirname(self.path)):
+            os.makedirs(os.path.dirname(self.path), mode=0o777)
+        conn = sqlite3.connect(self.path, timeout=5,
+                               check_same_thread=False)
+        try:
+            conn.execute('CREATE TABLE IF NOT EXISTS probes ('
+                         'path TEXT, options TEXT, size INTEGER, '
+                         'mtime_ns INTEGER, output TEXT, bytes INTEGER, '
+                         'atime REAL, PRIMARY KEY (path, options))')
+            conn.commit()
+            self.total = conn.execute('SELECT SUM(bytes) FROM probes'
+                                      ).fetchone()[0] or 0
+        except sqlite3.Error:
+            conn.close()
+            raise
+        self.conn = conn
+        return conn
+    # ----------------------------------------------------------------#
+
+    def disconnect(self):
+        """
+        Drop the connection after an error, it is opened again
+        on the next access. Call it with the lock held.
+        """
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except sqlite3.Error:
+                pass
+        self.conn = None
+        self.touched.clear()
+    # ----------------------------------------------------------------#
+
+    @staticmethod
+    def stat(filename):
+        """
+        Return a tuple (realpath, size, mtime_ns) of a local file
+        or None (e.g. an url)
+        """
+        try:
+            realpath = os.path.realpath(filename)
+            st = os.stat(realpath)
+        except (OSError, ValueError):
+            return None
+        return realpath, st.st_size, st.st_mtime_ns
+    # ----------------------------------------------------------------#
+
+    def get(self, filename, options):
+        """
+        Return the cached output of the file or None if it is
+        not cached or it has changed
+        """
+        key = ProbeCache.stat(filename)
+        if not key:
+            return None
+        with self.lock:
+            try:
+                conn = self.connect()
+                row = conn.execute('SELECT output FROM probes WHERE '
+                                   'path=? AND options=? AND size=? AND '
+                                   'mtime_ns=?', key[:1] + (options,) +
+                                   key[1:]).fetchone()
+                if row:
+                    self.touched[(key[0], options)] = time.time()
+                    if len(self.touched) >= ProbeCache.FLUSH:
+                        self.write_atimes(conn)
+                        conn.commit()
+            except (sqlite3.Error, OSError):
+                self.disconnect()
+                return None
+
+        return row[0] if row else None
+    # ----------------------------------------------------------------#
+
+    def put(self, filename, options, output):
+        """
+        Store the output of the file, then remove the least
+        recently used records beyond the max size.
+        """
+        key = ProbeCache.stat(filename)
+        if not key:
+            return
+        size = len(output.encode('utf-8'))
+        with self.lock:
+            try:
+                conn = self.connect()
+                self.write_atimes(conn)
+                old = conn.execute('SELECT bytes FROM probes WHERE '
+                                   'path=? AND options=?',
+                                   (key[0], options)).fetchone()
+                conn.execute('INSERT OR REPLACE INTO probes VALUES '
+                             '(?, ?, ?, ?, ?, ?, ?)',
+                             (key[0], options, key[1], key[2], output,
+                              size, time.time()))
+                self.total += size - (old[0] if old else 0)
+                if self.total > self.maxbytes:
+                    self.evict(conn)
+                conn.commit()
+            except (sqlite3.Error, OSError):
+                self.disconnect()
+                return
+    # ----------------------------------------------------------------#
+
+    def write_atimes(self, conn):
+        """
+        Write the deferred access times of the cache hits
+        """
+        if self.touched:
+            conn.executemany('UPDATE probes SET atime=? WHERE path=? AND '
+                             'options=?', [(atime,) + key for key, atime
+                                           in self.touched.items()])
+            self.touched.clear()
+    # ----------------------------------------------------------------#
+
+    def evict(self, conn):
+        """
+        Remove the least recently used records beyond the max size
+        """
+        # the running total does not count the other processes
+        self.total = conn.execute('SELECT SUM(bytes) FROM probes'
+                                  ).fetchone()[0] or 0
+        if self.total <= self.maxbytes:
+            return
+        rows = conn.execute('SELECT path, options, bytes FROM probes '
+                            'ORDER BY atime').fetchall()
+        for path, options, size in rows:
+            if self.total <= self.maxbytes:
+                break
+            conn.execute('DELETE FROM probes WHERE path=? AND options=?',
+                         (path, options))
+            self.total -= size
+    # ----------------------------------------------------------------#
+
+    def close(self):
+        """
+        Write the deferred access times and close the connection
+        """
+        with self.lock:
+            try:
+                if self.conn is not None and self.touched:
+                    self.write_atimes(self.conn)
+                    self.conn.commit()
+            except sqlite3.Error:
+                pass
+            self.disconnect()
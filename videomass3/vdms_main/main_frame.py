@@ -44,7 +44,11 @@ from videomass3.vdms_panels import av_conversions
 from videomass3.vdms_panels.long_processing_task import Logging_Console
 from videomass3.vdms_panels import presets_manager
 from videomass3.vdms_io import IO_tools
+from videomass3.vdms_io.job_journal import JobJournal
 from videomass3.vdms_sys.msg_info import current_release
+from videomass3.vdms_utils.utils import (job_order, batch_estimate,
+                                         select_jobs, pool_size,
+                                         time_human, duplicates)
 
 
 class MainFrame(wx.Frame):
@@ -61,6 +65,8 @@ class MainFrame(wx.Frame):
     WORK_DIR = get.WORKdir  # pathname of the current work directory
     LOGDIR = get.LOGdir  # log directory pathname
     CACHEDIR = get.CACHEdir  # cache directory pathname
+    FF_JOBS = get.FFjobs  # max concurrent jobs
+    FF_THREADS = get.FFthreads  # ffmpeg -threads option
     # colour rappresentetion in rgb
     AZURE_NEON = 158, 201, 232
     YELLOW_LMN = 255, 255, 0
@@ -112,6 +118,7 @@ class MainFrame(wx.Frame):
         self.time_seq = ''  # ffmpeg format time specifier with flag -ss, -t
         self.time_read = {'start seek': ['', ''], 'time': ['', '']}
         self.duration = []  # empty if not file imported
+        self.job_order = 'drop'  # batch order policy (see Batch_order)
         self.topicname = None  # panel name shown
 
         wx.Frame.__init__(self, None, -1, style=wx.DEFAULT_FRAME_STYLE)
@@ -205,6 +212,7 @@ class MainFrame(wx.Frame):
         self.fileDnDTarget.btn_save.Bind(wx.EVT_BUTTON, self.onCustomSave)
         self.textDnDTarget.btn_save.Bind(wx.EVT_BUTTON, self.onCustomSave)
         self.Bind(wx.EVT_CLOSE, self.on_close)  # controlla la chiusura (x)
+        wx.CallAfter(self.resume_jobs)  # an interrupted batch to resume?
 
     # -------------------Status bar settings--------------------#
 
@@ -568,6 +576,10 @@ class MainFrame(wx.Frame):
         setupButton = wx.Menu()
         setupItem = setupButton.Append(wx.ID_PREFERENCES, _("Setup"),
                                        _("General Settings"))
+        dscrp = (_("Batch order"),
+                 _("Choose the order in which the queued files are "
+                   "converted"))
+        orderItem = setupButton.Append(wx.ID_ANY, dscrp[0], dscrp[1])
         self.menuBar.Append(setupButton, _("&Preferences"))
 
         # ------------------ help buton
@@ -625,6 +637,7 @@ class MainFrame(wx.Frame):
         self.Bind(wx.EVT_MENU, self.openCache, opencachedir)
         # ----SETUP----
         self.Bind(wx.EVT_MENU, self.Setup, setupItem)
+        self.Bind(wx.EVT_MENU, self.Batch_order, orderItem)
         self.Bind(wx.EVT_MENU, self.CheckNewReleases, checkItem)
         # ----HELP----
         self.Bind(wx.EVT_MENU, self.Helpme, helpItem)
@@ -727,6 +740,90 @@ class MainFrame(wx.Frame):
         # self.parent.Setup(self)
         setup_dlg = settings.Setup(self, self.iconset)
         setup_dlg.ShowModal()
+    # ------------------------------------------------------------------#
+
+    def Batch_order(self, event):
+        """
+        Choose the order policy of the batch. Each policy shows
+        the estimated times of the current queue, at 1x encoding
+        speed, with the "max concurrent jobs" setting.
+        """
+        policies = [('drop', _("Drop order")),
+                    ('longest', _("Longest first (the whole batch "
+                                  "ends sooner)")),
+                    ('shortest', _("Shortest first (the first files "
+                                   "are ready sooner)")),
+                    ]
+        files, durations, sizes = self.queue_info()
+        workers = pool_size(MainFrame.FF_JOBS, MainFrame.FF_THREADS,
+                            len(files))
+        choices = []
+        for policy, name in policies:
+            order = job_order(durations, sizes, policy)
+            finish, first, mean = batch_estimate([durations[i] for i in
+                                                  order], workers)
+            choices.append(_("{0}: ends in {1} | first file in {2} | "
+                             "mean {3}").format(name,
+                                                time_human(finish),
+                                                time_human(first),
+                                                time_human(mean)))
+        dlg = wx.SingleChoiceDialog(self,
+                                    _("Estimated times of {0} files with "
+                                      "{1} concurrent jobs at 1x speed"
+                                      ).format(len(files), workers),
+                                    _("Batch order"), choices)
+        dlg.SetSelection([p[0] for p in policies].index(self.job_order))
+        if dlg.ShowModal() == wx.ID_OK:
+            self.job_order = policies[dlg.GetSelection()][0]
+        dlg.Destroy()
+    # ------------------------------------------------------------------#
+
+    def queue_info(self, files=None):
+        """
+        Return a tuple of lists (files, durations, sizes) with the
+        probed data of the given files (all the imported files if
+        None). The durations follow the time sequence, if set.
+        """
+        data = dict([(f.filename, f) for f in self.data_files])
+        if files is None:
+            files = list(data)
+        durations, sizes = [], []
+        for name in files:
+            rec = data.get(name)
+            if self.time_seq:
+                durations.append(self.time_read['time'][1] or 0)
+            else:
+                durations.append(rec.duration if rec else 0)
+            sizes.append((rec.size or 0) if rec else 0)
+
+        return files, durations, sizes
+    # ------------------------------------------------------------------#
+
+    def skip_duplicates(self, varargs, duration):
+        """
+        Ask to skip the queued files which are likely duplicates
+        of a previous one, return the varargs and the duration
+        list of the batch (see utils.select_jobs).
+        """
+        prints = dict([(f.filename, f.fingerprint) for f in
+                       self.data_files])
+        dups = duplicates([prints.get(x) for x in varargs[1]])
+        if not dups:
+            return varargs, duration
+
+        msg = (_('{0} files have likely the same content of other queued '
+                 'files (same size, duration, streams and content '
+                 'samples):\n\n{1}\n\nDo you want to skip them?').format(
+                     len(dups), '\n'.join([varargs[1][i] for i in
+                                          dups[:10]])))
+        if wx.MessageBox(msg, _('Videomass - Duplicate files'),
+                         wx.ICON_QUESTION | wx.YES_NO, self) == wx.NO:
+            return varargs, duration
+
+        dups = set(dups)
+        return select_jobs(varargs, duration,
+                           [i for i in range(len(varargs[1]))
+                            if i not in dups])
 
     # --------- Menu Tools
 
@@ -1414,8 +1511,8 @@ class MainFrame(wx.Frame):
         self.fileDnDTarget.Hide(), self.textDnDTarget.Hide()
         self.ytDownloader.Hide(), self.PrstsPanel.Hide()
         self.VconvPanel.Show()
-        filenames = [f['format']['filename'] for f in
-                     self.data_files if f['format']['filename']
+        filenames = [f.filename for f in
+                     self.data_files if f.filename
                      ]
         if not filenames == self.file_src:
             if self.file_src:
@@ -1423,8 +1520,8 @@ class MainFrame(wx.Frame):
                          'check your settings again.'), MainFrame.ORANGE)
                 self.statusbar_msg(msg[0], msg[1])
             self.file_src = filenames
-            self.duration = [f['format']['duration'] for f in
-                             self.data_files if f['format']['duration']
+            self.duration = [f.duration for f in
+                             self.data_files if f.duration
                              ]
             self.VconvPanel.normalize_default()
             self.PrstsPanel.normalization_default()
@@ -1463,8 +1560,8 @@ class MainFrame(wx.Frame):
         self.fileDnDTarget.Hide(), self.textDnDTarget.Hide(),
         self.ytDownloader.Hide(), self.VconvPanel.Hide(),
         self.PrstsPanel.Show()
-        filenames = [f['format']['filename'] for f in
-                     self.data_files if f['format']['filename']
+        filenames = [f.filename for f in
+                     self.data_files if f.filename
                      ]
         if not filenames == self.file_src:
             if self.file_src:
@@ -1472,8 +1569,8 @@ class MainFrame(wx.Frame):
                          'check your settings again.'), MainFrame.ORANGE)
                 self.statusbar_msg(msg[0], msg[1])
             self.file_src = filenames
-            self.duration = [f['format']['duration'] for f in
-                             self.data_files if f['format']['duration']
+            self.duration = [f.duration for f in
+                             self.data_files if f.duration
                              ]
             self.PrstsPanel.normalization_default()
             self.VconvPanel.normalize_default()
@@ -1505,6 +1602,43 @@ class MainFrame(wx.Frame):
         self.Layout()
     # ------------------------------------------------------------------#
 
+    def resume_jobs(self):
+        """
+        If the last batch of conversions was interrupted (the
+        application crashed or was killed while processing), offer
+        to resume it: the completed jobs whose output is verified
+        are skipped, the partial output files are deleted and the
+        other jobs are queued again.
+        """
+        journal = JobJournal(MainFrame.CACHEDIR)
+        data = journal.load()
+        if not data:
+            journal.remove()
+            return
+        indexes = JobJournal.resumable(data)
+        if not indexes:
+            journal.remove()
+            return
+
+        if wx.MessageBox(_('The last batch of conversions was interrupted '
+                           'on {0}.\n\n{1} of {2} files have not been '
+                           'completed. Do you want to resume them?').format(
+                               data['date'], len(indexes),
+                               len(data['jobs'])),
+                         _('Resume'),
+                         wx.ICON_QUESTION | wx.YES_NO, self) == wx.NO:
+            journal.remove()
+            return
+
+        JobJournal.cleanup(data, indexes)
+        varargs, self.duration = JobJournal.requeue(data, indexes)
+        self.time_seq = data['time_seq']
+        self.time_read = data['time_read']
+        self.topicname = data['topic']
+        self.ChooseTopic.Hide()
+        self.switch_to_processing(*varargs)
+    # ------------------------------------------------------------------#
+
     def switch_to_processing(self, *varargs):
         """
     1) TIME DEFINITION FOR THE PROGRESS BAR
@@ -1514,7 +1648,16 @@ class MainFrame(wx.Frame):
         sequence. Otherwise the duration of each media will be the one
         originated from its real duration.
 
-    2) STARTING THE PROCESS
+    2) DUPLICATE FILES
+        If some queued files have the same content fingerprint of
+        a previous one (see media_record.fingerprint) the user can
+        skip them.
+
+    3) BATCH ORDER
+        The queued files are sorted by the batch order policy,
+        if it is not the drop order (see Batch_order).
+
+    4) STARTING THE PROCESS
         Here the panel with the progress bar is instantiated which will
         assign a corresponding thread.
 
@@ -1526,6 +1669,24 @@ class MainFrame(wx.Frame):
             duration = newDuration
         else:
             duration = self.duration
+        try:
+            if (varargs[0] in
+                    ('onepass', 'twopass', 'two pass EBU', 'segmentpass') and
+                    isinstance(varargs[1], list) and len(varargs[1]) > 1):
+                varargs, duration = self.skip_duplicates(varargs, duration)
+            if (self.job_order != 'drop' and varargs[0] in
+                    ('onepass', 'twopass', 'two pass EBU', 'segmentpass') and
+                    isinstance(varargs[1], list) and len(varargs[1]) > 1):
+                files, durations, sizes = self.queue_info(varargs[1])
+                varargs, duration = select_jobs(varargs, duration,
+                                                job_order(durations, sizes,
+                                                          self.job_order))
+        except ValueError as err:  # volumes not aligned to the files
+            wx.MessageBox(_('The audio volume data does not match the '
+                            'queued files, please repeat the audio '
+                            'analysis.\n\n{0}').format(err),
+                          'Videomass', wx.ICON_ERROR, self)
+            return
         if varargs[0] == 'console view only':
             self.statusbar_msg(_('Last output status'), None)
         else:
@@ -1555,14 +1716,14 @@ class MainFrame(wx.Frame):
             self.ytDownloader.on_start()
 
         elif self.VconvPanel.IsShown():
-            self.file_src = [f['format']['filename'] for f in
-                             self.data_files if f['format']['filename']
+            self.file_src = [f.filename for f in
+                             self.data_files if f.filename
                              ]
             self.VconvPanel.on_start()
 
         elif self.PrstsPanel.IsShown():
-            self.file_src = [f['format']['filename'] for f in
-                             self.data_files if f['format']['filename']
+            self.file_src = [f.filename for f in
+                             self.data_files if f.filename
                              ]
             self.PrstsPanel.on_start()
     # ------------------------------------------------------------------#
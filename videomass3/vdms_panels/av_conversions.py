@@ -27,7 +27,11 @@
 import wx
 import os
 import wx.lib.agw.floatspin as FS
-from videomass3.vdms_io.IO_tools import volumeDetectProcess
+from videomass3.vdms_io.IO_tools import audioAnalysis
+from videomass3.vdms_io.IO_tools import audioChannels
+from videomass3.vdms_io.IO_tools import pcmStatistics
+from videomass3.vdms_threads.volumedetect import volume_pair
+from videomass3.vdms_threads import pcm_analysis
 from videomass3.vdms_io.IO_tools import stream_play
 from videomass3.vdms_io.checkup import check_files
 from videomass3.vdms_dialogs.epilogue import Formula
@@ -39,6 +43,7 @@ from videomass3.vdms_dialogs.filter_denoisers import Denoisers
 from videomass3.vdms_dialogs.filter_deinterlace import Deinterlace
 from videomass3.vdms_dialogs.filter_scale import Scale
 from videomass3.vdms_frames import shownormlist
+from videomass3.vdms_frames import pcmstatslist
 from videomass3.vdms_utils import optimizations
 
 
@@ -203,6 +208,7 @@ class AV_Conv(wx.Panel):
                      }
         self.parent = parent
         self.normdetails = []
+        self.pcmstats = []  # [(filename, PCMStats), ...] of PCM analysis
         self.oS = OS
 
         wx.Panel.__init__(self, parent, -1)
@@ -221,7 +227,7 @@ class AV_Conv(wx.Panel):
                                   style=wx.TAB_TRAVERSAL
                                   )
         sizer_nbVideo.Add(self.codVpanel, 1, wx.ALL | wx.EXPAND, 10)
-        grid_sx_Vcod = wx.FlexGridSizer(11, 2, 0, 0)
+        grid_sx_Vcod = wx.FlexGridSizer(12, 2, 0, 0)
         self.box_Vcod = wx.StaticBoxSizer(wx.StaticBox(self.codVpanel,
                                           wx.ID_ANY, _("Video Encoder")),
                                           wx.VERTICAL
@@ -250,6 +256,13 @@ class AV_Conv(wx.Panel):
         grid_sx_Vcod.Add(self.ckbx_pass, 0, wx.ALL |
                          wx.ALIGN_CENTER_VERTICAL, 5
                          )
+        grid_sx_Vcod.Add((0, 0), 0, wx.ALL, 5)
+        self.ckbx_split = wx.CheckBox(self.codVpanel, wx.ID_ANY,
+                                      _("Split encoding")
+                                      )
+        grid_sx_Vcod.Add(self.ckbx_split, 0, wx.ALL |
+                         wx.ALIGN_CENTER_VERTICAL, 5
+                         )
         txtCRF = wx.StaticText(self.codVpanel, wx.ID_ANY, _('CRF'))
         grid_sx_Vcod.Add(txtCRF, 0, wx.ALL | wx.ALIGN_CENTER_VERTICAL, 5)
         self.slider_CRF = wx.Slider(self.codVpanel, wx.ID_ANY, 1, -1, 51,
@@ -697,7 +710,7 @@ class AV_Conv(wx.Panel):
         self.peakpanel = wx.Panel(self.nb_filters, wx.ID_ANY,
                                   style=wx.TAB_TRAVERSAL
                                   )
-        sizer_peak = wx.FlexGridSizer(1, 4, 15, 15)
+        sizer_peak = wx.FlexGridSizer(2, 4, 15, 15)
         sizer_Anormalization.Add(self.peakpanel, 0, wx.ALL | wx.EXPAND, 20)
         # analyzebmp = wx.Bitmap(iconanalyzes, wx.BITMAP_TYPE_ANY)
         self.btn_voldect = wx.Button(self.peakpanel, wx.ID_ANY,
@@ -721,6 +734,20 @@ class AV_Conv(wx.Panel):
                                         )
         self.spin_target.SetFormat("%f"), self.spin_target.SetDigits(1)
         sizer_peak.Add(self.spin_target, 0, wx.ALIGN_CENTER_VERTICAL, 0)
+        self.ckbx_fused = wx.CheckBox(self.peakpanel, wx.ID_ANY,
+                                      (_('Analyze on the first pass')))
+        sizer_peak.Add(self.ckbx_fused, 0, wx.ALIGN_CENTER_VERTICAL, 0)
+        self.ckbx_sampled = wx.CheckBox(self.peakpanel, wx.ID_ANY,
+                                        (_('Sampled analysis')))
+        sizer_peak.Add(self.ckbx_sampled, 0, wx.ALIGN_CENTER_VERTICAL, 0)
+        self.ckbx_pcm = wx.CheckBox(self.peakpanel, wx.ID_ANY,
+                                    (_('PCM analysis')))
+        self.ckbx_pcm.Enable(pcm_analysis.available())
+        sizer_peak.Add(self.ckbx_pcm, 0, wx.ALIGN_CENTER_VERTICAL, 0)
+        self.btn_pcmstats = wx.Button(self.peakpanel, wx.ID_ANY,
+                                      _("PCM Statistics"), size=(-1, -1))
+        self.btn_pcmstats.SetBitmap(wx.Bitmap(iconanalyzes), wx.LEFT)
+        sizer_peak.Add(self.btn_pcmstats, 0, wx.ALIGN_CENTER_VERTICAL, 0)
         self.peakpanel.SetSizer(sizer_peak)  # set panel
         # sizer_nbAudio.Add(self.peakpanel, 0, wx.ALL, 20)
         self.ebupanel = wx.Panel(self.nb_filters,
@@ -786,6 +813,11 @@ class AV_Conv(wx.Panel):
         self.cmb_Media.SetToolTip(tip)
         tip = (_('It can reduce the file size, but takes longer.'))
         self.ckbx_pass.SetToolTip(tip)
+        tip = (_('Splits each file on the keyframes and encodes the '
+                 'segments at the same time, then joins them. It can be '
+                 'faster on long files and multi-core CPUs. One pass '
+                 'encoding only.'))
+        self.ckbx_split.SetToolTip(tip)
         tip = (_('Specifies a minimum tolerance to be used'))
         self.spinMinr.SetToolTip(tip)
         tip = (_('Specifies a maximum tolerance. this is '
@@ -825,6 +857,20 @@ class AV_Conv(wx.Panel):
                  '(when switch to RMS) in dBFS. From -99.0 to +0.0; default '
                  'for PEAK level is -1.0; default for RMS is -20.0'))
         self.spin_target.SetToolTip(tip)
+        tip = (_('On two pass video encodings, analyze the audio volume '
+                 'during the first pass instead of using the "Volumedetect" '
+                 'button, which saves a decode of each file.'))
+        self.ckbx_fused.SetToolTip(tip)
+        tip = (_('Analyze a few evenly spaced windows of the long files '
+                 'instead of decoding them as a whole. The levels are an '
+                 'estimate: the mean volume is given with a confidence '
+                 'bound, the peaks may be higher. RMS-based normalization '
+                 'only.'))
+        self.ckbx_sampled.SetToolTip(tip)
+        tip = (_('Analyze the decoded audio samples by NumPy (it must be '
+                 'installed): the statistics of each file are kept on the '
+                 'cache, and also the clipped samples are counted.'))
+        self.ckbx_pcm.SetToolTip(tip)
         tip = (_('Choose a specific audio stream to map from input file. If '
                  'not more that one audio stream, leave to "Auto".'))
         self.cmb_A_inMap.SetToolTip(tip)
@@ -871,6 +917,8 @@ class AV_Conv(wx.Panel):
         self.Bind(wx.EVT_COMBOBOX, self.on_audioOUTstream, self.cmb_A_outMap)
         self.Bind(wx.EVT_RADIOBOX, self.onNormalize, self.rdbx_normalize)
         self.Bind(wx.EVT_SPINCTRL, self.on_enter_Ampl, self.spin_target)
+        self.Bind(wx.EVT_CHECKBOX, self.on_enter_Ampl, self.ckbx_sampled)
+        self.Bind(wx.EVT_CHECKBOX, self.on_enter_Ampl, self.ckbx_pcm)
         self.Bind(wx.EVT_BUTTON, self.on_Audio_analyzes, self.btn_voldect)
         self.Bind(wx.EVT_COMBOBOX, self.on_xOptimize, self.cmb_x26opti)
         self.Bind(wx.EVT_COMBOBOX, self.on_vpOptimize, self.cmb_vp9opti)
@@ -879,6 +927,7 @@ class AV_Conv(wx.Panel):
         self.Bind(wx.EVT_COMBOBOX, self.on_Level, self.cmb_level)
         self.Bind(wx.EVT_COMBOBOX, self.on_xTune, self.cmb_tune)
         self.Bind(wx.EVT_BUTTON, self.on_Show_normlist, self.btn_details)
+        self.Bind(wx.EVT_BUTTON, self.on_Show_pcmstats, self.btn_pcmstats)
 
         # -------------------------------------- initialize default layout:
         self.rdb_a.SetSelection(0), self.cmb_Vcod.SetSelection(1)
@@ -978,8 +1027,10 @@ class AV_Conv(wx.Panel):
             self.btn_voldect.Enable()
         self.spin_target.SetValue(-1.0)
         self.peakpanel.Hide(), self.ebupanel.Hide(), self.btn_details.Hide()
+        self.btn_pcmstats.Hide()
         self.opt["PEAK"], self.opt["EBU"], self.opt["RMS"] = "", "", ""
         del self.normdetails[:]
+        del self.pcmstats[:]
 
     # ----------------------Event handler (callback)----------------------#
 
@@ -1086,6 +1137,12 @@ class AV_Conv(wx.Panel):
         """
         enable or disable functionality for two pass encoding
         """
+        if (self.ckbx_pass.IsChecked() or
+                self.opt["VideoCodec"] == "-c:v copy"):
+            self.ckbx_split.SetValue(False), self.ckbx_split.Disable()
+        else:
+            self.ckbx_split.Enable()
+
         if self.ckbx_pass.IsChecked():
             self.opt["Passing"] = "2 pass"
             if self.opt["VideoCodec"] in ["-c:v libvpx", "-c:v libvpx-vp9"]:
@@ -1230,11 +1287,11 @@ class AV_Conv(wx.Panel):
 
         index = self.parent.data_files[fget[1]]
 
-        if 'video' in index.get('streams')[0]['codec_type']:
-            width = int(index['streams'][0]['width'])
-            height = int(index['streams'][0]['height'])
-            filename = index['format']['filename']
-            time = index['format'].get('time', '0:0:0')
+        if index.media_type == 'video':
+            width = int(index.streams[0].width)
+            height = int(index.streams[0].height)
+            filename = index.filename
+            time = index.time or '0:0:0'
             return (width, height, filename, time)
         else:
             wx.MessageBox(_('The file is not a frame or a video file'),
@@ -1707,11 +1764,14 @@ class AV_Conv(wx.Panel):
             self.normalize_default(False)
             self.parent.statusbar_msg(msg_1, AV_Conv.AZURE)
             self.peakpanel.Show()
+            # the sampled peaks are lower bounds, the gain would clip
+            self.ckbx_sampled.SetValue(False), self.ckbx_sampled.Disable()
 
         elif self.rdbx_normalize.GetSelection() == 2:
             self.normalize_default(False)
             self.parent.statusbar_msg(msg_2, AV_Conv.TROPGREEN)
             self.peakpanel.Show(), self.spin_target.SetValue(-20)
+            self.ckbx_sampled.Enable()
 
         elif self.rdbx_normalize.GetSelection() == 3:
             self.parent.statusbar_msg(msg_3, AV_Conv.LIMEGREEN)
@@ -1763,15 +1823,24 @@ class AV_Conv(wx.Panel):
                   'set target level'))
         if self.normdetails:
             del self.normdetails[:]
+        del self.pcmstats[:]
 
         self.parent.statusbar_msg("", None)
         self.time_seq = self.parent.time_seq  # from -ss to -t will be analyzed
         target = self.spin_target.GetValue()
 
-        data = volumeDetectProcess(self.parent.file_src,
-                                   self.time_seq,
-                                   self.opt["AudioInMap"][0]
-                                   )
+        records, error = audioAnalysis(self.parent.file_src,
+                                       self.time_seq,
+                                       self.opt["AudioInMap"][0],
+                                       self.ckbx_sampled.IsChecked() and
+                                       self.rdbx_normalize.GetSelection() == 2,
+                                       self.ckbx_pcm.IsChecked()
+                                       )
+        data = ([volume_pair(x) if x else None for x in records], error)
+        bounds = [float(x['sampled']['confidence']) for x in records
+                  if x and 'sampled' in x]
+        clipped = sum([x['pcm']['clipped'] for x in records
+                       if x and 'pcm' in x])
         if data[1]:
             wx.MessageBox(data[1], "Videomass", wx.ICON_ERROR)
             return
@@ -1779,6 +1848,9 @@ class AV_Conv(wx.Panel):
             volume = list()
             if self.rdbx_normalize.GetSelection() == 1:  # RMS
                 for f, v in zip(self.parent.file_src, data[0]):
+                    if v is None:  # no audio data, keep the files order
+                        volume.append('  ')
+                        continue
                     maxvol = v[0].split(' ')[0]
                     meanvol = v[1].split(' ')[0]
                     offset = float(maxvol) - float(target)
@@ -1798,6 +1870,9 @@ class AV_Conv(wx.Panel):
                                              ))
             elif self.rdbx_normalize.GetSelection() == 2:  # ebu
                 for f, v in zip(self.parent.file_src, data[0]):
+                    if v is None:  # no audio data, keep the files order
+                        volume.append('  ')
+                        continue
                     maxvol = v[0].split(' ')[0]
                     meanvol = v[1].split(' ')[0]
                     offset = float(meanvol) - float(target)
@@ -1821,12 +1896,27 @@ class AV_Conv(wx.Panel):
                 pass
             else:
                 self.parent.statusbar_msg(msg2, AV_Conv.YELLOW)
+        if bounds:
+            self.parent.statusbar_msg(_('Levels estimated by sampling: mean '
+                                        'volume within ±{0} dB (95%), the '
+                                        'peaks may be higher').format(
+                                          max(bounds)), AV_Conv.YELLOW)
+        elif clipped:
+            self.parent.statusbar_msg(_('Clipped audio samples found: {0}'
+                                        ).format(clipped), AV_Conv.YELLOW)
         if self.rdbx_normalize.GetSelection() == 1:  # PEAK
             self.opt["PEAK"] = volume
         elif self.rdbx_normalize.GetSelection() == 2:  # RMS
             self.opt["RMS"] = volume
+        if [x for x in records if x and 'pcm' in x]:
+            for f in self.parent.file_src:
+                stats = pcmStatistics(f, self.time_seq,
+                                      self.opt["AudioInMap"][0])
+                if stats:
+                    self.pcmstats.append((f, stats))
         self.btn_voldect.Disable()
         self.btn_details.Show()
+        self.btn_pcmstats.Show(bool(self.pcmstats))
         self.nb_filters.Layout()
     # ------------------------------------------------------------------#
 
@@ -1845,6 +1935,15 @@ class AV_Conv(wx.Panel):
         audionormlist.Show()
     # ------------------------------------------------------------------#
 
+    def on_Show_pcmstats(self, event):
+        """
+        Show a wx.ListCtrl dialog with the levels of the PCM
+        audio analysis
+        """
+        pcmlist = pcmstatslist.PCMStatsList(self.pcmstats, self.oS)
+        pcmlist.Show()
+    # ------------------------------------------------------------------#
+
     def on_xPreset(self, event):
         """
         Set h264/h265 only
@@ -1945,7 +2044,7 @@ class AV_Conv(wx.Panel):
         logname = 'AV_conversions.log'
         # check normalization data offset, if enable
         if self.rdbx_normalize.GetSelection() in [1, 2]:
-            if self.btn_voldect.IsEnabled():
+            if self.btn_voldect.IsEnabled() and not self.fused_analysis():
                 wx.MessageBox(_('Undetected volume values! use the '
                                 '"Volumedetect" control button to analyze '
                                 'the data on the audio volume.'),
@@ -1980,11 +2079,37 @@ class AV_Conv(wx.Panel):
         return
     # ------------------------------------------------------------------#
 
+    def fused_analysis(self):
+        """
+        Return True if the PEAK or RMS audio analysis has to run
+        on the first pass of a two pass video encoding (i.e. the
+        'Analyze on the first pass' box is checked and the volume
+        is not detected yet).
+        """
+        return (self.ckbx_fused.IsChecked() and
+                self.btn_voldect.IsEnabled() and
+                self.rdbx_normalize.GetSelection() in [1, 2] and
+                self.cmb_Media.GetValue() == 'Video' and
+                self.cmb_Vcod.GetValue() != "Copy" and
+                self.opt["Passing"] == "2 pass")
+    # ------------------------------------------------------------------#
+
     def video_stdProc(self, f_src, destin, countmax, logname):
         """
         Build the ffmpeg command strings for video conversions.
         """
         audnorm = self.opt["RMS"] if not self.opt["PEAK"] else self.opt["PEAK"]
+        if self.fused_analysis():  # see TwoPass
+            audnorm = {'normalize': ('PEAK' if
+                                     self.rdbx_normalize.GetSelection() == 1
+                                     else 'RMS'),
+                       'target': self.spin_target.GetValue(),
+                       'outmap': self.opt["AudioOutMap"][1],
+                       'inmap': self.opt["AudioInMap"][0],
+                       'audio': [x.filename for x in self.parent.data_files
+                                 if audioChannels(x, self.opt["AudioInMap"][0])
+                                 ],
+                       }
 
         if self.cmb_Vcod.GetValue() == "Copy":
             command = (
@@ -2091,6 +2216,9 @@ class AV_Conv(wx.Panel):
             command = " ".join(command.split())  # mi formatta la stringa
             if logname == 'save as profile':
                 return command, '', self.opt["OutputFormat"]
+            if self.ckbx_split.IsChecked():
+                self.video_segmented(f_src, destin, countmax, logname)
+                return
             valupdate = self.update_dict(countmax, [''])
             title = 'One pass Video Encoding'
             ending = Formula(self, valupdate[0], valupdate[1], title)
@@ -2109,6 +2237,58 @@ class AV_Conv(wx.Panel):
                                                  )
     # ------------------------------------------------------------------#
 
+    def video_segmented(self, f_src, destin, countmax, logname):
+        """
+        Build the ffmpeg options for one pass video encoding in
+        segments (see `vdms_threads/segment_pass.py`): video options
+        of the segments, audio options and muxing options.
+        """
+        audnorm = self.opt["RMS"] if not self.opt["PEAK"] else self.opt["PEAK"]
+
+        cmd_v = (
+            f'{self.opt["VideoCodec"]} {self.opt["VideoBitrate"]} '
+            f'{self.opt["MinRate"]} {self.opt["MaxRate"]} '
+            f'{self.opt["Bufsize"]} {self.opt["CRF"]} '
+            f'{self.opt["Deadline"]} {self.opt["CpuUsed"]} '
+            f'{self.opt["RowMthreading"]} {self.opt["Preset"]} '
+            f'{self.opt["Profile"]} {self.opt["Level"]} '
+            f'{self.opt["Tune"]} {self.opt["AspectRatio"]} '
+            f'{self.opt["FPS"]} {self.opt["VFilters"]} '
+            f'{self.opt["PixFmt"]} -map 0:v:0 -an -sn -dn '
+            f'-map_metadata -1 -map_chapters -1'
+                )
+        cmd_a = (
+            f'-vn -sn -dn {self.opt["AudioCodec"][0]} '
+            f'{self.opt["AudioCodec"][1]} {self.opt["AudioBitrate"][1]} '
+            f'{self.opt["AudioRate"][1]} {self.opt["AudioChannel"][1]} '
+            f'{self.opt["AudioDepth"][1]} {self.opt["AudioOutMap"][0]}'
+                )
+        submap = ('-sn' if self.opt["SubtitleMap"] == '-sn'
+                  else '-map 1:s?')
+        cmd_mux = (f'-map 0:v {submap} -map_chapters 1 -map_metadata 1 '
+                   f'-c:v copy -c:a copy {self.opt["WebOptim"]}'
+                   )
+        pass1 = " ".join(cmd_v.split())
+        pass2 = " ".join(cmd_a.split())
+        pass3 = " ".join(cmd_mux.split())
+        valupdate = self.update_dict(countmax, [''])
+        title = 'Segmented Video Encoding'
+        ending = Formula(self, valupdate[0], valupdate[1], title)
+
+        if ending.ShowModal() == wx.ID_OK:
+            self.parent.switch_to_processing('segmentpass',
+                                             f_src,
+                                             self.opt["OutputFormat"],
+                                             destin,
+                                             None,
+                                             [pass1, pass2, pass3],
+                                             '',
+                                             audnorm,
+                                             logname,
+                                             countmax,
+                                             )
+    # ------------------------------------------------------------------#
+
     def video_ebu_2pass(self, f_src, destin, countmax, logname):
         """
         Define the ffmpeg command strings for batch process with
@@ -2307,6 +2487,10 @@ class AV_Conv(wx.Panel):
             normalize = 'RMS'
         elif self.opt["EBU"]:
             normalize = 'EBU R128'
+        elif self.fused_analysis():
+            normalize = _('%s (on the first pass)') % (
+                        'PEAK' if self.rdbx_normalize.GetSelection() == 1
+                        else 'RMS')
         else:
             normalize = _('Off')
         if self.cmb_Vcont.GetValue() == "Copy":
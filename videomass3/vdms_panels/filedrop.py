@@ -26,9 +26,12 @@
 #########################################################
 import wx
 import os
+from itertools import chain
+from functools import partial
+from pubsub import pub
 from videomass3.vdms_io import IO_tools
-from videomass3.vdms_utils.utils import time_seconds
-from videomass3.vdms_io import IO_tools
+from videomass3.vdms_utils.utils import scan_files, format_bytes
+from videomass3.vdms_threads.probe_files import ProbeFiles
 
 
 class MyListCtrl(wx.ListCtrl):
@@ -41,6 +44,9 @@ class MyListCtrl(wx.ListCtrl):
     YELLOW = '#a29500'
     GREENOLIVE = '#6aaf23'
     ORANGE = '#f28924'
+    PROGRESS_MIN = 10  # min dropped files to show a progress dialog
+    get = wx.GetApp()
+    MEDIA_EXT = set(get.MEDIAext.lower().split())  # imported from folders
     # ----------------------------------------------------------------------
 
     def __init__(self, parent):
@@ -48,64 +54,174 @@ class MyListCtrl(wx.ListCtrl):
         self.index = None
         self.parent = parent  # parent is DnDPanel class
         self.data = self.parent.data
+        self.prober = None  # the ProbeFiles thread
+        self.progress = None  # the progress dialog of a drop
+        self.total = None  # files of the drop, None if walking folders
+        self.fingerprints = {}  # {fingerprint: filename} of the data
 
         wx.ListCtrl.__init__(self, parent, style=wx.LC_REPORT |
                              wx.LC_SINGLE_SEL
                              )
+        pub.subscribe(self.probeUpdate, "PROBE_EVT")
+        pub.subscribe(self.probeEnd, "PROBE_END_EVT")
     # ----------------------------------------------------------------------#
 
-    def dropUpdate(self, path):
+    def dropUpdate(self, filenames):
         """
-        Update list-control during drag and drop
+        Update list-control during drag and drop: the accepted
+        files are probed by a ProbeFiles thread and each row is
+        inserted by `probeUpdate` as soon as its data arrives,
+        in the order of the drop. The dropped folders are walked
+        lazily by the thread itself, which gets their media files
+        (see MEDIA_EXT) as the probes go on. The drops of many
+        files or of folders show a progress dialog that allows
+        to cancel.
+
+        """
+        if self.prober and self.prober.is_alive():
+            self.parent.statusbar_msg(_("Please wait, the files of the "
+                                        "previous drop are being added"),
+                                      MyListCtrl.YELLOW)
+            return
+        known = set([x.filename for x in self.data])
+        accepted, folders = [], []
+        for path in filenames:
+            if os.path.isdir(path):
+                folders.append(path)
+            elif self.checkFile(path, known):
+                accepted.append(path)
+                known.add(path)
+        if not accepted and not folders:
+            return
+
+        self.total = None if folders else len(accepted)
+        if folders:
+            walk = [scan_files(x, MyListCtrl.MEDIA_EXT, known)
+                    for x in folders]
+            accepted = chain(accepted, *walk)
+
+        if self.total is None or self.total >= MyListCtrl.PROGRESS_MIN:
+            self.progress = wx.ProgressDialog(_("Videomass - Adding files"),
+                                              _("Loading..."),
+                                              maximum=self.total or 100,
+                                              parent=self.parent,
+                                              style=wx.PD_CAN_ABORT |
+                                              wx.PD_APP_MODAL |
+                                              wx.PD_ELAPSED_TIME |
+                                              wx.PD_REMAINING_TIME
+                                              )
+        else:
+            self.parent.statusbar_msg(_("Loading..."), None)
+
+        self.prober = ProbeFiles(accepted, IO_tools.probeRecord,
+                                 partial(wx.CallAfter, pub.sendMessage))
+    # ----------------------------------------------------------------------#
+
+    def checkFile(self, path, known):
+        """
+        Reject files without extension and files already in
+        the 'known' set. Return True if accepted.
 
         """
-        self.index = self.GetItemCount()
-        msg_dir = _("Directories are not allowed, just add files, please.")
         msg_noext = _("File without format extension: please give an "
                       "appropriate extension to the file name, example "
                       "'.mkv', '.avi', '.mp3', etc.")
-        if os.path.isdir(path):
-            self.parent.statusbar_msg(msg_dir, MyListCtrl.ORANGE)
-            return
-        elif os.path.splitext(os.path.basename(path))[1] == '':
+        if os.path.splitext(os.path.basename(path))[1] == '':
             self.parent.statusbar_msg(msg_noext, MyListCtrl.ORANGE)
-            return
+            return False
 
-        if not [x for x in self.data if x['format']['filename'] == path]:
-            data = IO_tools.probeInfo(path)
+        elif path in known:
+            mess = _("Duplicate files are rejected: > '%s'") % path
+            self.parent.statusbar_msg(mess, MyListCtrl.YELLOW)
+            return False
 
-            if data[1]:
-                self.parent.statusbar_msg(data[1], MyListCtrl.RED)
-                return
+        return True
+    # ----------------------------------------------------------------------#
 
-            data = eval(data[0])
-            self.InsertItem(self.index, path)
+    def probeUpdate(self, index, filename, data, error):
+        """
+        Receive the probe result of a dropped file from the
+        ProbeFiles thread (pubsub "PROBE_EVT") and insert its row
 
-            if 'duration' not in data['format'].keys():
-                self.SetItem(self.index, 1, 'N/A')
-                data['format']['duration'] = 0
+        """
+        if self.progress:
+            if self.total:
+                keepgoing = self.progress.Update(index + 1, filename)[0]
             else:
+                keepgoing = self.progress.Pulse(filename)[0]
+            if not keepgoing:
+                self.prober.cancel()
+        if self.prober.cancelled.is_set():
+            return  # already queued results of a cancelled drop
+
+        if error:
+            self.parent.statusbar_msg(error, MyListCtrl.RED)
+            return
 
-                t = data['format']['duration'].split(':')
-                s, ms = t[2].split('.')[0], t[2].split('.')[1]
-                t = '%sh : %sm : %ss : %sms' % (t[0], t[1], s, ms)
-                self.SetItem(self.index, 1, t)
-                data.get('format')['time'] = data.get('format').pop('duration')
-                time = time_seconds(data.get('format')['time'])
-                data['format']['duration'] = time
-
-            media = data['streams'][0]['codec_type']
-            formatname = data['format']['format_long_name']
-            self.SetItem(self.index, 2, '%s: %s' % (media, formatname))
-            self.SetItem(self.index, 3, data['format']['size'])
-            self.index += 1
-            self.data.append(data)
-            self.parent.statusbar_msg('', None)
-            self.parent.tr()
+        self.index = self.GetItemCount()
+        self.InsertItem(self.index, filename)
 
+        if not data.time:
+            self.SetItem(self.index, 1, 'N/A')
         else:
-            mess = _("Duplicate files are rejected: > '%s'") % path
-            self.parent.statusbar_msg(mess, MyListCtrl.YELLOW)
+            t = data.time.split(':')
+            s, ms = t[2].split('.')[0], t[2].split('.')[1]
+            t = '%sh : %sm : %ss : %sms' % (t[0], t[1], s, ms)
+            self.SetItem(self.index, 1, t)
+
+        self.SetItem(self.index, 2, '%s: %s' % (data.media_type,
+                                                data.format_name))
+        self.SetItem(self.index, 3, 'N/A' if data.size is None else
+                     format_bytes(data.size))
+        original = self.fingerprints.get(data.fingerprint)
+        if original:
+            self.SetItemTextColour(self.index, MyListCtrl.ORANGE)
+            mess = _("Likely duplicate of '%s': > '%s'") % (original,
+                                                            filename)
+            self.parent.statusbar_msg(mess, MyListCtrl.ORANGE)
+        elif data.fingerprint:
+            self.fingerprints[data.fingerprint] = filename
+        self.index += 1
+        self.data.append(data)
+    # ----------------------------------------------------------------------#
+
+    def probeEnd(self, count, cancelled):
+        """
+        The ProbeFiles thread is finished (pubsub "PROBE_END_EVT")
+
+        """
+        if self.progress:
+            self.progress.Destroy()
+            self.progress = None
+        if cancelled:
+            self.parent.statusbar_msg(_("Adding files cancelled"),
+                                      MyListCtrl.YELLOW)
+        elif not count:
+            self.parent.statusbar_msg(_("No media files found"),
+                                      MyListCtrl.YELLOW)
+        else:
+            self.parent.statusbar_msg('', None)
+        self.parent.tr()
+    # ----------------------------------------------------------------------#
+
+    def resetFingerprints(self):
+        """
+        Rebuild the fingerprints of the data after a removal
+
+        """
+        self.fingerprints = {}
+        for rec in self.data:
+            if rec.fingerprint and rec.fingerprint not in self.fingerprints:
+                self.fingerprints[rec.fingerprint] = rec.filename
+    # ----------------------------------------------------------------------#
+
+    def cancelDrop(self):
+        """
+        Cancel the adding of the dropped files, if any
+
+        """
+        if self.prober and self.prober.is_alive():
+            self.prober.cancel()
     # ----------------------------------------------------------------------#
 
 
@@ -128,8 +244,7 @@ class FileDrop(wx.FileDropTarget):
         When files are dropped, write where they were dropped and then
         the file paths themselves
         """
-        for filepath in filenames:
-            self.window.dropUpdate(filepath)  # update list control
+        self.window.dropUpdate(filenames)  # update list control
 
         return True
     # ----------------------------------------------------------------------#
@@ -163,7 +278,7 @@ class FileDnD(wx.Panel):
         self.flCtrl.SetDropTarget(file_drop_target)  # Make drop target.
         # create widgets
         sizer = wx.BoxSizer(wx.VERTICAL)
-        infomsg = _("Drag one or more files below")
+        infomsg = _("Drag one or more files or folders below")
         lbl_info = wx.StaticText(self, label=infomsg)
         sizer.Add(lbl_info, 0, wx.ALL, 5)
         sizer.Add(self.flCtrl, 1, wx.EXPAND | wx.ALL, 5)
@@ -176,6 +291,8 @@ class FileDnD(wx.Panel):
         sizer_media.Add(btn_delsel, 1, wx.ALL | wx.EXPAND, 5)
         btn_clear = wx.Button(self, wx.ID_CLEAR, "")
         sizer_media.Add(btn_clear, 1, wx.ALL | wx.EXPAND, 5)
+        btn_addir = wx.Button(self, wx.ID_ANY, _("Add folder..."))
+        sizer_media.Add(btn_addir, 1, wx.ALL | wx.EXPAND, 5)
         outdirmsg = _("Output Directory")
         lbl_outdir = wx.StaticText(self, label=outdirmsg)
         sizer.Add(lbl_outdir, 0, wx.ALL, 5)
@@ -212,11 +329,14 @@ class FileDnD(wx.Panel):
         # Tooltip
         btn_delsel.SetToolTip(_('Remove the selected file from the list'))
         btn_clear.SetToolTip(_('Delete all files from the list'))
+        btn_addir.SetToolTip(_('Add the media files of a folder and of '
+                               'its subfolders'))
         tip = (_('Choose another output directory for files saving'))
         self.btn_save.SetToolTip(tip)
         # Binding (EVT)
         self.Bind(wx.EVT_BUTTON, self.deleteAll, btn_clear)
         self.Bind(wx.EVT_BUTTON, self.delSelect, btn_delsel)
+        self.Bind(wx.EVT_BUTTON, self.addFolder, btn_addir)
         self.Bind(wx.EVT_LIST_ITEM_SELECTED, self.on_select, self.flCtrl)
         self.Bind(wx.EVT_LIST_ITEM_DESELECTED, self.on_deselect, self.flCtrl)
         self.Bind(wx.EVT_LIST_ITEM_ACTIVATED, self.on_doubleClick, self.flCtrl)
@@ -296,6 +416,20 @@ class FileDnD(wx.Panel):
                 self.flCtrl.DeleteItem(item)
                 self.on_deselect(self)
                 self.data.pop(item)
+                self.flCtrl.resetFingerprints()
+    # ----------------------------------------------------------------------
+
+    def addFolder(self, event):
+        """
+        Choose a folder and add its media files, as if it
+        was dropped
+
+        """
+        dlg = wx.DirDialog(self, _("Choose a folder to add"), "",
+                           wx.DD_DEFAULT_STYLE | wx.DD_DIR_MUST_EXIST)
+        if dlg.ShowModal() == wx.ID_OK:
+            self.flCtrl.dropUpdate([dlg.GetPath()])
+        dlg.Destroy()
     # ----------------------------------------------------------------------
 
     def deleteAll(self, event):
@@ -305,8 +439,10 @@ class FileDnD(wx.Panel):
         Stream/play select imported file - Stream/display imported...
         """
         # self.flCtrl.ClearAll()
+        self.flCtrl.cancelDrop()
         self.flCtrl.DeleteAllItems()
         del self.data[:]
+        self.flCtrl.resetFingerprints()
         self.parent.filedropselected = None
         self.tr()
         self.selected = None
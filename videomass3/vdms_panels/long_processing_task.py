@@ -24,17 +24,21 @@
 
 #########################################################
 from __future__ import unicode_literals
-import wx
 import os
+import wx
 from pubsub import pub
 from videomass3.vdms_io.make_filelog import write_log
+from videomass3.vdms_io.job_journal import JobJournal
+from videomass3.vdms_io.log_writer import log_writer
+from videomass3.vdms_io.log_buffer import LogBuffer, severity
 from videomass3.vdms_threads.ydl_pylibdownloader import Ydl_DL_Pylib
 from videomass3.vdms_threads.ydl_executable import Ydl_DL_Exec
 from videomass3.vdms_threads.one_pass import OnePass
 from videomass3.vdms_threads.two_pass import TwoPass
 from videomass3.vdms_threads.two_pass_EBU import Loudnorm
+from videomass3.vdms_threads.segment_pass import SegmentPass
 from videomass3.vdms_threads.picture_exporting import PicturesFromVideo
-from videomass3.vdms_utils.utils import time_human
+from videomass3.vdms_utils.utils import time_human, format_bytes
 
 
 def pairwise(iterable):
@@ -63,6 +67,157 @@ def pairwise(iterable):
 # ----------------------------------------------------------------------#
 
 
+class LogView(wx.ListCtrl):
+    """
+    A virtual list control which shows the lines of a LogBuffer,
+    one row for each line: the widget only draws the visible rows,
+    so that appending is not slower with a long output. It follows
+    the last line unless the user scrolls up or selects a row.
+
+    """
+    def __init__(self, parent, maxlines=LogBuffer.MAXLINES):
+        """
+        maxlines: max number of lines kept in memory
+        """
+        wx.ListCtrl.__init__(self, parent, wx.ID_ANY,
+                             style=wx.LC_REPORT |
+                             wx.LC_VIRTUAL |
+                             wx.LC_NO_HEADER |
+                             wx.LC_SINGLE_SEL
+                             )
+        self.buffer = LogBuffer(maxlines)
+        self.attrs = {}  # {colour: wx.ItemAttr}
+        self.mark = None  # sequence number of the selected line
+        self.InsertColumn(0, '')
+        self.Bind(wx.EVT_SIZE, self.on_size)
+        self.Bind(wx.EVT_LIST_ITEM_SELECTED, self.on_select)
+        self.Bind(wx.EVT_LIST_ITEM_DESELECTED, self.on_select)
+    # ----------------------------------------------------------------------
+
+    def OnGetItemText(self, item, column):
+        """
+        Return the text of a row, called by the widget
+        """
+        return self.buffer.row(item)[0]
+    # ----------------------------------------------------------------------
+
+    def OnGetItemAttr(self, item):
+        """
+        Return the colour attribute of a row, called by the widget
+        """
+        colour = self.buffer.row(item)[2]
+        if colour not in self.attrs:
+            if not hasattr(wx, 'ItemAttr'):
+                itemattr = wx.ListItemAttr
+            else:  # is wxPython >= 4.1
+                itemattr = wx.ItemAttr
+            self.attrs[colour] = itemattr(wx.Colour(colour),
+                                          self.GetBackgroundColour(),
+                                          self.GetFont())
+        return self.attrs[colour]
+    # ----------------------------------------------------------------------
+
+    def on_size(self, event):
+        """
+        The single column takes the whole width
+        """
+        self.SetColumnWidth(0, max(self.GetClientSize()[0], 100))
+        event.Skip()
+    # ----------------------------------------------------------------------
+
+    def on_select(self, event):
+        """
+        Remember the selected line, its row changes when the
+        older lines are dropped
+        """
+        row = self.GetFirstSelected()
+        self.mark = None if row == -1 else self.buffer.seq(row)
+        event.Skip()
+    # ----------------------------------------------------------------------
+
+    def write(self, text, colour, level='text'):
+        """
+        Append a text with the given colour and severity level
+        (see log_buffer.LEVELS), instead of the AppendText of a
+        text control.
+        """
+        self.write_lines([(text, colour, level)])
+    # ----------------------------------------------------------------------
+
+    def write_lines(self, lines):
+        """
+        Append a list of (text, colour, level) items, redrawing
+        the view only once.
+        """
+        rows = self.GetItemCount()
+        follow = (self.mark is None and
+                  self.GetTopItem() + self.GetCountPerPage() >= rows)
+        for text, colour, level in lines:
+            self.buffer.write(text, level, colour)
+        self.refresh()
+        if follow and self.GetItemCount():
+            self.EnsureVisible(self.GetItemCount() - 1)
+    # ----------------------------------------------------------------------
+
+    def refresh(self):
+        """
+        Update the rows count, restore the selected line if it
+        is still shown and redraw the visible rows
+        """
+        self.SetItemCount(len(self.buffer))
+        row = (None if self.mark is None else
+               self.buffer.row_of(self.mark))
+        selected = self.GetFirstSelected()
+        if row is None:
+            self.mark = None
+            if selected != -1:
+                self.Select(selected, 0)
+        elif row != selected:
+            self.Select(row)
+        if self.GetItemCount():
+            self.RefreshItems(self.GetTopItem(),
+                              min(self.GetItemCount() - 1,
+                                  self.GetTopItem() + self.GetCountPerPage()))
+    # ----------------------------------------------------------------------
+
+    def set_filter(self, level):
+        """
+        Show only the lines of the given level or higher
+        """
+        self.buffer.set_filter(level)
+        self.refresh()
+        row = (None if self.mark is None else
+               self.buffer.row_of(self.mark))
+        if row is not None:
+            self.EnsureVisible(row)
+        elif self.GetItemCount():
+            self.EnsureVisible(self.GetItemCount() - 1)
+    # ----------------------------------------------------------------------
+
+    def next_error(self):
+        """
+        Select the next error line after the selected row,
+        return False if there are no errors
+        """
+        row = self.buffer.find('error', self.GetFirstSelected())
+        if row is None:
+            return False
+        self.Select(row)
+        self.Focus(row)
+        self.EnsureVisible(row)
+        self.mark = self.buffer.seq(row)
+        return True
+    # ----------------------------------------------------------------------
+
+    def Clear(self):
+        """
+        Remove all the lines
+        """
+        self.buffer.clear()
+        self.mark = None
+        self.refresh()
+
+
 class Logging_Console(wx.Panel):
     """
     displays a text control for the output logging, a progress bar
@@ -76,6 +231,7 @@ class Logging_Console(wx.Panel):
     get = wx.GetApp()
     OS = get.OS
     LOGDIR = get.LOGdir
+    CACHEDIR = get.CACHEdir
 
     # used msg on text
     MSG_done = _('[Videomass]: DONE !\n')
@@ -118,12 +274,21 @@ class Logging_Console(wx.Panel):
     DEBUG = '#3298FB'  # AZURE for debug messages
     FAILED = '#D21814'  # RED_DEEP if failed
     ABORT = '#A41EA4'  # VIOLET if the user stops the processes
+    # colours of the FFmpeg output lines by severity level
+    LEVELS = {'text': TEXT_2, 'info': INFO, 'warning': WARN, 'error': ERROR}
     #YELLOW = '#C8B72F'  # for warning text messages
     #RED = '#ff0000ff'
     #ORANGE_DEEP = '#E92D15'
     #GREEN = '#008000'
     #DARK_GREEN = '#008000'
     #BLACK = '#242424'
+    # lines kept on the console, the whole output is on the log files
+    MAXLINES = 5000
+    # console filter: (label, lowest severity level shown)
+    FILTERS = [(_('All messages'), 'text'),
+               (_('Info, warnings and errors'), 'info'),
+               (_('Warnings and errors'), 'warning'),
+               (_('Errors only'), 'error')]
     # ------------------------------------------------------------------#
 
     def __init__(self, parent):
@@ -141,6 +306,9 @@ class Logging_Console(wx.Panel):
         self.previus = None  # panel name from which it starts
         self.logname = None  # example: AV_conversions.log
         self.result = None  # result of the final process
+        self.jobs = {}  # active concurrent jobs: {job: [count, dur, time]}
+        self.batch = [0, 0]  # concurrent jobs: [seconds done, total]
+        self.journal = JobJournal(Logging_Console.CACHEDIR)  # resume data
 
         wx.Panel.__init__(self, parent=parent)
         """ Constructor """
@@ -149,13 +317,16 @@ class Logging_Console(wx.Panel):
         lbl = wx.StaticText(self, label=infolbl)
         if Logging_Console.OS != 'Darwin':
             lbl.SetLabelMarkup("<b>%s</b>" % infolbl)
-        self.OutText = wx.TextCtrl(self, wx.ID_ANY, "",
-                                   style=wx.TE_MULTILINE |
-                                   wx.TE_READONLY |
-                                   wx.TE_RICH2
-                                   )
+        self.OutText = LogView(self, Logging_Console.MAXLINES)
         self.ckbx_text = wx.CheckBox(self, wx.ID_ANY, (_("Suppress excess "
                                                          "output")))
+        lbl_filter = wx.StaticText(self, label=_("Show:"))
+        self.cmb_filter = wx.Choice(self, wx.ID_ANY,
+                                    choices=[x[0] for x in
+                                             Logging_Console.FILTERS])
+        self.cmb_filter.SetSelection(0)
+        self.button_error = wx.Button(self, wx.ID_ANY, _("Next error"))
+        self.labDropped = wx.StaticText(self, label="")
         self.barProg = wx.Gauge(self, wx.ID_ANY, range=0)
         self.labPerc = wx.StaticText(self, label="")
         self.button_stop = wx.Button(self, wx.ID_STOP, _("Abort"))
@@ -164,7 +335,14 @@ class Logging_Console(wx.Panel):
         grid = wx.GridSizer(1, 2, 5, 5)
         sizer.Add(lbl, 0, wx.ALL, 5)
         sizer.Add(self.OutText, 1, wx.EXPAND | wx.ALL, 5)
-        sizer.Add(self.ckbx_text, 0, wx.ALL, 5)
+        boxview = wx.BoxSizer(wx.HORIZONTAL)
+        sizer.Add(boxview, 0, wx.EXPAND)
+        boxview.Add(self.ckbx_text, 0, wx.ALL | wx.ALIGN_CENTER_VERTICAL, 5)
+        boxview.Add(lbl_filter, 0, wx.LEFT | wx.ALIGN_CENTER_VERTICAL, 15)
+        boxview.Add(self.cmb_filter, 0, wx.ALL | wx.ALIGN_CENTER_VERTICAL, 5)
+        boxview.Add(self.button_error, 0, wx.ALL | wx.ALIGN_CENTER_VERTICAL,
+                    5)
+        boxview.Add(self.labDropped, 1, wx.ALL | wx.ALIGN_CENTER_VERTICAL, 5)
         sizer.Add(self.barProg, 0, wx.EXPAND | wx.ALL, 5)
         sizer.Add(self.labPerc, 0, wx.ALL, 5)
         sizer.Add(grid, flag=wx.ALIGN_RIGHT | wx.RIGHT, border=5)
@@ -174,9 +352,14 @@ class Logging_Console(wx.Panel):
         self.OutText.SetBackgroundColour(Logging_Console.BACKGROUND)
         self.ckbx_text.SetToolTip(_('If activated, hides some '
                                     'output messages.'))
+        self.cmb_filter.SetToolTip(_('Shows only the messages of the '
+                                     'selected severity or higher'))
+        self.button_error.SetToolTip(_('Selects the next error message'))
         self.button_stop.SetToolTip(_("Stops current process"))
         self.SetSizerAndFit(sizer)
         # bind
+        self.Bind(wx.EVT_CHOICE, self.on_filter, self.cmb_filter)
+        self.Bind(wx.EVT_BUTTON, self.on_next_error, self.button_error)
         self.Bind(wx.EVT_BUTTON, self.on_stop, self.button_stop)
         self.Bind(wx.EVT_BUTTON, self.on_close, self.button_close)
 
@@ -187,6 +370,7 @@ class Logging_Console(wx.Panel):
         pub.subscribe(self.youtubedl_from_import, "UPDATE_YDL_FROM_IMPORT_EVT")
         pub.subscribe(self.youtubedl_exec, "UPDATE_YDL_EXECUTABLE_EVT")
         pub.subscribe(self.update_display, "UPDATE_EVT")
+        pub.subscribe(self.update_progress, "PROGRESS_EVT")
         pub.subscribe(self.update_count, "COUNT_EVT")
         pub.subscribe(self.end_proc, "END_EVT")
     # ----------------------------------------------------------------------
@@ -205,22 +389,38 @@ class Logging_Console(wx.Panel):
             return
 
         self.OutText.Clear(), self.labPerc.SetLabel('')
+        self.labDropped.SetLabel('')
+        self.jobs = {}
+        passes = 2 if varargs[0] in ('twopass', 'two pass EBU') else 1
+        self.batch = [0, round(sum([d for d in duration if d]) * passes)]
         self.logname = varargs[8]  # example: Videomass_VideoConversion.log
         time_seq = self.parent.time_seq  # a time segment
 
         write_log(self.logname, Logging_Console.LOGDIR)  # set initial file LOG
 
+        if varargs[0] in ('onepass', 'twopass', 'two pass EBU'):
+            self.journal.create(panel, varargs, duration, time_seq,
+                                self.parent.time_read,
+                                1 if varargs[0] == 'onepass' else 2)
+
         if varargs[0] == 'onepass':  # from Audio/Video Conv.
             self.PARENT_THREAD = OnePass(varargs, duration,
                                          self.logname, time_seq,
+                                         journal=self.journal,
                                          )
         elif varargs[0] == 'twopass':  # from Video Conv.
             self.PARENT_THREAD = TwoPass(varargs, duration,
-                                         self.logname, time_seq
+                                         self.logname, time_seq,
+                                         journal=self.journal,
                                          )
+        elif varargs[0] == 'segmentpass':  # from Video Conv.
+            self.PARENT_THREAD = SegmentPass(varargs, duration,
+                                             self.logname, time_seq
+                                             )
         elif varargs[0] == 'two pass EBU':  # from Audio/Video Conv.
             self.PARENT_THREAD = Loudnorm(varargs, duration,
-                                          self.logname, time_seq
+                                          self.logname, time_seq,
+                                          journal=self.journal,
                                           )
         elif varargs[0] == 'savepictures':
             self.PARENT_THREAD = PicturesFromVideo(varargs, duration,
@@ -241,44 +441,41 @@ class Logging_Console(wx.Panel):
         pubsub "UPDATE_YDL_FROM_IMPORT_EVT" .
         """
         if status == 'ERROR':
-            self.OutText.SetDefaultStyle(wx.TextAttr(Logging_Console.ERROR))
-            self.OutText.AppendText('%s\n' % output)
-            self.OutText.SetDefaultStyle(wx.TextAttr(Logging_Console.FAILED))
-            self.OutText.AppendText(Logging_Console.MSG_failed)
+            self.OutText.write('%s\n' % output, Logging_Console.ERROR, 'error')
+            self.OutText.write(Logging_Console.MSG_failed,
+                               Logging_Console.FAILED, 'error')
             self.result = 'failed'
 
         elif status == 'WARNING':
-            self.OutText.SetDefaultStyle(wx.TextAttr(Logging_Console.WARN))
-            self.OutText.AppendText('%s\n' % output)
+            self.OutText.write('%s\n' % output, Logging_Console.WARN,
+                               'warning')
 
         elif status == 'DEBUG':
             if '[download] Destination' in output:
-                self.OutText.SetDefaultStyle(wx.TextAttr(Logging_Console.DEBUG))
-                self.OutText.AppendText('%s\n' % output)
+                self.OutText.write('%s\n' % output, Logging_Console.DEBUG,
+                                   'info')
 
             elif '[info]' in output:
-                self.OutText.SetDefaultStyle(wx.TextAttr(Logging_Console.INFO))
-                self.OutText.AppendText('%s\n' % output)
+                self.OutText.write('%s\n' % output, Logging_Console.INFO,
+                                   'info')
 
             elif '[download]' not in output:
-                self.OutText.SetDefaultStyle(wx.TextAttr(Logging_Console.TEXT_2))
-                self.OutText.AppendText('%s\n' % output)
+                self.OutText.write('%s\n' % output, Logging_Console.TEXT_2,
+                                   'text')
 
-                with open(os.path.join(Logging_Console.LOGDIR,
-                                       self.logname), "a") as logerr:
-                    logerr.write("[YOUTUBE_DL]: %s > %s\n" % (status, output))
+                log_writer(self.logname, Logging_Console.LOGDIR).write(
+                    "[YOUTUBE_DL]: %s > %s\n" % (status, output))
         elif status == 'DOWNLOAD':
             self.labPerc.SetLabel("%s" % duration[0])
             self.barProg.SetValue(duration[1])
 
         elif status == 'FINISHED':
-            self.OutText.SetDefaultStyle(wx.TextAttr(Logging_Console.TEXT_2))
-            self.OutText.AppendText('%s\n' % duration)
+            self.OutText.write('%s\n' % duration, Logging_Console.TEXT_2,
+                               'text')
 
         if status in ['ERROR', 'WARNING']:
-            with open(os.path.join(Logging_Console.LOGDIR,
-                                   self.logname), "a") as logerr:
-                logerr.write("[YOUTUBE_DL]: %s\n" % (output))
+            log_writer(self.logname, Logging_Console.LOGDIR).write(
+                "[YOUTUBE_DL]: %s\n" % (output))
     # ---------------------------------------------------------------------#
 
     def youtubedl_exec(self, output, duration, status):
@@ -290,11 +487,11 @@ class Logging_Console(wx.Panel):
         if not status == 0:  # error, exit status of the p.wait
             if output:
                 if 'ERROR:' in output:
-                    self.OutText.SetDefaultStyle(wx.TextAttr(Logging_Console.ERROR))
-                    self.OutText.AppendText('%s\n' % output)
+                    self.OutText.write('%s\n' % output, Logging_Console.ERROR,
+                                       'error')
 
-            self.OutText.SetDefaultStyle(wx.TextAttr(Logging_Console.ERROR_2))
-            self.OutText.AppendText(Logging_Console.MSG_failed)
+            self.OutText.write(Logging_Console.MSG_failed,
+                               Logging_Console.ERROR_2, 'error')
             self.result = 'failed'
             return
 
@@ -303,8 +500,8 @@ class Logging_Console(wx.Panel):
                 try:
                     i = float(output.split()[1].split('%')[0])
                 except ValueError:
-                    self.OutText.SetDefaultStyle(wx.TextAttr(Logging_Console.WARN))
-                    self.OutText.AppendText(' %s' % output)
+                    self.OutText.write(' %s' % output, Logging_Console.WARN,
+                                       'warning')
                 else:
                     self.barProg.SetValue(i)
                     self.labPerc.SetLabel("%s" % output)
@@ -313,23 +510,21 @@ class Logging_Console(wx.Panel):
         else:  # append all others lines on the textctrl and log file
             if not self.ckbx_text.IsChecked():  # not print the output
                 if '[info]' in output:
-                    self.OutText.SetDefaultStyle(wx.TextAttr(Logging_Console.INFO))
-                    self.OutText.AppendText(' %s' % output)
+                    self.OutText.write(' %s' % output, Logging_Console.INFO,
+                                       'info')
                 elif 'WARNING:' in output:
-                    self.OutText.SetDefaultStyle(wx.TextAttr(Logging_Console.WARN))
-                    self.OutText.AppendText(' %s' % output)
+                    self.OutText.write(' %s' % output, Logging_Console.WARN,
+                                       'warning')
                 elif 'ERROR:' not in output:
-                    self.OutText.SetDefaultStyle(wx.TextAttr(Logging_Console.TEXT_2))
-                    self.OutText.AppendText(' %s' % output)
+                    self.OutText.write(' %s' % output, Logging_Console.TEXT_2,
+                                       'text')
 
-            with open(os.path.join(Logging_Console.LOGDIR,
-                                   self.logname), "a") as logerr:
-                logerr.write("[YOUTUBE-DL]: %s" % (output))
-                # write a row error into file log
+            log_writer(self.logname, Logging_Console.LOGDIR).write(
+                "[YOUTUBE-DL]: %s" % (output))  # write a row into file log
 
     # ---------------------------------------------------------------------#
 
-    def update_display(self, output, duration, status):
+    def update_display(self, output, duration, status, job=None):
         """
         Receive message from thread of the second loops process
         by wxCallafter and pubsub UPDATE_EVT.
@@ -348,13 +543,24 @@ class Logging_Console(wx.Panel):
         marking it in yellow, then in capturing the error if present,
         but exiting immediately after the function.
 
+        The 'job' keyword is not None only when several files are
+        converted at the same time (see 'update_jobs' method).
+        The threads that use the FFmpegRunner send the progress
+        on the "PROGRESS_EVT" instead (see 'update_progress'),
+        and the 'output' may contain several lines batched by
+        the ProgressBus.
+
         """
         # if self.ckbx_text.IsChecked(): #ffmpeg output messages in real time:
         #    self.OutText.AppendText(output)
 
         if not status == 0:  # error, exit status of the p.wait
-            self.OutText.SetDefaultStyle(wx.TextAttr(Logging_Console.ERROR_2))
-            self.OutText.AppendText(Logging_Console.MSG_failed)
+            msg = Logging_Console.MSG_failed
+            if job in self.jobs:
+                msg = '%s: %s' % (self.jobs[job][0], msg)
+                self.job_done(job)
+            self.OutText.write(msg, Logging_Console.ERROR_2, 'error')
+            self.show_dropped()
             self.result = 'failed'
             return  # must be return here
 
@@ -363,6 +569,10 @@ class Logging_Console(wx.Panel):
             pos = output[i:i+8].split(':')
             hours, minutes, seconds = pos[0], pos[1], pos[2]
             timesum = (int(hours) * 3600 + int(minutes)) * 60 + int(seconds)
+            if job is not None:
+                self.jobs[job][2] = timesum
+                self.update_jobs()
+                return
             self.barProg.SetValue(timesum)
             percentage = timesum / duration * 100
             out = [a for a in "=".join(output.split()).split('=') if a]
@@ -378,39 +588,85 @@ class Logging_Console(wx.Panel):
             del output, duration
 
         else:  # append all others lines on the textctrl and log file
+            if job is not None:  # tells which file the lines belong to
+                output = ''.join(['[%s] %s' % (self.jobs[job][0], line)
+                                  for line in output.splitlines(True)])
             if not self.ckbx_text.IsChecked():  # not print the output
-                if [x for x in ('info', 'Info') if x in output]:
-                    self.OutText.SetDefaultStyle(wx.TextAttr(Logging_Console.INFO))
-                    self.OutText.AppendText('%s' % output)
-
-                elif [x for x in ('Failed', 'failed', 'Error', 'error')
-                      if x in output]:
-                    self.OutText.SetDefaultStyle(wx.TextAttr(Logging_Console.ERROR))
-                    self.OutText.AppendText('%s' % output)
-
-                elif [x for x in ('warning', 'Warning') if x in output]:
-                    self.OutText.SetDefaultStyle(wx.TextAttr(Logging_Console.WARN))
-                    self.OutText.AppendText('%s' % output)
+                lines = []  # may be a batch, each line has its level
+                for line in output.splitlines():
+                    level = severity(line)
+                    lines.append((line, Logging_Console.LEVELS[level], level))
+                self.OutText.write_lines(lines)
+                self.show_dropped()
+
+            log_writer(self.logname, Logging_Console.LOGDIR).write(
+                ''.join(["[FFMPEG]: %s" % line for line in
+                         output.splitlines(True)]))  # write into file log
+    # ----------------------------------------------------------------------
 
-                else:
-                    self.OutText.SetDefaultStyle(wx.TextAttr(Logging_Console.TEXT_2))
-                    self.OutText.AppendText('%s' % output)
+    def update_progress(self, progress, duration, job=None):
+        """
+        Receive the FFmpeg progress records (see the Progress class
+        of ffmpeg_runner.py) by wxCallafter and pubsub PROGRESS_EVT,
+        to update the bar progress and the percentage label.
 
-            with open(os.path.join(Logging_Console.LOGDIR,
-                                   self.logname), "a") as logerr:
-                logerr.write("[FFMPEG]: %s" % (output))
-                # write a row error into file log
+        """
+        if progress.seconds is None:
+            return
+        timesum = progress.seconds
+        if job is not None:
+            if job in self.jobs:
+                self.jobs[job][2] = timesum
+                self.update_jobs()
+            return
+        if not duration:
+            self.labPerc.SetLabel("Processing... %s" % time_human(timesum))
+            return
+        self.barProg.SetValue(min(round(timesum), self.barProg.GetRange()))
+        percentage = min(timesum / duration * 100, 100)
+        ffprog = []
+        if progress.frame is not None:
+            ffprog.append("frame: %s | " % progress.frame)
+        if progress.fps is not None:
+            ffprog.append("fps: %s | " % progress.fps)
+        if progress.total_size is not None:
+            ffprog.append("size: %s | " % format_bytes(progress.total_size))
+        ffprog.append("time: %s | " % time_human(timesum))
+        if progress.bitrate is not None:
+            ffprog.append("bitrate: %skbits/s | " % progress.bitrate)
+        if progress.speed is not None:
+            ffprog.append("speed: %sx | " % progress.speed)
+
+        remaining = time_human(max(0, duration - timesum))
+        self.labPerc.SetLabel("Processing... %s%% | %sTime Remaining: %s" %
+                              (str(int(percentage)), "".join(ffprog),
+                               remaining)
+                              )
     # ----------------------------------------------------------------------
 
-    def update_count(self, count, duration, fname, end):
+    def update_count(self, count, duration, fname, end, job=None):
         """
         Receive message from first 'for' loop in the thread process.
         This method can be used even for non-loop threads.
 
         """
+        if job is not None:
+            if end == 'ok':
+                self.OutText.write('%s: %s' % (self.jobs[job][0],
+                                               Logging_Console.MSG_done),
+                                   Logging_Console.SUCCESS, 'info')
+                self.job_done(job)
+                return
+            elif end == '':
+                self.jobs[job] = [count, duration, 0]
+                self.barProg.SetRange(max(1, self.batch[1]))
+                self.update_jobs()
+            elif job in self.jobs:
+                self.job_done(job)
+
         if end == 'ok':
-            self.OutText.SetDefaultStyle(wx.TextAttr(Logging_Console.SUCCESS))
-            self.OutText.AppendText(Logging_Console.MSG_done)
+            self.OutText.write(Logging_Console.MSG_done,
+                               Logging_Console.SUCCESS, 'info')
             lab = "%s" % self.labPerc.GetLabel()
             if lab.split('|')[0] == 'Processing... 99% ':
                 relab = lab.replace('Processing... 99%', 'Processing... 100%')
@@ -418,44 +674,109 @@ class Logging_Console(wx.Panel):
             return
         # if STATUS_ERROR == 1:
         if end == 'error':
-            self.OutText.SetDefaultStyle(wx.TextAttr(Logging_Console.WARN))
-            self.OutText.AppendText('\n%s\n' % (count))
+            self.OutText.write('\n%s\n' % (count), Logging_Console.WARN,
+                               'error')
             self.ERROR = True
         else:
-            self.barProg.SetRange(duration)  # set la durata complessiva
-            self.barProg.SetValue(0)  # resetto la prog bar
-            self.OutText.SetDefaultStyle(wx.TextAttr(Logging_Console.NORM_TEXT))
-            self.OutText.AppendText('\n%s : "%s"\n' % (count, fname))
+            if job is None:
+                self.barProg.SetRange(duration)  # set la durata complessiva
+                self.barProg.SetValue(0)  # resetto la prog bar
+            self.OutText.write('\n%s : "%s"\n' % (count, fname),
+                               Logging_Console.NORM_TEXT, 'info')
+    # ----------------------------------------------------------------------
 
+    def job_done(self, job):
+        """
+        Remove a finished job from the active jobs and add its
+        duration to the completed part of the batch.
+        """
+        count, duration, timesum = self.jobs.pop(job)
+        self.batch[0] += duration if duration else 0
+        self.update_jobs()
     # ----------------------------------------------------------------------
+
+    def update_jobs(self):
+        """
+        Shows the overall batch progress on the progress bar and
+        a label row for each active job, when several files are
+        converted at the same time.
+        """
+        timesum = self.batch[0] + sum([j[2] for j in self.jobs.values()])
+        total = max(1, self.batch[1])
+        self.barProg.SetValue(min(round(timesum), total))
+        rows = [_("Processing... %s%% | Active jobs: %s") %
+                (int(timesum / total * 100), len(self.jobs))]
+        for job in sorted(self.jobs):
+            count, duration, elapsed = self.jobs[job]
+            if duration:
+                rows.append("%s: %s%% | Time Remaining: %s" %
+                            (count, int(elapsed / duration * 100),
+                             time_human(max(0, duration - elapsed))))
+            else:  # not a part of the batch duration (e.g. audio track)
+                rows.append("%s: %s" % (count, time_human(elapsed)))
+        self.labPerc.SetLabel('\n'.join(rows))
+        self.Layout()
+    # ----------------------------------------------------------------------
+
     def end_proc(self):
         """
         At the end of the process
         """
         if self.ERROR is True:
-            self.OutText.SetDefaultStyle(wx.TextAttr(Logging_Console.ERROR_2))
-            self.OutText.AppendText(Logging_Console.MSG_taskfailed)
+            self.OutText.write(Logging_Console.MSG_taskfailed,
+                               Logging_Console.ERROR_2, 'error')
 
         elif self.ABORT is True:
-            self.OutText.SetDefaultStyle(wx.TextAttr(Logging_Console.ABORT))
-            self.OutText.AppendText(Logging_Console.MSG_interrupted)
+            self.OutText.write(Logging_Console.MSG_interrupted,
+                               Logging_Console.ABORT, 'warning')
 
         else:
             if not self.result:
-                endmsg = Logging_Console.MSG_completed
-                self.OutText.SetDefaultStyle(wx.TextAttr(Logging_Console.NORM_TEXT))
+                self.OutText.write(Logging_Console.MSG_completed,
+                                   Logging_Console.NORM_TEXT, 'info')
             else:
-                endmsg = Logging_Console.MSG_unfinished
-                self.OutText.SetDefaultStyle(wx.TextAttr(Logging_Console.WARN))
+                self.OutText.write(Logging_Console.MSG_unfinished,
+                                   Logging_Console.WARN, 'warning')
             self.parent.statusbar_msg(_('...Finished'), None)
-            self.OutText.AppendText(endmsg)
             self.barProg.SetValue(0)
 
+        self.journal.remove()  # the batch is over, nothing to resume
+        log_writer(self.logname, Logging_Console.LOGDIR).flush()
+        self.show_dropped()
         self.button_stop.Enable(False)
         self.button_close.Enable(True)
         self.PARENT_THREAD = None
     # ----------------------------------------------------------------------
 
+    def show_dropped(self):
+        """
+        Tells how many older lines are no longer on the console
+        and where to read them.
+        """
+        dropped = self.OutText.buffer.dropped
+        if dropped and self.logname:
+            self.labDropped.SetLabel(
+                _("{0} older lines are in {1}").format(
+                    dropped, os.path.join(Logging_Console.LOGDIR,
+                                          self.logname)))
+    # ----------------------------------------------------------------------
+
+    def on_filter(self, event):
+        """
+        Shows only the messages of the selected severity or higher
+        """
+        level = Logging_Console.FILTERS[self.cmb_filter.GetSelection()][1]
+        self.OutText.set_filter(level)
+    # ----------------------------------------------------------------------
+
+    def on_next_error(self, event):
+        """
+        Scrolls the console to the next error message
+        """
+        if not self.OutText.next_error():
+            self.parent.statusbar_msg(_('No errors on the console'), None)
+    # ----------------------------------------------------------------------
+
     def on_stop(self, event):
         """
         The user change idea and was stop process
@@ -498,6 +819,7 @@ class Logging_Console(wx.Panel):
         self.ERROR = False
         self.logname = None
         self.result = None
+        self.jobs = {}
         # self.OutText.Clear()
         # self.labPerc.SetLabel('')
         self.parent.panelShown(self.previus)  # retrieve at previusly panel
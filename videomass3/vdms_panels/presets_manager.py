@@ -611,6 +611,9 @@ class PrstPan(wx.Panel):
             volume = list()
             if self.rdbx_norm.GetSelection() == 1:  # peak Analyzes
                 for f, v in zip(self.parent.file_src, data[0]):
+                    if v is None:  # no audio data, keep the files order
+                        volume.append('  ')
+                        continue
                     maxvol = v[0].split(' ')[0]
                     meanvol = v[1].split(' ')[0]
                     offset = float(maxvol) - float(target)
@@ -629,6 +632,9 @@ class PrstPan(wx.Panel):
                                              ))
             elif self.rdbx_norm.GetSelection() == 2:  # rms Analyzes
                 for f, v in zip(self.parent.file_src, data[0]):
+                    if v is None:  # no audio data, keep the files order
+                        volume.append('  ')
+                        continue
                     maxvol = v[0].split(' ')[0]
                     meanvol = v[1].split(' ')[0]
                     offset = float(meanvol) - float(target)
@@ -0,0 +1,197 @@
+# -*- coding: UTF-8 -*-
+# Name: adaptive_jobs.py
+# Porpose: adapts the number of concurrent FFmpeg jobs
+# Compatibility: Python3
+# Author: Gianluca Pernigoto <jeanlucperni@gmail.com>
+# Copyright: (c) 2018/2020 Gianluca Pernigoto <jeanlucperni@gmail.com>
+# license: GPL3
+# Rev: December.10.2020 *PEP8 compatible*
+#########################################################
+# This file is part of Videomass.
+
+#    Videomass is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+
+#    Videomass is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+
+#    You should have received a copy of the GNU General Public License
+#    along with Videomass.  If not, see <http://www.gnu.org/licenses/>.
+
+#########################################################
+import os
+import time
+from threading import Condition
+
+
+def system_load():
+    """
+    Return the load average of the last minute divided by
+    the number of cpus or None if it is not available (MS
+    Windows)
+    """
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except (AttributeError, OSError):
+        return None
+
+
+def free_memory():
+    """
+    Return the fraction (0.0 to 1.0) of the available memory,
+    or None if it is not available (Linux only).
+    """
+    try:
+        with open('/proc/meminfo', 'r') as meminfo:
+            info = dict([line.split(':', 1) for line in meminfo])
+        total = int(info['MemTotal'].split()[0])
+        available = int(info['MemAvailable'].split()[0])
+    except (OSError, KeyError, ValueError, IndexError):
+        return None
+
+    return available / total if total else None
+
+
+class JobsController(object):
+    """
+    Adapts the number of FFmpeg jobs running at the same time
+    ('limit') between 1 and 'maximum', to get the greatest
+    aggregate throughput, that is the sum of the `speed` of
+    the running jobs (seconds of media encoded per second).
+
+    The jobs call `acquire` before starting FFmpeg and `release`
+    when it is finished, while `sample` receives their progress
+    records. At every 'window' seconds the controller:
+
+      - decreases the limit if the system is overloaded (load
+        average per cpu greater than MAX_LOAD or free memory
+        less than MIN_MEMORY);
+      - goes back if the last increase did not improve the
+        throughput by GAIN at least, then holds the limit for
+        some windows;
+      - otherwise increases the limit, if all the slots are busy
+        and the system has got some spare cpu.
+
+    Each decision is passed to the 'log' callable as a string.
+
+    """
+    MAX_LOAD = 1.5  # load average per cpu
+    MIN_MEMORY = 0.10  # fraction of free memory
+    GAIN = 1.05  # min throughput ratio to keep an increase
+    HOLD = 3  # windows to wait after a step back
+
+    def __init__(self, maximum, window=10.0, log=None, load=system_load,
+                 memory=free_memory, clock=time.monotonic):
+        """
+        maximum: the max number of concurrent jobs
+        window: seconds between two decisions
+        log: callable(message) or None
+        load, memory, clock: callables for the system status
+        """
+        self.maximum = max(1, maximum)
+        self.limit = min(2, self.maximum)
+        self.window = window
+        self.log = log
+        self.load = load
+        self.memory = memory
+        self.clock = clock
+        self.cond = Condition()
+        self.running = 0
+        self.speeds = {}  # {job: last speed}
+        self.fps = {}  # {job: last fps}
+        self.last = clock()
+        self.previous = None  # throughput before the last increase
+        self.hold = 0
+    # ----------------------------------------------------------------#
+
+    def acquire(self):
+        """
+        Wait for a free slot
+        """
+        with self.cond:
+            while self.running >= self.limit:
+                self.cond.wait()
+            self.running += 1
+    # ----------------------------------------------------------------#
+
+    def release(self, job):
+        """
+        Free the slot of a finished job
+        """
+        with self.cond:
+            self.running -= 1
+            self.speeds.pop(job, None)
+            self.fps.pop(job, None)
+            self.cond.notify_all()
+    # ----------------------------------------------------------------#
+
+    def sample(self, job, progress):
+        """
+        Receive a progress record (see ffmpeg_runner.Progress)
+        of a running job
+        """
+        with self.cond:
+            if progress.speed is not None:
+                self.speeds[job] = progress.speed
+            if progress.fps is not None:
+                self.fps[job] = progress.fps
+            if self.clock() - self.last >= self.window:
+                self.last = self.clock()
+                self.adjust()
+    # ----------------------------------------------------------------#
+
+    def adjust(self):
+        """
+        Take a decision on the limit (the lock must be held)
+        """
+        throughput = sum(self.speeds.values())
+        load, memory = self.load(), self.memory()
+        limit = self.limit
+
+        if ((load is not None and load > JobsController.MAX_LOAD) or
+                (memory is not None and memory < JobsController.MIN_MEMORY)):
+            limit -= 1
+            reason = 'system overloaded'
+            self.previous = None
+        elif (self.previous is not None and self.running >= self.limit and
+              throughput < self.previous * JobsController.GAIN):
+            limit -= 1
+            reason = 'no gain from the last increase'
+            self.previous = None
+            self.hold = JobsController.HOLD
+        elif self.hold:
+            self.hold -= 1
+            return
+        elif (self.limit < self.maximum and self.running >= self.limit and
+              (load is None or load < 1.0)):
+            limit += 1
+            reason = 'all slots busy'
+            self.previous = throughput
+        else:
+            self.previous = None
+            return
+
+        limit = max(1, min(limit, self.maximum))
+        if limit != self.limit:
+            self.write('%s -> %s (%s)' % (self.limit, limit, reason),
+                       throughput, load, memory)
+            self.limit = limit
+            self.cond.notify_all()
+    # ----------------------------------------------------------------#
+
+    def write(self, decision, throughput, load, memory):
+        """
+        Pass a decision to the log callable
+        """
+        if not self.log:
+            return
+        self.log('Concurrent jobs: %s | throughput: %.2fx | fps: %s | '
+                 'load: %s | free memory: %s' % (
+                     decision, throughput,
+                     '%.1f' % sum(self.fps.values()) if self.fps else 'N/A',
+                     '%.2f' % load if load is not None else 'N/A',
+                     '%d%%' % (memory * 100) if memory is not None else 'N/A'))
@@ -0,0 +1,229 @@
+# -*- coding: UTF-8 -*-
+# Name: ffmpeg_runner.py
+# Porpose: run FFmpeg processes with structured progress output
+# Compatibility: Python3
+# Author: Gianluca Pernigoto <jeanlucperni@gmail.com>
+# Copyright: (c) 2018/2020 Gianluca Pernigoto <jeanlucperni@gmail.com>
+# license: GPL3
+# Rev: December.10.2020 *PEP8 compatible*
+#########################################################
+# This file is part of Videomass.
+
+#    Videomass is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+
+#    Videomass is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+
+#    You should have received a copy of the GNU General Public License
+#    along with Videomass.  If not, see <http://www.gnu.org/licenses/>.
+
+#########################################################
+import subprocess
+import platform
+if not platform.system() == 'Windows':
+    import shlex
+import re
+from threading import Thread
+
+
+class Progress(object):
+    """
+    A progress record of FFmpeg, as parsed from a block of the
+    key=value lines written by the `-progress` option. The values
+    not available (N/A) are None.
+
+    """
+    __slots__ = ('frame', 'fps', 'bitrate', 'total_size',
+                 'out_time_us', 'speed', 'progress')
+
+    def __init__(self):
+        for attr in Progress.__slots__:
+            setattr(self, attr, None)
+    # ----------------------------------------------------------------#
+
+    @property
+    def seconds(self):
+        """
+        The current output time in seconds (float) or None
+        """
+        if self.out_time_us is None:
+            return None
+        return self.out_time_us / 1000000
+    # ----------------------------------------------------------------#
+
+    def __repr__(self):
+        return 'Progress(%s)' % ', '.join(['%s=%r' % (x, getattr(self, x))
+                                           for x in Progress.__slots__])
+
+
+class ProgressParser(object):
+    """
+    Parse the output of the FFmpeg `-progress` option line by
+    line: the `feed` method returns a Progress object at the
+    end of each block (the 'progress=' key), otherwise None, e.g.
+
+        parser = ProgressParser()
+        for line in lines:
+            record = parser.feed(line)
+            if record:
+                print(record.seconds, record.speed)
+
+    """
+    def __init__(self):
+        self.block = {}
+    # ----------------------------------------------------------------#
+
+    @staticmethod
+    def number(value, cast=float, suffix=''):
+        """
+        Convert a progress value, return None if not available
+        """
+        value = value.strip()
+        if suffix and value.endswith(suffix):
+            value = value[:-len(suffix)]
+        try:
+            return cast(value)
+        except ValueError:
+            return None
+    # ----------------------------------------------------------------#
+
+    @staticmethod
+    def timestamp(value):
+        """
+        Convert a 'HH:MM:SS.micro' time to microseconds or None
+        """
+        try:
+            h, m, s = value.strip().split(':')
+            return round((int(h) * 3600 + int(m) * 60 + float(s)) * 1000000)
+        except ValueError:
+            return None
+    # ----------------------------------------------------------------#
+
+    def feed(self, line):
+        """
+        Feed a line, return a Progress object at the end of a block
+        """
+        key, sep, value = line.partition('=')
+        if not sep:
+            return None
+        key = key.strip()
+        self.block[key] = value.strip()
+        if key != 'progress':
+            return None
+
+        block, self.block = self.block, {}
+        rec = Progress()
+        rec.progress = block['progress']
+        rec.frame = ProgressParser.number(block.get('frame', ''), int)
+        rec.fps = ProgressParser.number(block.get('fps', ''))
+        rec.bitrate = ProgressParser.number(block.get('bitrate', ''),
+                                            suffix='kbits/s')
+        rec.total_size = ProgressParser.number(block.get('total_size', ''),
+                                               int)
+        rec.speed = ProgressParser.number(block.get('speed', ''),
+                                          suffix='x')
+        # NOTE out_time_ms is in microseconds too (an old FFmpeg bug)
+        for key in ('out_time_us', 'out_time_ms'):
+            rec.out_time_us = ProgressParser.number(block.get(key, ''), int)
+            if rec.out_time_us is not None:
+                break
+        else:
+            rec.out_time_us = ProgressParser.timestamp(block.get('out_time',
+                                                                 ''))
+        if rec.out_time_us is not None and rec.out_time_us < 0:
+            rec.out_time_us = 0  # may be negative at the beginning
+        return rec
+
+
+class FFmpegRunner(object):
+    """
+    Run a single FFmpeg process with the `-progress pipe:1` and
+    `-nostats` options. The progress records are read from stdout
+    and the log messages from stderr. The caller gets them through
+    two callbacks, so it can be used by GUI threads as well as by
+    headless callers:
+
+        def progress(record):  # a Progress object
+            print(record.seconds)
+        def output(line):  # a stderr line
+            print(line, end='')
+
+        runner = FFmpegRunner('ffmpeg', '-i "in.mkv" -y "out.mp4"',
+                              on_progress=progress, on_output=output)
+        status = runner.run()  # the exit status
+
+    `run` raises OSError (or FileNotFoundError) if FFmpeg cannot
+    be executed. `stop` terminates the process.
+
+    """
+    def __init__(self, ffmpeg_url, args, on_progress=None,
+                 on_output=None, cwd=None):
+        """
+        ffmpeg_url: FFmpeg executable
+        args: command line arguments string. The -stats option
+              (if any) is removed, since it is replaced by -progress
+        """
+        self.cmd = '%s -progress pipe:1 -nostats %s' % (
+                   ffmpeg_url, re.sub(r'(?<!\S)-stats(?!\S)', '', args))
+        self.cmd = ' '.join(self.cmd.split())
+        self.on_progress = on_progress
+        self.on_output = on_output
+        self.cwd = cwd
+        self.proc = None
+        self.stopped = False
+    # ----------------------------------------------------------------#
+
+    def read_output(self, stderr):
+        """
+        Read the stderr lines on a separate thread
+        """
+        for line in stderr:
+            if self.on_output:
+                self.on_output(line)
+    # ----------------------------------------------------------------#
+
+    def run(self):
+        """
+        Run the process, return its exit status.
+        """
+        if not platform.system() == 'Windows':
+            cmd = shlex.split(self.cmd)
+            info = None
+        else:  # Hide subprocess window on MS Windows
+            cmd = self.cmd
+            info = subprocess.STARTUPINFO()
+            info.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+
+        parser = ProgressParser()
+        with subprocess.Popen(cmd,
+                              stdout=subprocess.PIPE,
+                              stderr=subprocess.PIPE,
+                              bufsize=1,
+                              universal_newlines=True,
+                              cwd=self.cwd,
+                              startupinfo=info,) as self.proc:
+            reader = Thread(target=self.read_output,
+                            args=(self.proc.stderr,))
+            reader.start()
+            for line in self.proc.stdout:
+                record = parser.feed(line)
+                if record and self.on_progress:
+                    self.on_progress(record)
+            reader.join()
+            status = self.proc.wait()
+
+        return status
+    # ----------------------------------------------------------------#
+
+    def stop(self):
+        """
+        Terminate the process
+        """
+        self.stopped = True
+        if self.proc and self.proc.poll() is None:
+            self.proc.terminate()
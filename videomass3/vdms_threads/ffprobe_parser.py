@@ -27,7 +27,138 @@
 #########################################################
 import subprocess
 import platform
-import re
+import json
+from collections import deque
+from threading import Thread
+
+
+def iter_sections(lines):
+    """
+    Parse the lines of the default writer of ffprobe in a single
+    pass and yield a tuple (name, lines) for each section as soon
+    as it is complete, e.g. ('STREAM', ['index=0', 'codec_name=h264',
+    ...]). The nested sections (e.g. [SIDE_DATA] in [FRAME]) are
+    merged into their outer section. 'lines' can be any iterable
+    (e.g. the stdout of ffprobe), only a section at a time is kept
+    in memory. To get a dict of a section:
+
+        dict([x.split('=', 1) for x in lines if '=' in x])
+
+    """
+    name, depth, section = None, 0, []
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if line.startswith('[/') and line.endswith(']'):
+            depth -= 1
+            if depth == 0 and name is not None:
+                yield name, section
+                name, section = None, []
+            depth = max(depth, 0)
+        elif line.startswith('[') and line.endswith(']'):
+            if depth == 0:
+                name, section = line[1:-1], []
+            depth += 1
+        elif depth:
+            section.append(line)
+
+
+def with_filename(output, filename):
+    """
+    Return a cached ffprobe output (json or default writer) with
+    the format filename replaced by the given one: the cache finds
+    the outputs by the real pathname, so the filename of the output
+    may be another path of the same file (e.g. a symbolic link).
+    The other outputs are returned as they are.
+    """
+    if output.lstrip().startswith('{'):
+        try:
+            data = json.loads(output)
+        except ValueError:
+            return output
+        if 'filename' not in data.get('format', {}):
+            return output
+        data['format']['filename'] = filename
+        return json.dumps(data, indent=4)
+
+    lines, section = output.split('\n'), None
+    for index, line in enumerate(lines):
+        if line.startswith('[') and line.endswith(']'):
+            section = line
+        elif section == '[FORMAT]' and line.startswith('filename='):
+            lines[index] = 'filename=%s' % filename
+    return '\n'.join(lines)
+
+
+class FFProbeSections(object):
+    """
+    Runs ffprobe with the default writer and yields its sections
+    while they are read from stdout, so that huge outputs (e.g.
+    the frames or the packets of a multi-GB file) are parsed with
+    a constant memory use:
+
+        probe = FFProbeSections(FFPROBE_URL, filename,
+                                show=('packets',), select='v:0',
+                                entries='packet=pts_time,flags')
+        for name, lines in probe:  # see iter_sections
+            print(name, lines)
+        if probe.error:
+            print(probe.error)
+
+    `show` is a sequence of 'format', 'streams', 'frames' and/or
+    'packets' and `intervals` the -read_intervals option value.
+    After the iteration, `error` is an exception (ffprobe not
+    found) or the last error lines of ffprobe, otherwise None.
+    Breaking the iteration terminates the ffprobe process.
+
+    """
+    MAXERR = 50  # max error lines kept
+
+    def __init__(self, FFPROBE_URL, filename, show=('format', 'streams'),
+                 select=None, entries=None, intervals=None):
+        self.cmd = '%s -v error %s %s %s %s -of default "%s"' % (
+            FFPROBE_URL,
+            '-select_streams %s' % select if select else '',
+            '-read_intervals %s' % intervals if intervals else '',
+            '-show_entries %s' % entries if entries else '',
+            ' '.join(['-show_%s' % x for x in show]),
+            filename)
+        self.error = None
+    # ----------------------------------------------------------------#
+
+    def __iter__(self):
+        if not platform.system() == 'Windows':
+            import shlex
+            cmnd = shlex.split(self.cmd)
+            info = None
+        else:
+            cmnd = self.cmd
+            info = subprocess.STARTUPINFO()
+            info.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+        try:
+            p = subprocess.Popen(cmnd,
+                                 stdout=subprocess.PIPE,
+                                 stderr=subprocess.PIPE,
+                                 bufsize=1,
+                                 universal_newlines=True,
+                                 startupinfo=info,
+                                 )
+        except (OSError, FileNotFoundError) as e:
+            self.error = e
+            return
+
+        errors = deque(maxlen=FFProbeSections.MAXERR)
+        reader = Thread(target=errors.extend, args=(p.stderr,))
+        reader.start()
+        try:
+            yield from iter_sections(p.stdout)
+        finally:
+            if p.poll() is None:
+                p.terminate()
+            reader.join()
+            p.stdout.close()
+            p.stderr.close()
+            if p.wait() and errors:
+                self.error = ''.join(errors)
 
 
 class FFProbe(object):
@@ -152,7 +283,8 @@ class FFProbe(object):
     """
     def __init__(self, FFPROBE_URL, filename, parse=True,
                  pretty=True, select=None, entries=None,
-                 show_format=True, show_streams=True, writer=None):
+                 show_format=True, show_streams=True, writer=None,
+                 cache=None):
         """
         -------------------
         Parameters meaning:
@@ -166,6 +298,9 @@ class FFProbe(object):
             entries         get one or more entries
             pretty          get human values or machine values
             writer          define a format of printing output
+            cache           a ProbeCache object (see vdms_io/probe_cache.py)
+                            to get the output of unchanged files without
+                            running ffprobe, or None
 
         --------------------------------------------------
         [?] to know the meaning of the above options, see:
@@ -185,13 +320,23 @@ class FFProbe(object):
         self._format = []
         self.subtitle = []
         self.writer = None
-        self.datalines = []
-        pretty = '-pretty' if pretty is True else 'no_pretty'
+        pretty = '-pretty' if pretty is True else ''
         show_format = '-show_format' if show_format is True else ''
         show_streams = '-show_streams' if show_streams is True else ''
         select = '-select_streams %s' % select if select else ''
         entries = '-show_entries %s' % entries if entries else ''
         writer = '-of %s' % writer if writer else '-of default'
+        options = ' '.join([str(parse), pretty, select, entries,
+                            show_format, show_streams, writer])
+        if cache:
+            output = cache.get(filename, options)
+            if output is not None:
+                output = with_filename(output, filename)
+                if parse:
+                    self.parser(output)
+                else:
+                    self.writer = output
+                return
 
         if parse:
             cmnd = ('%s -i "%s" -v error %s %s %s '
@@ -234,6 +379,8 @@ class FFProbe(object):
 
         if p.returncode:
             self.error = error
+        elif cache:
+            cache.put(filename, options, output)
         if parse:
             self.parser(output)
         else:
@@ -243,29 +390,14 @@ class FFProbe(object):
     def parser(self, output):
         """
         Indexes the catalogs [STREAM\\] and [FORMAT\\] given by
-        the default output of FFprobe
+        the default output of FFprobe, in a single pass (see
+        iter_sections)
         """
-        probing = output.split('\n')  # create list with strings element
-
-        for s in probing:
-            if re.match('\\[STREAM\\]', s):
-                self.datalines = []
-
-            elif re.match('\\[\\/STREAM\\]', s):
-                self.mediastreams.append(self.datalines)
-                self.datalines = []
-            else:
-                self.datalines.append(s)
-
-        for f in probing:
-            if re.match('\\[FORMAT\\]', f):
-                self.datalines = []
-
-            elif re.match('\\[\\/FORMAT\\]', f):
-                self.mediaformat.append(self.datalines)
-                self.datalines = []
-            else:
-                self.datalines.append(f)
+        for name, lines in iter_sections(output.split('\n')):
+            if name == 'STREAM':
+                self.mediastreams.append(lines)
+            elif name == 'FORMAT':
+                self.mediaformat.append(lines)
 
     # --------------------------------------------------------------#
 
@@ -24,15 +24,18 @@
 
 #########################################################
 import wx
-import subprocess
-import platform
-if not platform.system() == 'Windows':
-    import shlex
 import itertools
 import os
-from threading import Thread
+from threading import Thread, Lock
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 import time
 from pubsub import pub
+from videomass3.vdms_utils.utils import pool_size
+from videomass3.vdms_threads.ffmpeg_runner import FFmpegRunner
+from videomass3.vdms_threads.progress_bus import ProgressBus
+from videomass3.vdms_threads.adaptive_jobs import JobsController
+from videomass3.vdms_io.log_writer import log_writer
 
 
 def logWrite(cmd, sterr, logname, logdir):
@@ -44,8 +47,7 @@ def logWrite(cmd, sterr, logname, logdir):
     else:
         apnd = "%s\n\n" % (cmd)
 
-    with open(os.path.join(logdir, logname), "a") as log:
-        log.write(apnd)
+    log_writer(logname, logdir).write(apnd)
 
 # ------------------------------ THREADS -------------------------------#
 
@@ -71,6 +73,15 @@ class OnePass(Thread):
     This class represents a separate thread for running processes,
     which need to read the stdout/stderr in real time.
 
+    If the "max concurrent jobs" setting is greater than 1, the
+    queued files are converted by a bounded pool of worker threads,
+    each one with its own FFmpeg process. In this case each pubsub
+    message carries a 'job' keyword with the index of the file in
+    the queue, so that the receiver can keep the progress of each
+    active job apart. On sequential conversions 'job' is None.
+    If the setting is 0 (automatic) the number of jobs running at
+    the same time is adapted by a JobsController.
+
     """
     # get videomass wx.App attribute
     get = wx.GetApp()
@@ -78,29 +89,43 @@ class OnePass(Thread):
     FFMPEG_URL = get.FFMPEG_url
     FFMPEG_LOGLEV = get.FFMPEG_loglev
     FF_THREADS = get.FFthreads
+    FF_JOBS = get.FFjobs
     SUFFIX = '' if get.FILEsuffix == 'none' else get.FILEsuffix
     NOT_EXIST_MSG = _("Is 'ffmpeg' installed on your system?")
     # ---------------------------------------------------------------
 
-    def __init__(self, varargs, duration, logname, timeseq):
+    def __init__(self, varargs, duration, logname, timeseq, journal=None):
         """
         Some attribute can be empty, this depend from conversion type.
         If the format/container is not changed on a conversion, the
         'extoutput' attribute will have an empty value.
         The 'volume' attribute may also have an empty value, but it will
         have no influence on the type of conversion.
+        The 'journal' is an optional JobJournal object to keep
+        updated with the status of each job.
         """
         self.stop_work_thread = False  # process terminate
+        self.not_exist = False  # if True, ffmpeg cannot be run
         self.filelist = varargs[1]  # list of files (items)
         self.command = varargs[4]  # comand set on single pass
         self.outputdir = varargs[3]  # output path
         self.extoutput = varargs[2]  # format (extension)
         self.duration = duration  # duration list
         self.volume = varargs[7]  # (lista norm.)se non richiesto rimane None
-        self.count = 0  # count first for loop
         self.countmax = len(varargs[1])  # length file list
         self.logname = logname  # title name of file log
         self.time_seq = timeseq  # a time segment
+        self.journal = journal  # JobJournal or None
+        self.workers = pool_size(OnePass.FF_JOBS, OnePass.FF_THREADS,
+                                 self.countmax)  # concurrent processes
+        self.lock = Lock()  # serializes log writing between jobs
+        self.controller = None  # JobsController if 0 (automatic) jobs
+        if self.workers > 1 and str(OnePass.FF_JOBS).strip() == '0':
+            log = partial(logWrite, sterr='', logname=logname,
+                          logdir=OnePass.LOGDIR)
+            self.controller = JobsController(self.workers, log=log)
+
+        self.bus = ProgressBus(partial(wx.CallAfter, pub.sendMessage))
 
         Thread.__init__(self)
         """initialize"""
@@ -110,109 +135,162 @@ class OnePass(Thread):
         """
         Subprocess initialize thread.
         """
-        for (files,
-             folders,
-             volume,
-             duration) in itertools.zip_longest(self.filelist,
-                                                self.outputdir,
-                                                self.volume,
-                                                self.duration,
-                                                fillvalue='',
-                                                ):
-            basename = os.path.basename(files)  # nome file senza path
-            filename = os.path.splitext(basename)[0]  # nome senza estensione
-            source_ext = os.path.splitext(basename)[1].split('.')[1]  # ext
-            outext = source_ext if not self.extoutput else self.extoutput
-
-            cmd = ('%s %s %s -i "%s" %s %s %s '
-                   '-y "%s/%s%s.%s"' % (OnePass.FFMPEG_URL,
-                                      self.time_seq,
-                                      OnePass.FFMPEG_LOGLEV,
-                                      files,
-                                      self.command,
-                                      volume,
-                                      OnePass.FF_THREADS,
-                                      folders,
-                                      filename,
-                                      OnePass.SUFFIX,
-                                      outext,
-                                      ))
-            self.count += 1
-            count = 'File %s/%s' % (self.count, self.countmax,)
-            com = "%s\n%s" % (count, cmd)
-            wx.CallAfter(pub.sendMessage,
-                         "COUNT_EVT",
-                         count=count,
-                         duration=duration,
-                         fname=files,
-                         end='',
-                         )
+        queue = list(enumerate(itertools.zip_longest(self.filelist,
+                                                     self.outputdir,
+                                                     self.volume,
+                                                     self.duration,
+                                                     fillvalue='',
+                                                     )))
+        if self.workers == 1:
+            for index, item in queue:
+                try:
+                    self.job(index, item, None)
+                except Exception as err:  # report it, go on with the batch
+                    self.job_failed(index, item, None, err)
+                if self.stop_work_thread or self.not_exist:
+                    break
+        else:
+            job = self.slot if self.controller else self.job
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                futures = [(pool.submit(job, index, item, index), index,
+                            item) for index, item in queue]
+            for future, index, item in futures:
+                try:
+                    future.result()
+                except Exception as err:  # else it is lost in the pool
+                    self.job_failed(index, item, index, err)
+
+        coalesced = self.bus.close()  # deliver the pending messages
+        logWrite('Coalesced progress messages: %s' % coalesced,
+                 '',
+                 self.logname,
+                 OnePass.LOGDIR,
+                 )
+        time.sleep(.5)
+        wx.CallAfter(pub.sendMessage, "END_EVT")
+    # --------------------------------------------------------------------#
+
+    def job_failed(self, index, item, tag, err):
+        """
+        Report a job stopped by an unexpected error as failed on
+        the console, the journal and the log.
+        """
+        if self.journal:
+            try:
+                self.journal.update(index, 1, 'failed')
+            except Exception:
+                pass  # the error may come from the journal
+        self.bus.status(1, item[3], job=tag)
+        with self.lock:
+            logWrite('',
+                     'File %s/%s\n%s: %s' % (index + 1, self.countmax,
+                                              item[0], err),
+                     self.logname,
+                     OnePass.LOGDIR,
+                     )
+    # --------------------------------------------------------------------#
+
+    def slot(self, index, item, tag):
+        """
+        Run a job as soon as the JobsController has a free slot.
+        """
+        self.controller.acquire()
+        try:
+            self.job(index, item, tag)
+        finally:
+            self.controller.release(tag)
+    # --------------------------------------------------------------------#
+
+    def job(self, index, item, tag):
+        """
+        Run FFmpeg on a single queued item. 'tag' is the job
+        identifier sent with the pubsub messages (None if the
+        files are processed sequentially).
+        """
+        if self.stop_work_thread or self.not_exist:
+            return
+
+        files, folders, volume, duration = item
+        basename = os.path.basename(files)  # nome file senza path
+        filename = os.path.splitext(basename)[0]  # nome senza estensione
+        source_ext = os.path.splitext(basename)[1].split('.')[1]  # ext
+        outext = source_ext if not self.extoutput else self.extoutput
+        output = '%s/%s%s.%s' % (folders, filename, OnePass.SUFFIX, outext)
+
+        args = ('%s %s -i "%s" %s %s %s -y "%s"' % (self.time_seq,
+                                                   OnePass.FFMPEG_LOGLEV,
+                                                   files,
+                                                   self.command,
+                                                   volume,
+                                                   OnePass.FF_THREADS,
+                                                   output,
+                                                   ))
+        runner = FFmpegRunner(OnePass.FFMPEG_URL, args)
+        count = 'File %s/%s' % (index + 1, self.countmax,)
+        com = "%s\n%s" % (count, runner.cmd)
+        self.bus.count(count=count,
+                       duration=duration,
+                       fname=files,
+                       end='',
+                       job=tag,
+                       )
+        with self.lock:
             logWrite(com,
                      '',
                      self.logname,
                      OnePass.LOGDIR,
                      )  # write n/n + command only
 
-            if not platform.system() == 'Windows':
-                cmd = shlex.split(cmd)
-                info = None
-            else:  # Hide subprocess window on MS Windows
-                info = subprocess.STARTUPINFO()
-                info.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            try:
-                with subprocess.Popen(cmd,
-                                      stderr=subprocess.PIPE,
-                                      bufsize=1,
-                                      universal_newlines=True,
-                                      startupinfo=info,) as p:
-                    for line in p.stderr:
-                        wx.CallAfter(pub.sendMessage,
-                                     "UPDATE_EVT",
-                                     output=line,
-                                     duration=duration,
-                                     status=0,
-                                     )
-                        if self.stop_work_thread:
-                            p.terminate()
-                            break  # break second 'for' loop
-
-                    if p.wait():  # error
-                        wx.CallAfter(pub.sendMessage,
-                                     "UPDATE_EVT",
-                                     output=line,
-                                     duration=duration,
-                                     status=p.wait(),
-                                     )
-                        logWrite('',
-                                 "Exit status: %s" % p.wait(),
-                                 self.logname,
-                                 OnePass.LOGDIR,
-                                 )  # append exit error number
-                    else:  # ok
-                        wx.CallAfter(pub.sendMessage,
-                                     "COUNT_EVT",
-                                     count='',
-                                     duration='',
-                                     fname='',
-                                     end='ok'
-                                     )
-            except (OSError, FileNotFoundError) as err:
-                e = "%s\n  %s" % (err, OnePass.NOT_EXIST_MSG)
-                wx.CallAfter(pub.sendMessage,
-                             "COUNT_EVT",
-                             count=e,
-                             duration=0,
-                             fname=files,
-                             end='error',
-                             )
-                break
+        if self.journal:
+            self.journal.update(index, 1, 'running', output)
 
+        def on_progress(progress):
+            self.bus.progress(progress, duration, job=tag)
+            if self.controller:
+                self.controller.sample(tag, progress)
             if self.stop_work_thread:
-                p.terminate()
-                break  # break second 'for' loop
+                runner.stop()
 
-        time.sleep(.5)
-        wx.CallAfter(pub.sendMessage, "END_EVT")
+        def on_output(line):
+            self.bus.output(line, duration, job=tag)
+            if self.stop_work_thread:
+                runner.stop()
+
+        runner.on_progress = on_progress
+        runner.on_output = on_output
+        try:
+            status = runner.run()
+
+        except (OSError, FileNotFoundError) as err:
+            self.not_exist = True
+            e = "%s\n  %s" % (err, OnePass.NOT_EXIST_MSG)
+            self.bus.count(count=e,
+                           duration=0,
+                           fname=files,
+                           end='error',
+                           job=tag,
+                           )
+            return
+
+        if status:  # error
+            if self.journal:
+                self.journal.update(index, 1, 'failed')
+            self.bus.status(status, duration, job=tag)
+            with self.lock:
+                logWrite('',
+                         "%s\nExit status: %s" % (count, status),
+                         self.logname,
+                         OnePass.LOGDIR,
+                         )  # append exit error number
+        else:  # ok
+            if self.journal:
+                self.journal.update(index, 1, 'done')
+            self.bus.count(count='',
+                           duration='',
+                           fname='',
+                           end='ok',
+                           job=tag,
+                           )
     # --------------------------------------------------------------------#
 
     def stop(self):
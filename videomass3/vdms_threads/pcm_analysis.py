@@ -0,0 +1,402 @@
+# -*- coding: UTF-8 -*-
+# Name: pcm_analysis.py
+# Porpose: audio analysis of the decoded PCM samples by NumPy (optional)
+# Compatibility: Python3
+# Author: Gianluca Pernigoto <jeanlucperni@gmail.com>
+# Copyright: (c) 2018/2020 Gianluca Pernigoto <jeanlucperni@gmail.com>
+# license: GPL3
+# Rev: December.10.2020 *PEP8 compatible*
+#########################################################
+# This file is part of Videomass.
+
+#    Videomass is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+
+#    Videomass is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+
+#    You should have received a copy of the GNU General Public License
+#    along with Videomass.  If not, see <http://www.gnu.org/licenses/>.
+
+#########################################################
+import os
+import hashlib
+import subprocess
+import platform
+from threading import Thread
+if not platform.system() == 'Windows':
+    import shlex
+try:
+    import numpy
+except (ModuleNotFoundError, ImportError) as nomodule:
+    numpy = None
+
+
+def available():
+    """
+    Return True if NumPy is installed
+    """
+    return numpy is not None
+
+
+CACHE_FOLDER = 'pcm_stats'  # in the cache directory
+CACHE_MAXBYTES = 64 * 1024 * 1024  # 64 MiB of .npz files
+
+
+def cache_path(cachedir, fingerprint, timeseq, audiomap):
+    """
+    Return the pathname of the cached PCMStats of a file
+    analyzed with the given time segment and audio stream map,
+    or None if the file has not a fingerprint (e.g. an url).
+    """
+    if not fingerprint:
+        return None
+    key = '\n'.join((fingerprint, ' '.join((timeseq or '').split()),
+                     ' '.join((audiomap or '').split())))
+    name = hashlib.blake2b(key.encode('utf-8'), digest_size=16).hexdigest()
+    return os.path.join(cachedir, CACHE_FOLDER, '%s.npz' % name)
+
+
+def prune_cache(cachedir, maxbytes=CACHE_MAXBYTES):
+    """
+    Remove the least recently used PCMStats files (by the
+    modification time, see PCMStats.load) while they exceed
+    'maxbytes'. The errors are ignored.
+    """
+    files = []
+    try:
+        with os.scandir(os.path.join(cachedir, CACHE_FOLDER)) as entries:
+            for entry in entries:
+                if entry.name.endswith('.npz') and entry.is_file():
+                    st = entry.stat()
+                    files.append((st.st_mtime, st.st_size, entry.path))
+    except OSError:
+        return
+    total = sum([x[1] for x in files])
+    for mtime, size, path in sorted(files):
+        if total <= maxbytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+
+
+class PCMStats(object):
+    """
+    The compact statistics of the decoded audio of a file, made
+    of arrays of a few items for each block of BLOCK seconds:
+
+        power: mean square of the samples of each channel
+        peak: max absolute value of the samples of each channel
+        clips: number of the clipped samples (|x| >= 1.0)
+        histogram: number of the samples in each HIST_STEP dB bin
+                   of their absolute level, from HIST_FLOOR to 0 dBFS
+                   (the first bin has the samples below the floor)
+
+    so that any level or normalization target can be computed by
+    vectorized operations without decoding the file again:
+
+        stats = PCMStats.load(path)
+        stats.peak_db(), stats.rms_db(), stats.percentile_db(99.9)
+
+    """
+    BLOCK = 0.1  # seconds
+    HIST_FLOOR = -120.0  # dBFS
+    HIST_STEP = 0.5  # dB
+
+    def __init__(self, rate, channels, power, peak, clips, histogram):
+        self.rate = rate
+        self.channels = channels
+        self.power = power  # float64 array (blocks, channels)
+        self.peak = peak  # float32 array (blocks, channels)
+        self.clips = clips  # int64 array (blocks,)
+        self.histogram = histogram  # int64 array (bins + 1,)
+    # ----------------------------------------------------------------#
+
+    @staticmethod
+    def db(value, power=False):
+        """
+        Convert an amplitude (or a power) to dBFS, -inf for zero
+        """
+        with numpy.errstate(divide='ignore'):
+            return float((10 if power else 20) * numpy.log10(value))
+    # ----------------------------------------------------------------#
+
+    def peak_db(self, channel=None):
+        """
+        Sample peak level in dBFS, of all channels or of one
+        """
+        peak = self.peak if channel is None else self.peak[:, channel]
+        return PCMStats.db(peak.max()) if peak.size else float('-inf')
+    # ----------------------------------------------------------------#
+
+    def rms_db(self, channel=None):
+        """
+        RMS level in dBFS (like the volumedetect mean volume) of
+        all channels or of one
+        """
+        power = self.power if channel is None else self.power[:, channel]
+        return (PCMStats.db(power.mean(), power=True) if power.size
+                else float('-inf'))
+    # ----------------------------------------------------------------#
+
+    def gated_rms_db(self, absolute=-70.0, relative=-20.0):
+        """
+        RMS level in dBFS of the blocks above the 'absolute' gate
+        and then above the 'relative' gate (dB from the level of
+        the blocks above the absolute one), as the gating of the
+        BS.1770 loudness but without the K-weighting.
+        """
+        blocks = self.power.mean(axis=1)
+        gated = blocks[blocks > 10 ** (absolute / 10)]
+        if not gated.size:
+            return float('-inf')
+        gated = gated[gated > gated.mean() * 10 ** (relative / 10)]
+        return PCMStats.db(gated.mean(), power=True)
+    # ----------------------------------------------------------------#
+
+    def percentile_db(self, percent):
+        """
+        The level in dBFS not exceeded by the given percent of
+        the samples (e.g. 99.9 for a peak level which ignores
+        the 0.1% of the highest samples), with a resolution of
+        HIST_STEP dB.
+        """
+        total = self.histogram.sum()
+        if not total:
+            return float('-inf')
+        index = int(numpy.searchsorted(numpy.cumsum(self.histogram),
+                                       total * percent / 100))
+        if index == 0:
+            return float('-inf')  # below the floor
+        return PCMStats.HIST_FLOOR + index * PCMStats.HIST_STEP
+    # ----------------------------------------------------------------#
+
+    def clipped(self):
+        """
+        Number of the clipped samples
+        """
+        return int(self.clips.sum())
+    # ----------------------------------------------------------------#
+
+    def record(self):
+        """
+        Return a measurement record with the same volumedetect
+        items of the filters analysis (see volumedetect) and the
+        'pcm' statistics.
+        """
+        return {'max_volume': '%.1f' % self.peak_db(),
+                'mean_volume': '%.1f' % self.rms_db(),
+                'ebur128': {},
+                'astats': {},
+                'loudnorm': None,
+                'pcm': {'gated_rms': '%.1f' % self.gated_rms_db(),
+                        'peak_99_9': '%.1f' % self.percentile_db(99.9),
+                        'clipped': self.clipped(),
+                        'channels': [{'peak': '%.1f' % self.peak_db(x),
+                                      'rms': '%.1f' % self.rms_db(x)}
+                                     for x in range(self.channels)],
+                        },
+                }
+    # ----------------------------------------------------------------#
+
+    def save(self, path):
+        """
+        Save the statistics to a .npz file
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        numpy.savez_compressed(path, rate=self.rate,
+                               channels=self.channels, power=self.power,
+                               peak=self.peak, clips=self.clips,
+                               histogram=self.histogram)
+    # ----------------------------------------------------------------#
+
+    @staticmethod
+    def load(path):
+        """
+        Load the statistics saved to a .npz file, return None if
+        the file is missing or not valid. The modification time of
+        the file is updated, it is the last use for prune_cache.
+        """
+        try:
+            with numpy.load(path) as data:
+                stats = PCMStats(int(data['rate']), int(data['channels']),
+                                 data['power'], data['peak'], data['clips'],
+                                 data['histogram'])
+        except (OSError, ValueError, KeyError):
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return stats
+
+
+class BlockAccumulator(object):
+    """
+    Build the PCMStats of a stream of float32 little-endian (the
+    FFmpeg f32le format) interleaved samples
+    fed in chunks of any size: the samples are split in blocks of
+    PCMStats.BLOCK seconds, only the arrays of the statistics
+    grow with the duration.
+    """
+    def __init__(self, rate, channels):
+        self.rate = rate
+        self.channels = channels
+        self.size = max(1, int(rate * PCMStats.BLOCK)) * channels
+        self.rest = numpy.empty(0, dtype='<f4')
+        self.tail = b''
+        self.power, self.peak, self.clips = [], [], []
+        self.bins = int(-PCMStats.HIST_FLOOR / PCMStats.HIST_STEP)
+        self.histogram = numpy.zeros(self.bins + 1, dtype=numpy.int64)
+        self.samples = 0  # frames fed
+    # ----------------------------------------------------------------#
+
+    def feed(self, data):
+        """
+        Feed a chunk of bytes of float32 little-endian samples
+        """
+        data = self.tail + data
+        cut = len(data) - len(data) % 4
+        data, self.tail = data[:cut], data[cut:]  # a partial sample
+        samples = numpy.frombuffer(data, dtype='<f4')
+        if self.rest.size:
+            samples = numpy.concatenate((self.rest, samples))
+        whole = samples.size - samples.size % self.size
+        self.rest = samples[whole:].copy()
+        if whole:
+            self.blocks(samples[:whole].reshape(-1, self.size // self.channels,
+                                                self.channels))
+    # ----------------------------------------------------------------#
+
+    def blocks(self, blocks):
+        """
+        Add the statistics of an array (blocks, frames, channels)
+        """
+        self.samples += blocks.shape[0] * blocks.shape[1]
+        square = numpy.square(blocks, dtype=numpy.float64)
+        absolute = numpy.abs(blocks)
+        self.power.append(square.mean(axis=1))
+        self.peak.append(absolute.max(axis=1))
+        self.clips.append((absolute >= 1.0).sum(axis=(1, 2)))
+        with numpy.errstate(divide='ignore'):
+            levels = 20 * numpy.log10(absolute.ravel())
+        index = numpy.floor((levels - PCMStats.HIST_FLOOR) /
+                            PCMStats.HIST_STEP) + 1
+        index = numpy.clip(numpy.nan_to_num(index, neginf=0), 0, self.bins)
+        self.histogram += numpy.bincount(index.astype(numpy.int64),
+                                         minlength=self.bins + 1)
+    # ----------------------------------------------------------------#
+
+    def stats(self):
+        """
+        Return the PCMStats of the fed samples (the last partial
+        block included)
+        """
+        frames = self.rest.size - self.rest.size % self.channels
+        if frames:
+            self.blocks(self.rest[:frames].reshape(1, -1, self.channels))
+            self.rest = self.rest[:0]
+        if not self.power:
+            empty = numpy.zeros((0, self.channels))
+            return PCMStats(self.rate, self.channels, empty,
+                            empty.astype(numpy.float32),
+                            numpy.zeros(0, dtype=numpy.int64),
+                            self.histogram)
+        return PCMStats(self.rate, self.channels,
+                        numpy.concatenate(self.power),
+                        numpy.concatenate(self.peak),
+                        numpy.concatenate(self.clips),
+                        self.histogram)
+
+
+class PCMRunner(object):
+    """
+    Run a FFmpeg process which writes the decoded audio as raw
+    float32 samples to a pipe and build its PCMStats, reading
+    CHUNK seconds at a time: there are not temporary files and
+    the memory does not grow with the duration. Like the
+    FFmpegRunner, the caller gets the progress by a callback
+    (the decoded seconds) and can terminate the process by
+    the `stop` method:
+
+        runner = PCMRunner('ffmpeg', '-i "in.mkv" -map 0:1', 2)
+        status = runner.run()  # the exit status
+        stats = runner.stats  # PCMStats or None on errors
+
+    `run` raises OSError (or FileNotFoundError) if FFmpeg cannot
+    be executed.
+    """
+    RATE = 48000  # the audio is resampled to this rate
+    CHUNK = 1.0  # seconds
+
+    def __init__(self, ffmpeg_url, args, channels, on_progress=None):
+        """
+        ffmpeg_url: FFmpeg executable
+        args: input and stream mapping arguments string
+        channels: number of the channels of the mapped stream
+        """
+        self.cmd = ('%s -nostdin -hide_banner -loglevel error %s -vn -sn '
+                    '-dn -ac %s -ar %s -f f32le -acodec pcm_f32le -' % (
+                        ffmpeg_url, args, channels, PCMRunner.RATE))
+        self.cmd = ' '.join(self.cmd.split())
+        self.channels = channels
+        self.on_progress = on_progress
+        self.error = ''
+        self.stats = None
+        self.proc = None
+        self.stopped = False
+    # ----------------------------------------------------------------#
+
+    def run(self):
+        """
+        Run the process, return its exit status.
+        """
+        if not platform.system() == 'Windows':
+            cmd = shlex.split(self.cmd)
+            info = None
+        else:  # Hide subprocess window on MS Windows
+            cmd = self.cmd
+            info = subprocess.STARTUPINFO()
+            info.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+
+        acc = BlockAccumulator(PCMRunner.RATE, self.channels)
+        chunk = int(PCMRunner.RATE * PCMRunner.CHUNK) * self.channels * 4
+        errors = []
+        with subprocess.Popen(cmd,
+                              stdout=subprocess.PIPE,
+                              stderr=subprocess.PIPE,
+                              startupinfo=info,) as self.proc:
+            reader = Thread(target=lambda: errors.append(
+                            self.proc.stderr.read()))
+            reader.start()
+            while True:
+                data = self.proc.stdout.read(chunk)
+                if not data:
+                    break
+                acc.feed(data)
+                if self.on_progress:
+                    self.on_progress(acc.samples / PCMRunner.RATE)
+            reader.join()
+            status = self.proc.wait()
+
+        self.error = b''.join(errors).decode('utf-8', 'replace')
+
+        if not status and not self.stopped:
+            self.stats = acc.stats()
+        return status
+    # ----------------------------------------------------------------#
+
+    def stop(self):
+        """
+        Terminate the process
+        """
+        self.stopped = True
+        if self.proc and self.proc.poll() is None:
+            self.proc.terminate()
@@ -24,14 +24,14 @@
 
 #########################################################
 import wx
-import subprocess
-import platform
-if not platform.system() == 'Windows':
-    import shlex
 import os
 from threading import Thread
+from functools import partial
 import time
 from pubsub import pub
+from videomass3.vdms_threads.ffmpeg_runner import FFmpegRunner
+from videomass3.vdms_threads.progress_bus import ProgressBus
+from videomass3.vdms_io.log_writer import log_writer
 
 
 def logWrite(cmd, sterr, logname, logdir):
@@ -43,8 +43,7 @@ def logWrite(cmd, sterr, logname, logdir):
     else:
         apnd = "%s\n\n" % (cmd)
 
-    with open(os.path.join(logdir, logname), "a") as log:
-        log.write(apnd)
+    log_writer(logname, logdir).write(apnd)
 
 # ------------------------------ THREADS -------------------------------#
 
@@ -94,6 +93,8 @@ class PicturesFromVideo(Thread):
         self.logname = logname  # title name of file log
         self.fname = varargs[1]  # file name
 
+        self.bus = ProgressBus(partial(wx.CallAfter, pub.sendMessage))
+
         Thread.__init__(self)
         """initialize"""
         self.start()  # start the thread (va in self.run())
@@ -102,81 +103,67 @@ class PicturesFromVideo(Thread):
         """
         Subprocess initialize thread.
         """
-        cmd = ('%s %s %s -i "%s" %s ' % (PicturesFromVideo.FFMPEG_URL,
-                                         self.time_seq,
-                                         PicturesFromVideo.FFMPEG_LOGLEV,
-                                         self.fname,
-                                         self.cmd,
-                                         ))
+        args = ('%s %s -i "%s" %s' % (self.time_seq,
+                                      PicturesFromVideo.FFMPEG_LOGLEV,
+                                      self.fname,
+                                      self.cmd,
+                                      ))
+        runner = FFmpegRunner(PicturesFromVideo.FFMPEG_URL, args)
         count = 'File %s/%s' % ('1', '1',)
-        com = "%s\n%s" % (count, cmd)
-
-        wx.CallAfter(pub.sendMessage,
-                     "COUNT_EVT",
-                     count=count,
-                     duration=self.duration,
-                     fname=self.fname,
-                     end='',
-                     )
+        com = "%s\n%s" % (count, runner.cmd)
+
+        self.bus.count(count=count,
+                       duration=self.duration,
+                       fname=self.fname,
+                       end='',
+                       )
         logWrite(com,
                  '',
                  self.logname,
                  PicturesFromVideo.LOGDIR,
                  )  # write n/n + command only
 
-        if not PicturesFromVideo.OS == 'Windows':
-            cmd = shlex.split(cmd)
-            info = None
-        else:  # Hide subprocess window on MS Windows
-            info = subprocess.STARTUPINFO()
-            info.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+        def on_progress(progress):
+            self.bus.progress(progress, self.duration)
+            if self.stop_work_thread:
+                runner.stop()
+
+        def on_output(line):
+            self.bus.output(line, self.duration)
+            if self.stop_work_thread:
+                runner.stop()
+
+        runner.on_progress = on_progress
+        runner.on_output = on_output
         try:
-            with subprocess.Popen(cmd,
-                                  stderr=subprocess.PIPE,
-                                  bufsize=1,
-                                  universal_newlines=True,
-                                  startupinfo=info,) as p:
-                for line in p.stderr:
-                    wx.CallAfter(pub.sendMessage,
-                                 "UPDATE_EVT",
-                                 output=line,
-                                 duration=self.duration,
-                                 status=0,
-                                 )
-                    if self.stop_work_thread:  # break second 'for' loop
-                        p.terminate()
-                        break
-
-                if p.wait():  # error
-                    wx.CallAfter(pub.sendMessage,
-                                 "UPDATE_EVT",
-                                 output=line,
-                                 duration=self.duration,
-                                 status=p.wait(),
-                                 )
-                    logWrite('',
-                             "Exit status: %s" % p.wait(),
-                             self.logname,
-                             PicturesFromVideo.LOGDIR,
-                             )  # append exit error number
-
-                else:  # status ok
-                    wx.CallAfter(pub.sendMessage,
-                                 "COUNT_EVT",
-                                 count='',
-                                 duration='',
-                                 fname='',
-                                 end='ok'
-                                 )
+            status = runner.run()
+            if status:  # error
+                self.bus.status(status, self.duration)
+                logWrite('',
+                         "Exit status: %s" % status,
+                         self.logname,
+                         PicturesFromVideo.LOGDIR,
+                         )  # append exit error number
+
+            else:  # status ok
+                self.bus.count(count='',
+                               duration='',
+                               fname='',
+                               end='ok',
+                               )
         except (OSError, FileNotFoundError) as err:
             e = "%s\n  %s" % (err, PicturesFromVideo.NOT_EXIST_MSG)
-            wx.CallAfter(pub.sendMessage,
-                         "COUNT_EVT",
-                         count=e,
-                         duration=0,
-                         fname=self.fname,
-                         end='error',
-                         )
+            self.bus.count(count=e,
+                           duration=0,
+                           fname=self.fname,
+                           end='error',
+                           )
+        coalesced = self.bus.close()  # deliver the pending messages
+        logWrite('Coalesced progress messages: %s' % coalesced,
+                 '',
+                 self.logname,
+                 PicturesFromVideo.LOGDIR,
+                 )
         time.sleep(.5)
         wx.CallAfter(pub.sendMessage, "END_EVT")
     # --------------------------------------------------------------------#
@@ -0,0 +1,131 @@
+# -*- coding: UTF-8 -*-
+# Name: probe_files.py
+# Porpose: probes the dropped files on a pool of threads
+# Compatibility: Python3
+# Author: Gianluca Pernigoto <jeanlucperni@gmail.com>
+# Copyright: (c) 2018/2020 Gianluca Pernigoto <jeanlucperni@gmail.com>
+# license: GPL3
+# Rev: December.10.2020 *PEP8 compatible*
+#########################################################
+# This file is part of Videomass.
+
+#    Videomass is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+
+#    Videomass is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+
+#    You should have received a copy of the GNU General Public License
+#    along with Videomass.  If not, see <http://www.gnu.org/licenses/>.
+
+#########################################################
+import os
+from itertools import islice
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from threading import Thread, Event
+
+
+class ProbeFiles(Thread):
+    """
+    Probes a list of files on a bounded pool of threads, so
+    that the GUI is never blocked by the ffprobe subprocesses.
+    The list can be any iterable (e.g. the generator of a
+    directory walk): it is read as the probes go on, a few
+    files ahead of the delivered ones only, so that the first
+    results come at once even from a huge tree. The results
+    are delivered in the same order of the list, each one as
+    soon as it and all the previous ones are ready:
+
+        "PROBE_EVT" (index, filename, data, error)
+        "PROBE_END_EVT" (count, cancelled)
+
+    where data and error are the tuple returned by 'probe' and
+    count is the number of the delivered results. The `cancel`
+    method stops a huge list midway: the pending files are not
+    probed at all.
+
+    'deliver' is called as deliver(topic, **kwargs), e.g. on
+    the GUI:
+
+        ProbeFiles(files, IO_tools.probeRecord,
+                   partial(wx.CallAfter, pub.sendMessage))
+
+    """
+    AHEAD = 4  # files submitted to the pool for each worker
+
+    def __init__(self, filenames, probe, deliver, workers=None):
+        """
+        filenames: list (or iterable) of pathnames
+        probe: callable(filename) returning (data, error)
+        deliver: callable(topic, **kwargs)
+        workers: max concurrent probes, the number of cpus if None
+        """
+        self.filenames = filenames
+        self.probe = probe
+        self.deliver = deliver
+        self.workers = workers or os.cpu_count() or 1
+        self.cancelled = Event()
+
+        Thread.__init__(self, daemon=True)
+        self.start()
+    # ----------------------------------------------------------------#
+
+    def task(self, filename):
+        """
+        Probe a single file on a worker of the pool
+        """
+        if self.cancelled.is_set():
+            return None, None
+        return self.probe(filename)
+    # ----------------------------------------------------------------#
+
+    def run(self):
+        """
+        Keep the pool busy with the next files of the list,
+        deliver the results in order.
+        """
+        count = 0
+        ahead = self.workers * ProbeFiles.AHEAD
+        filenames = iter(self.filenames)
+        pending = deque()  # [(filename, future), ...]
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                try:
+                    while not self.cancelled.is_set():
+                        for filename in islice(filenames,
+                                               ahead - len(pending)):
+                            pending.append((filename,
+                                            pool.submit(self.task, filename)))
+                        if not pending:
+                            break
+                        filename, future = pending.popleft()
+                        data, error = future.result()
+                        if self.cancelled.is_set():
+                            break
+                        self.deliver("PROBE_EVT",
+                                     index=count,
+                                     filename=filename,
+                                     data=data,
+                                     error=error,
+                                     )
+                        count += 1
+                finally:
+                    for filename, future in pending:
+                        future.cancel()  # only the pending ones
+        finally:
+            self.deliver("PROBE_END_EVT",
+                         count=count,
+                         cancelled=self.cancelled.is_set(),
+                         )
+    # ----------------------------------------------------------------#
+
+    def cancel(self):
+        """
+        Stop probing, the running probes are left to finish
+        """
+        self.cancelled.set()
@@ -0,0 +1,170 @@
+# -*- coding: UTF-8 -*-
+# Name: progress_bus.py
+# Porpose: coalesce the messages of the threads to the GUI
+# Compatibility: Python3
+# Author: Gianluca Pernigoto <jeanlucperni@gmail.com>
+# Copyright: (c) 2018/2020 Gianluca Pernigoto <jeanlucperni@gmail.com>
+# license: GPL3
+# Rev: December.10.2020 *PEP8 compatible*
+#########################################################
+# This file is part of Videomass.
+
+#    Videomass is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+
+#    Videomass is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+
+#    You should have received a copy of the GNU General Public License
+#    along with Videomass.  If not, see <http://www.gnu.org/licenses/>.
+
+#########################################################
+from threading import Thread, Lock, Event
+
+
+class ProgressBus(object):
+    """
+    Sits between the working threads and the pubsub topics of
+    the Logging_Console. The FFmpeg output lines of each job are
+    batched in a single "UPDATE_EVT" message and the progress
+    records are merged (only the last one is kept), so that at
+    most `rate` batches per second are delivered for each job.
+
+    The error and warning lines, the exit status and the
+    "COUNT_EVT" messages are never merged: they are delivered
+    at once, after the pending messages of the same job to keep
+    the order. The `coalesced` attribute counts the messages not
+    delivered on their own.
+
+    'deliver' is called as deliver(topic, **kwargs), e.g. on
+    the threads:
+
+        bus = ProgressBus(partial(wx.CallAfter, pub.sendMessage))
+
+    """
+    RATE = 10  # default batches per second for each job
+    URGENT = ('Failed', 'failed', 'Error', 'error', 'warning', 'Warning')
+
+    def __init__(self, deliver, rate=RATE):
+        """
+        deliver: callable(topic, **kwargs)
+        rate: max batches per second for each job
+        """
+        self.deliver = deliver
+        self.interval = 1 / rate
+        self.lock = Lock()
+        self.lines = {}  # {job: [duration, [line, ...]]}
+        self.progresses = {}  # {job: (progress, duration)}
+        self.coalesced = 0
+        self.closed = Event()
+        self.flusher = Thread(target=self.run, daemon=True)
+        self.flusher.start()
+    # ----------------------------------------------------------------#
+
+    def run(self):
+        """
+        Deliver the pending messages at every interval
+        """
+        while not self.closed.wait(self.interval):
+            with self.lock:
+                for job in list(self.lines) + list(self.progresses):
+                    self.flush(job)
+    # ----------------------------------------------------------------#
+
+    def flush(self, job):
+        """
+        Deliver the pending messages of a job (lock must be held)
+        """
+        pending = self.lines.pop(job, None)
+        if pending:
+            duration, lines = pending
+            self.coalesced += len(lines) - 1
+            self.deliver("UPDATE_EVT",
+                         output=''.join(lines),
+                         duration=duration,
+                         status=0,
+                         job=job,
+                         )
+        pending = self.progresses.pop(job, None)
+        if pending:
+            self.deliver("PROGRESS_EVT",
+                         progress=pending[0],
+                         duration=pending[1],
+                         job=job,
+                         )
+    # ----------------------------------------------------------------#
+
+    def output(self, line, duration, job=None):
+        """
+        Queue a FFmpeg output line, the error and warning lines
+        are delivered at once.
+        """
+        with self.lock:
+            if [x for x in ProgressBus.URGENT if x in line]:
+                self.flush(job)
+                self.deliver("UPDATE_EVT",
+                             output=line,
+                             duration=duration,
+                             status=0,
+                             job=job,
+                             )
+                return
+            pending = self.lines.setdefault(job, [duration, []])
+            pending[0] = duration
+            pending[1].append(line)
+    # ----------------------------------------------------------------#
+
+    def progress(self, progress, duration, job=None):
+        """
+        Keep the last progress record of a job
+        """
+        with self.lock:
+            if job in self.progresses:
+                self.coalesced += 1
+            self.progresses[job] = (progress, duration)
+    # ----------------------------------------------------------------#
+
+    def status(self, status, duration, job=None):
+        """
+        Deliver at once the exit status of a failed process
+        """
+        with self.lock:
+            self.flush(job)
+            self.deliver("UPDATE_EVT",
+                         output='',
+                         duration=duration,
+                         status=status,
+                         job=job,
+                         )
+    # ----------------------------------------------------------------#
+
+    def count(self, count, duration, fname, end, job=None):
+        """
+        Deliver at once a "COUNT_EVT" message
+        """
+        with self.lock:
+            self.flush(job)
+            self.deliver("COUNT_EVT",
+                         count=count,
+                         duration=duration,
+                         fname=fname,
+                         end=end,
+                         job=job,
+                         )
+    # ----------------------------------------------------------------#
+
+    def close(self):
+        """
+        Stop the flusher and deliver all the pending messages.
+        Return the number of coalesced messages.
+        """
+        self.closed.set()
+        self.flusher.join()
+        with self.lock:
+            for job in list(self.lines) + list(self.progresses):
+                self.flush(job)
+        return self.coalesced
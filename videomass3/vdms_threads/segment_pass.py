@@ -0,0 +1,340 @@
+# -*- coding: UTF-8 -*-
+# Name: segment_pass.py
+# Porpose: FFmpeg long processing task on segmented video encoding
+# Compatibility: Python3, wxPython4 Phoenix
+# Author: Gianluca Pernigoto <jeanlucperni@gmail.com>
+# Copyright: (c) 2018/2020 Gianluca Pernigoto <jeanlucperni@gmail.com>
+# license: GPL3
+# Rev: December.10.2020 *PEP8 compatible*
+#########################################################
+# This file is part of Videomass.
+
+#    Videomass is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+
+#    Videomass is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+
+#    You should have received a copy of the GNU General Public License
+#    along with Videomass.  If not, see <http://www.gnu.org/licenses/>.
+
+#########################################################
+import wx
+import itertools
+import os
+import shutil
+import tempfile
+from threading import Thread, Lock
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import time
+from pubsub import pub
+from videomass3.vdms_utils.utils import segment_workers
+from videomass3.vdms_utils.utils import timeseq_range
+from videomass3.vdms_utils.utils import segment_ranges
+from videomass3.vdms_threads.ffmpeg_runner import FFmpegRunner
+from videomass3.vdms_threads.ffprobe_parser import FFProbeSections
+from videomass3.vdms_threads.progress_bus import ProgressBus
+from videomass3.vdms_io.log_writer import log_writer
+
+
+def logWrite(cmd, sterr, logname, logdir):
+    """
+    writes ffmpeg commands and status error during threads below
+    """
+    if sterr:
+        apnd = "...%s\n\n" % (sterr)
+    else:
+        apnd = "%s\n\n" % (cmd)
+
+    log_writer(logname, logdir).write(apnd)
+
+# ------------------------------ THREADS -------------------------------#
+
+
+class SegmentPass(Thread):
+    """
+    This class represents a separate thread for encoding long
+    video files in segments:
+
+    1) the keyframes timestamps of the first video stream are
+       read with ffprobe, then the source (or the time sequence
+       if any) is split on the keyframes in about two segments
+       for each worker;
+    2) the segments are encoded without audio in parallel, each
+       in its own FFmpeg process, while a further process encodes
+       the audio once for the whole file;
+    3) the encoded segments are joined with the concat demuxer
+       (input 0) and muxed with the subtitles, chapters and metadata
+       of the source (input 1) and the encoded audio (input 2),
+       without re-encoding.
+
+    Each process is sent to the Logging_Console as a concurrent
+    job (see the 'job' keyword of the pubsub messages). Files
+    are processed one after the other.
+
+    """
+    # get videomass wx.App attribute
+    get = wx.GetApp()
+    LOGDIR = get.LOGdir
+    FFMPEG_URL = get.FFMPEG_url
+    FFPROBE_URL = get.FFPROBE_url
+    FFMPEG_LOGLEV = get.FFMPEG_loglev
+    FF_THREADS = get.FFthreads
+    FF_JOBS = get.FFjobs
+    SUFFIX = '' if get.FILEsuffix == 'none' else get.FILEsuffix
+    NOT_EXIST_MSG = _("Is 'ffmpeg' installed on your system?")
+    MIN_SEGMENT = 30.0  # shorter segments are not worth a process
+    SEGMENT_EXT = 'mkv'  # container of the intermediate files
+    # ---------------------------------------------------------------
+
+    def __init__(self, varargs, duration, logname, timeseq):
+        """
+        The 'passlist' attribute contains the video options of
+        the segments, the audio options and the muxing options.
+        The 'volume' attribute may have an empty value.
+        """
+        self.stop_work_thread = False  # process terminate
+        self.not_exist = False  # if True, ffmpeg cannot be run
+        self.failed = False  # if True, the current file has failed
+        self.filelist = varargs[1]  # list of files (items)
+        self.passlist = varargs[5]  # [video opt, audio opt, mux opt]
+        self.outputdir = varargs[3]  # output path
+        self.extoutput = varargs[2]  # format (extension)
+        self.duration = duration  # duration list
+        self.volume = varargs[7]  # (lista norm.)se non richiesto rimane None
+        self.countmax = len(varargs[1])  # length file list
+        self.logname = logname  # title name of file log
+        self.time_seq = timeseq  # a time segment
+        # the segments of a file are encoded side by side by the
+        # available cpus, the files of the batch one after the other
+        self.workers = segment_workers(SegmentPass.FF_THREADS)
+        self.lock = Lock()  # serializes log writing between jobs
+
+        self.bus = ProgressBus(partial(wx.CallAfter, pub.sendMessage))
+
+        Thread.__init__(self)
+        """initialize"""
+        self.start()  # start the thread (va in self.run())
+
+    def run(self):
+        """
+        Subprocess initialize thread.
+        """
+        for (index, (files,
+                     folders,
+                     volume,
+                     duration)) in enumerate(
+                         itertools.zip_longest(self.filelist,
+                                               self.outputdir,
+                                               self.volume,
+                                               self.duration,
+                                               fillvalue='',
+                                               )):
+            basename = os.path.basename(files)  # nome file senza path
+            filename = os.path.splitext(basename)[0]  # nome senza estensione
+            source_ext = os.path.splitext(basename)[1].split('.')[1]  # ext
+            outext = source_ext if not self.extoutput else self.extoutput
+            count = 'File %s/%s' % (index + 1, self.countmax,)
+            self.failed = False
+            tmpdir = tempfile.mkdtemp(prefix='.videomass-', dir=folders)
+            try:
+                self.encode(index, count, files, volume, duration, tmpdir,
+                            '%s/%s%s.%s' % (folders, filename,
+                                            SegmentPass.SUFFIX, outext))
+            finally:
+                shutil.rmtree(tmpdir, ignore_errors=True)
+
+            if self.stop_work_thread or self.not_exist:
+                break
+
+        coalesced = self.bus.close()  # deliver the pending messages
+        logWrite('Coalesced progress messages: %s' % coalesced,
+                 '',
+                 self.logname,
+                 SegmentPass.LOGDIR,
+                 )
+        time.sleep(.5)
+        wx.CallAfter(pub.sendMessage, "END_EVT")
+    # --------------------------------------------------------------------#
+
+    def encode(self, index, count, files, volume, duration, tmpdir, output):
+        """
+        Split, encode and join a single file.
+        """
+        start, length = timeseq_range(self.time_seq)
+        end = start + (length if length else duration)
+        keyframes, offset = self.keyframes(files, start, length)
+        ranges = segment_ranges(keyframes, start, end, self.workers * 2,
+                                SegmentPass.MIN_SEGMENT, offset)
+        segments = []
+        with ThreadPoolExecutor(max_workers=self.workers + 1) as pool:
+            if '-an' not in self.passlist[1].split():
+                # same container of the output, for the same default codec
+                audio = os.path.join(tmpdir, 'audio%s' %
+                                     os.path.splitext(output)[1])
+                cmd = ('%s %s -i "%s" %s %s %s -y "%s"' % (
+                       self.time_seq,
+                       SegmentPass.FFMPEG_LOGLEV,
+                       files,
+                       self.passlist[1],
+                       volume,
+                       SegmentPass.FF_THREADS,
+                       audio,))
+                pool.submit(self.job, cmd, 0, '%s audio' % count, files,
+                            (index, -1))
+            else:
+                audio = None
+
+            for num, (ss, t) in enumerate(ranges):
+                seg = os.path.join(tmpdir, 'segment_%04d.%s' % (
+                                   num, SegmentPass.SEGMENT_EXT))
+                last = num == len(ranges) - 1 and not length
+                cmd = ('-ss %s %s %s -i "%s" %s %s -y "%s"' % (
+                       ss,
+                       '' if last else '-t %s' % t,
+                       SegmentPass.FFMPEG_LOGLEV,
+                       files,
+                       self.passlist[0],
+                       SegmentPass.FF_THREADS,
+                       seg,))
+                segments.append(seg)
+                pool.submit(self.job, cmd, t,
+                            '%s segment %s/%s' % (count, num + 1, len(ranges)),
+                            files, (index, num))
+
+        if self.failed or self.stop_work_thread or self.not_exist:
+            return
+
+        concat = os.path.join(tmpdir, 'segments.txt')
+        with open(concat, 'w') as txt:
+            for seg in segments:
+                txt.write("file '%s'\n" % seg.replace("'", "'\\''"))
+
+        cmd = ('%s -f concat -safe 0 -i "%s" %s -i "%s" %s %s %s '
+               '-y "%s"' % (SegmentPass.FFMPEG_LOGLEV,
+                            concat,
+                            self.time_seq,
+                            files,
+                            '-i "%s"' % audio if audio else '',
+                            self.passlist[2],
+                            '-map 2:a?' if audio else '',
+                            output,))
+        self.job(cmd, 0, '%s join' % count, files, (index, len(ranges)))
+    # --------------------------------------------------------------------#
+
+    def keyframes(self, files, start, length):
+        """
+        Return a tuple (keyframes, start_time) with the keyframes
+        timestamps of the first video stream in the given range
+        (relative to the file start) and the start time of the
+        container: the timestamps are not relative to it. On errors
+        the list is empty and the file is encoded in a single segment.
+        """
+        offset = 0.0
+        probe = FFProbeSections(SegmentPass.FFPROBE_URL, files,
+                                show=('format',),
+                                entries='format=start_time')
+        for name, lines in probe:
+            fmt = dict([x.split('=', 1) for x in lines if '=' in x])
+            try:
+                offset = float(fmt.get('start_time'))
+            except (TypeError, ValueError):
+                offset = 0.0
+        if probe.error:
+            return [], 0.0
+
+        probe = FFProbeSections(SegmentPass.FFPROBE_URL, files,
+                                show=('packets',), select='v:0',
+                                entries='packet=pts_time,flags',
+                                intervals=('%s%%+%s' % (start + offset,
+                                                        length)
+                                           if length else None))
+        keys = []
+        for name, lines in probe:
+            packet = dict([x.split('=', 1) for x in lines if '=' in x])
+            if packet.get('flags', '').startswith('K'):
+                try:
+                    keys.append(float(packet.get('pts_time')))
+                except (TypeError, ValueError):
+                    continue
+        if probe.error:
+            return [], offset
+        return keys, offset
+    # --------------------------------------------------------------------#
+
+    def job(self, args, duration, count, files, tag):
+        """
+        Run a single FFmpeg process with the given arguments.
+        'tag' is the job identifier sent with the pubsub messages.
+        """
+        if self.stop_work_thread or self.not_exist or self.failed:
+            return
+
+        runner = FFmpegRunner(SegmentPass.FFMPEG_URL, args)
+        self.bus.count(count=count,
+                       duration=duration,
+                       fname=files,
+                       end='',
+                       job=tag,
+                       )
+        with self.lock:
+            logWrite("%s\n%s" % (count, runner.cmd),
+                     '',
+                     self.logname,
+                     SegmentPass.LOGDIR,
+                     )  # write n/n + command only
+
+        def on_progress(progress):
+            self.bus.progress(progress, duration, job=tag)
+            if self.stop_work_thread or self.failed:
+                runner.stop()
+
+        def on_output(line):
+            self.bus.output(line, duration, job=tag)
+            if self.stop_work_thread or self.failed:
+                runner.stop()
+
+        runner.on_progress = on_progress
+        runner.on_output = on_output
+        try:
+            status = runner.run()
+
+        except (OSError, FileNotFoundError) as err:
+            self.not_exist = True
+            e = "%s\n  %s" % (err, SegmentPass.NOT_EXIST_MSG)
+            self.bus.count(count=e,
+                           duration=0,
+                           fname=files,
+                           end='error',
+                           job=tag,
+                           )
+            return
+
+        if status:  # error
+            self.failed = True
+            self.bus.status(status, duration, job=tag)
+            with self.lock:
+                logWrite('',
+                         "%s\nExit status: %s" % (count, status),
+                         self.logname,
+                         SegmentPass.LOGDIR,
+                         )  # append exit error number
+        else:  # ok
+            self.bus.count(count='',
+                           duration='',
+                           fname='',
+                           end='ok',
+                           job=tag,
+                           )
+    # --------------------------------------------------------------------#
+
+    def stop(self):
+        """
+        Sets the stop work thread to terminate the process
+        """
+        self.stop_work_thread = True
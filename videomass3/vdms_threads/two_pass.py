@@ -24,15 +24,27 @@
 
 #########################################################
 import wx
-import subprocess
-import platform
-if not platform.system() == 'Windows':
-    import shlex
 import itertools
 import os
-from threading import Thread
+import shutil
+import tempfile
+from threading import Thread, Lock
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 import time
 from pubsub import pub
+from videomass3.vdms_utils.utils import pool_size
+from videomass3.vdms_utils.utils import passlog_option
+from videomass3.vdms_utils.utils import loglevel_info
+from videomass3.vdms_threads.ffmpeg_runner import FFmpegRunner
+from videomass3.vdms_threads.progress_bus import ProgressBus
+from videomass3.vdms_threads.adaptive_jobs import JobsController
+from videomass3.vdms_threads.volumedetect import (parse_analysis,
+                                                  fused_output,
+                                                  gain_filter)
+from videomass3.vdms_io.log_writer import log_writer
+from videomass3.vdms_io.probe_cache import ProbeCache
+from videomass3.vdms_io.analysis_cache import AnalysisCache
 
 
 def logWrite(cmd, sterr, logname, logdir):
@@ -44,8 +56,7 @@ def logWrite(cmd, sterr, logname, logdir):
     else:
         apnd = "%s\n\n" % (cmd)
 
-    with open(os.path.join(logdir, logname), "a") as log:
-        log.write(apnd)
+    log_writer(logname, logdir).write(apnd)
 
 
 # ------------------------------ THREADS -------------------------------#
@@ -71,33 +82,72 @@ class TwoPass(Thread):
     twice for two different tasks: the process on the first video pass and
     the process on the second video pass for video only.
 
+    Each file is a job with its own scratch directory (the working
+    directory of both processes) and passlogfile, so that more jobs
+    can run side by side: if the "max concurrent jobs" setting is
+    greater than 1, the first pass of a file runs while the second
+    pass of the previous one is encoding. In this case the pubsub
+    messages carry a 'job' keyword with the index of the file in
+    the queue (None on sequential conversions).
+
+    The volume compensation data is a list with the audio filter
+    of each file or, to analyze the audio on the first pass, a
+    dict e.g. {'normalize': 'PEAK', 'target': -1.0, 'outmap': '1',
+    'inmap': '-map 0:1', 'audio': [filenames]}: in this case the
+    first pass of the files listed in 'audio' (the ones with the
+    audio stream to analyze) has a second null output with the
+    audio analysis filters (see volumedetect) and the gain is
+    given to the second pass, which saves a decode of each file.
+    The measurement records are kept on the analysis cache, the
+    files already measured are not analyzed again.
+
     """
     get = wx.GetApp()  # get videomass wx.App attribute
     OS = get.OS
     LOGDIR = get.LOGdir
+    CACHEDIR = get.CACHEdir
+    TMP = get.TMP
     FFMPEG_URL = get.FFMPEG_url
     FFMPEG_LOGLEV = get.FFMPEG_loglev
     FF_THREADS = get.FFthreads
+    FF_JOBS = get.FFjobs
     SUFFIX = '' if get.FILEsuffix == 'none' else get.FILEsuffix
     NOT_EXIST_MSG = _("Is 'ffmpeg' installed on your system?")
 
-    def __init__(self, varargs, duration, logname, timeseq):
+    def __init__(self, varargs, duration, logname, timeseq, journal=None):
         """
         The 'volume' attribute may have an empty value, but it will
         have no influence on the type of conversion.
+        The 'journal' is an optional JobJournal object to keep
+        updated with the status of each pass.
         """
         self.stop_work_thread = False  # process terminate
+        self.not_exist = False  # if True, ffmpeg cannot be run
         self.filelist = varargs[1]  # list of files (elements)
         self.passList = varargs[5]  # comand list set for double-pass
         self.outputdir = varargs[3]  # output path
         self.extoutput = varargs[2]  # format (extension)
         self.duration = duration  # duration list
         self.time_seq = timeseq  # a time segment
+        self.journal = journal  # JobJournal or None
         self.volume = varargs[7]  # volume compensation data
-        self.count = 0  # count first for loop
+        self.fused = None  # dict if the audio is analyzed on pass one
+        if isinstance(self.volume, dict):
+            self.fused, self.volume = self.volume, []
+            self.cache = AnalysisCache(TwoPass.CACHEDIR)
         self.countmax = len(varargs[1])  # length file list
         self.logname = logname  # title name of file log
         self.nul = 'NUL' if TwoPass.OS == 'Windows' else '/dev/null'
+        self.workers = pool_size(TwoPass.FF_JOBS, TwoPass.FF_THREADS,
+                                 self.countmax)  # concurrent jobs
+        self.lock = Lock()  # serializes log writing between jobs
+        self.controller = None  # JobsController if 0 (automatic) jobs
+        if self.workers > 1 and str(TwoPass.FF_JOBS).strip() == '0':
+            log = partial(logWrite, sterr='', logname=logname,
+                          logdir=TwoPass.LOGDIR)
+            self.controller = JobsController(self.workers, log=log)
+
+        self.bus = ProgressBus(partial(wx.CallAfter, pub.sendMessage))
 
         Thread.__init__(self)
         """initialize"""
@@ -107,181 +157,231 @@ class TwoPass(Thread):
         """
         Subprocess initialize thread.
         """
-        for (files,
-             folders,
-             volume,
-             duration) in itertools.zip_longest(self.filelist,
-                                                self.outputdir,
-                                                self.volume,
-                                                self.duration,
-                                                fillvalue='',
-                                                ):
-            basename = os.path.basename(files)  # nome file senza path
-            filename = os.path.splitext(basename)[0]  # nome senza ext
-            source_ext = os.path.splitext(basename)[1].split('.')[1]  # ext
-            outext = source_ext if not self.extoutput else self.extoutput
+        if not os.path.exists(TwoPass.TMP):
+            os.makedirs(TwoPass.TMP, mode=0o777)
+
+        queue = list(enumerate(itertools.zip_longest(self.filelist,
+                                                     self.outputdir,
+                                                     self.volume,
+                                                     self.duration,
+                                                     fillvalue='',
+                                                     )))
+        if self.workers == 1:
+            for index, item in queue:
+                try:
+                    self.job(index, item, None)
+                except Exception as err:  # report it, go on with the batch
+                    self.job_failed(index, item, None, err)
+                if self.stop_work_thread or self.not_exist:
+                    break
+        else:
+            job = self.slot if self.controller else self.job
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                futures = [(pool.submit(job, index, item, index), index,
+                            item) for index, item in queue]
+            for future, index, item in futures:
+                try:
+                    future.result()
+                except Exception as err:  # else it is lost in the pool
+                    self.job_failed(index, item, index, err)
+
+        coalesced = self.bus.close()  # deliver the pending messages
+        logWrite('Coalesced progress messages: %s' % coalesced,
+                 '',
+                 self.logname,
+                 TwoPass.LOGDIR,
+                 )
+        time.sleep(.5)
+        wx.CallAfter(pub.sendMessage, "END_EVT")
+    # --------------------------------------------------------------------#
 
-            # --------------- first pass
-            pass1 = ('%s %s %s -i "%s" %s %s '
-                     '-y %s' % (TwoPass.FFMPEG_URL,
-                                TwoPass.FFMPEG_LOGLEV,
-                                self.time_seq,
-                                files,
-                                self.passList[0],
-                                TwoPass.FF_THREADS,
-                                self.nul,
-                                ))
-            self.count += 1
-            count = 'File %s/%s - Pass One' % (self.count, self.countmax)
-            cmd = "%s\n%s" % (count, pass1)
-            wx.CallAfter(pub.sendMessage,
-                         "COUNT_EVT",
-                         count=count,
-                         duration=duration,
-                         fname=files,
-                         end='',
-                         )
-            logWrite(cmd,
-                     '',
+    def job_failed(self, index, item, tag, err):
+        """
+        Report a job stopped by an unexpected error as failed on
+        the console, the journal and the log.
+        """
+        if self.journal:
+            try:
+                self.journal.update(index, 2, 'failed')
+            except Exception:
+                pass  # the error may come from the journal
+        self.bus.status(1, item[3], job=tag)
+        with self.lock:
+            logWrite('',
+                     'File %s/%s\n%s: %s' % (index + 1, self.countmax,
+                                              item[0], err),
                      self.logname,
                      TwoPass.LOGDIR,
-                     )  # write n/n + command only
+                     )
+    # --------------------------------------------------------------------#
 
-            if not TwoPass.OS == 'Windows':
-                pass1 = shlex.split(pass1)
-                info = None
-            else:  # Hide subprocess window on MS Windows
-                info = subprocess.STARTUPINFO()
-                info.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            try:
-                with subprocess.Popen(pass1,
-                                      stderr=subprocess.PIPE,
-                                      bufsize=1,
-                                      universal_newlines=True,
-                                      startupinfo=info,) as p1:
-
-                    for line in p1.stderr:
-                        wx.CallAfter(pub.sendMessage,
-                                     "UPDATE_EVT",
-                                     output=line,
-                                     duration=duration,
-                                     status=0
-                                     )
-                        if self.stop_work_thread:  # break second 'for' loop
-                            p1.terminate()
-                            break
-
-                    if p1.wait():  # will add '..failed' to txtctrl
-                        wx.CallAfter(pub.sendMessage,
-                                     "UPDATE_EVT",
-                                     output=line,
-                                     duration=duration,
-                                     status=p1.wait(),
-                                     )
+    def slot(self, index, item, tag):
+        """
+        Run a job as soon as the JobsController has a free slot.
+        """
+        self.controller.acquire()
+        try:
+            self.job(index, item, tag)
+        finally:
+            self.controller.release(tag)
+    # --------------------------------------------------------------------#
+
+    def job(self, index, item, tag):
+        """
+        Run both passes of a single queued item in a scratch
+        directory which is removed at the end.
+        """
+        if self.stop_work_thread or self.not_exist:
+            return
+
+        files, folders, volume, duration = item
+        basename = os.path.basename(files)  # nome file senza path
+        filename = os.path.splitext(basename)[0]  # nome senza ext
+        source_ext = os.path.splitext(basename)[1].split('.')[1]  # ext
+        outext = source_ext if not self.extoutput else self.extoutput
+        output = '%s/%s%s.%s' % (folders, filename, TwoPass.SUFFIX, outext)
+        scratch = tempfile.mkdtemp(prefix='twopass-', dir=TwoPass.TMP)
+        passlog = os.path.join(scratch, 'passlog')
+        try:
+            # --------------- first pass
+            loglevel, analysis, record = TwoPass.FFMPEG_LOGLEV, '', None
+            if self.fused:
+                fingerprint = ProbeCache.shared(TwoPass.CACHEDIR).get(
+                    files, 'fingerprint')
+                options = 'analysis %s' % self.fused['inmap']
+                record = self.cache.get(fingerprint, self.time_seq, options)
+                if not record:
+                    analysis = fused_output(self.fused, files, self.nul)
+                if analysis:  # the filters print at the info level
+                    loglevel = loglevel_info(TwoPass.FFMPEG_LOGLEV)
+            pass1 = ('%s %s -i "%s" %s %s -y %s %s' % (
+                     loglevel,
+                     self.time_seq,
+                     files,
+                     passlog_option(self.passList[0], passlog),
+                     TwoPass.FF_THREADS,
+                     self.nul,
+                     analysis,
+                     ))
+            count = 'File %s/%s - Pass One' % (index + 1, self.countmax)
+            lines = [] if analysis else None
+            if not self.process(pass1, count, files, duration,
+                                scratch, tag, (index, 1, None), lines):
+                return
+            if analysis:
+                record = parse_analysis(''.join(lines))
+                if record:
+                    self.cache.put(fingerprint, self.time_seq, options,
+                                   record)
+                else:
+                    with self.lock:
                         logWrite('',
-                                 "Exit status: %s" % p1.wait(),
+                                 "%s\nNo audio volume data found" % count,
                                  self.logname,
-                                 TwoPass.LOGDIR
-                                 )  # append exit error number
-
-            except (OSError, FileNotFoundError) as err:
-                e = "%s\n  %s" % (err, TwoPass.NOT_EXIST_MSG)
-                wx.CallAfter(pub.sendMessage,
-                             "COUNT_EVT",
-                             count=e,
-                             duration=0,
-                             fname=files,
-                             end='error',
-                             )
-                break
-
-            if self.stop_work_thread:  # break first 'for' loop
-                p1.terminate()
-                break  # fermo il ciclo for, altrimenti passa avanti
-
-            if p1.wait() == 0:  # will add '..terminated' to txtctrl
-                wx.CallAfter(pub.sendMessage,
-                             "COUNT_EVT",
-                             count='',
-                             duration='',
-                             fname='',
-                             end='ok'
-                             )
-            # --------------- second pass ----------------#
-            pass2 = ('%s %s %s -i "%s" %s %s %s '
-                     '-y "%s/%s%s.%s"' % (TwoPass.FFMPEG_URL,
-                                        TwoPass.FFMPEG_LOGLEV,
-                                        self.time_seq,
-                                        files,
-                                        self.passList[1],
-                                        volume,
-                                        TwoPass.FF_THREADS,
-                                        folders,
-                                        filename,
-                                        TwoPass.SUFFIX,
-                                        outext,
-                                        ))
-            count = 'File %s/%s - Pass Two' % (self.count, self.countmax,)
-            cmd = "%s\n%s" % (count, pass2)
-            wx.CallAfter(pub.sendMessage,
-                         "COUNT_EVT",
-                         count=count,
-                         duration=duration,
-                         fname=files,
-                         end='',
-                         )
-            logWrite(cmd, '', self.logname, TwoPass.LOGDIR)
-
-            if not TwoPass.OS == 'Windows':
-                pass2 = shlex.split(pass2)
-                info = None
-            else:  # Hide subprocess window on MS Windows
-                info = subprocess.STARTUPINFO()
-                info.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            with subprocess.Popen(pass2,
-                                  stderr=subprocess.PIPE,
-                                  bufsize=1,
-                                  universal_newlines=True,
-                                  startupinfo=info,) as p2:
-
-                for line2 in p2.stderr:
-                    wx.CallAfter(pub.sendMessage,
-                                 "UPDATE_EVT",
-                                 output=line2,
-                                 duration=duration,
-                                 status=0,
-                                 )
-                    if self.stop_work_thread:
-                        p2.terminate()
-                        break
-
-                if p2.wait():  # will add '..failed' to txtctrl
-                    wx.CallAfter(pub.sendMessage,
-                                 "UPDATE_EVT",
-                                 output=line,
-                                 duration=duration,
-                                 status=p2.wait(),
+                                 TwoPass.LOGDIR,
                                  )
-                    logWrite('',
-                             "Exit status: %s" % p2.wait(),
-                             self.logname,
-                             TwoPass.LOGDIR,
-                             )  # append exit error number
-
-            if self.stop_work_thread:  # break first 'for' loop
-                p2.terminate()
-                break  # fermo il ciclo for, altrimenti passa avanti
-
-            if p2.wait() == 0:  # will add '..terminated' to txtctrl
-                wx.CallAfter(pub.sendMessage,
-                             "COUNT_EVT",
-                             count='',
-                             duration='',
-                             fname='',
-                             end='ok'
-                             )
-        time.sleep(.5)
-        wx.CallAfter(pub.sendMessage, "END_EVT")
+            if record:
+                volume = gain_filter(record,
+                                     self.fused['normalize'],
+                                     self.fused['target'],
+                                     self.fused['outmap'],
+                                     )
+            # --------------- second pass ----------------#
+            pass2 = ('%s %s -i "%s" %s %s %s -y "%s"' % (
+                     TwoPass.FFMPEG_LOGLEV,
+                     self.time_seq,
+                     files,
+                     passlog_option(self.passList[1], passlog),
+                     volume,
+                     TwoPass.FF_THREADS,
+                     output,
+                     ))
+            count = 'File %s/%s - Pass Two' % (index + 1, self.countmax,)
+            self.process(pass2, count, files, duration, scratch, tag,
+                         (index, 2, output))
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+    # --------------------------------------------------------------------#
+
+    def process(self, args, count, files, duration, scratch, tag, step,
+                lines=None):
+        """
+        Run a FFmpeg pass with the given arguments. Return True
+        if it was successful. 'step' is a tuple (index, pass,
+        output) for the journal. The output lines are appended
+        to the 'lines' list, if any.
+        """
+        runner = FFmpegRunner(TwoPass.FFMPEG_URL, args, cwd=scratch)
+        self.bus.count(count=count,
+                       duration=duration,
+                       fname=files,
+                       end='',
+                       job=tag,
+                       )
+        with self.lock:
+            logWrite("%s\n%s" % (count, runner.cmd),
+                     '',
+                     self.logname,
+                     TwoPass.LOGDIR,
+                     )  # write n/n + command only
+
+        if self.journal:
+            self.journal.update(step[0], step[1], 'running', step[2])
+
+        def on_progress(progress):
+            self.bus.progress(progress, duration, job=tag)
+            if self.controller:
+                self.controller.sample(tag, progress)
+            if self.stop_work_thread:
+                runner.stop()
+
+        def on_output(line):
+            self.bus.output(line, duration, job=tag)
+            if self.stop_work_thread:
+                runner.stop()
+            if lines is not None:
+                lines.append(line)
+
+        runner.on_progress = on_progress
+        runner.on_output = on_output
+        try:
+            status = runner.run()
+
+        except (OSError, FileNotFoundError) as err:
+            self.not_exist = True
+            e = "%s\n  %s" % (err, TwoPass.NOT_EXIST_MSG)
+            self.bus.count(count=e,
+                           duration=0,
+                           fname=files,
+                           end='error',
+                           job=tag,
+                           )
+            return False
+
+        if status:  # will add '..failed' to txtctrl
+            if self.journal:
+                self.journal.update(step[0], step[1], 'failed')
+            self.bus.status(status, duration, job=tag)
+            with self.lock:
+                logWrite('',
+                         "%s\nExit status: %s" % (count, status),
+                         self.logname,
+                         TwoPass.LOGDIR
+                         )  # append exit error number
+            return False
+
+        if self.stop_work_thread:
+            return False
+
+        if self.journal:
+            self.journal.update(step[0], step[1], 'done')
+        self.bus.count(count='',
+                       duration='',
+                       fname='',
+                       end='ok',
+                       job=tag,
+                       )  # will add '..terminated' to txtctrl
+        return True
     # --------------------------------------------------------------------#
 
     def stop(self):
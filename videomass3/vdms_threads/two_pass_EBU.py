@@ -24,15 +24,23 @@
 
 #########################################################
 import wx
-import subprocess
-import platform
-if not platform.system() == 'Windows':
-    import shlex
 import itertools
 import os
-from threading import Thread
+import re
+from threading import Thread, Lock
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 import time
 from pubsub import pub
+from videomass3.vdms_utils.utils import pool_size
+from videomass3.vdms_utils.utils import loudnorm_json
+from videomass3.vdms_utils.utils import loudnorm_targets
+from videomass3.vdms_threads.ffmpeg_runner import FFmpegRunner
+from videomass3.vdms_threads.progress_bus import ProgressBus
+from videomass3.vdms_io.log_writer import log_writer
+from videomass3.vdms_io.probe_cache import ProbeCache
+from videomass3.vdms_io.analysis_cache import AnalysisCache
+from videomass3.vdms_threads.volumedetect import VolumeDetectThread
 
 
 def logWrite(cmd, sterr, logname, logdir):
@@ -44,8 +52,7 @@ def logWrite(cmd, sterr, logname, logdir):
     else:
         apnd = "%s\n\n" % (cmd)
 
-    with open(os.path.join(logdir, logname), "a") as log:
-        log.write(apnd)
+    log_writer(logname, logdir).write(apnd)
 
 # ------------------------------ THREADS -------------------------------#
 """
@@ -63,25 +70,64 @@ from-subprocess-popen-proc-stdout-readline-blocks-no-dat?rq=1
 """
 
 
+def json_format(command):
+    """
+    Set the print_format=json option to the loudnorm filter
+    of the given command string.
+    """
+    args = []
+    for arg in command.split():
+        if arg.startswith('loudnorm='):
+            arg = ':'.join([x for x in arg.split(':')
+                            if not x.startswith('print_format=')])
+            arg += ':print_format=json'
+        args.append(arg)
+    return ' '.join(args)
+
+
 class Loudnorm(Thread):
     """
     Like `TwoPass_Thread` but execute -loudnorm parsing from first
     pass and has definitions to apply on second pass.
 
+    If the first pass is an audio only analysis (it has the -vn
+    option), all the files in the batch are measured at the same
+    time first, then each one is queued for the second pass as
+    soon as its measurement is done. The second pass runs as many
+    jobs as the "max concurrent jobs" setting allows. In this case
+    the pubsub messages carry a 'job' keyword (index, pass).
+    Otherwise the first pass is also the first video pass and the
+    files are processed one after the other as usual.
+
+    The measurements of the audio only analysis are kept on the
+    analysis cache: the files already measured with the same
+    first pass options and time segment skip the first pass, as
+    well as the files with a measurement record of the combined
+    audio analysis (see volumedetect.VolumeDetectThread) of the
+    same audio stream and time segment, if the I, TP and LRA
+    targets are the ones of that analysis: the second pass uses
+    the measured target offset when loudnorm falls back to the
+    dynamic mode.
+
     """
     # get videomass wx.App attribute
     get = wx.GetApp()
     OS = get.OS
     LOGDIR = get.LOGdir
+    CACHEDIR = get.CACHEdir
     FFMPEG_URL = get.FFMPEG_url
     FF_THREADS = get.FFthreads
+    FF_JOBS = get.FFjobs
     SUFFIX = '' if get.FILEsuffix == 'none' else get.FILEsuffix
     NOT_EXIST_MSG = _("Is 'ffmpeg' installed on your system?")
 
-    def __init__(self, var, duration, logname, timeseq):
+    def __init__(self, var, duration, logname, timeseq, journal=None):
         """
+        The 'journal' is an optional JobJournal object to keep
+        updated with the status of each pass.
         """
         self.stop_work_thread = False  # process terminate
+        self.not_exist = False  # if True, ffmpeg cannot be run
         self.filelist = var[1]  # list of files (elements)
         self.ext = var[2]
         self.passList = var[5]  # comand list
@@ -89,10 +135,22 @@ class Loudnorm(Thread):
         self.outputdir = var[3]  # output path
         self.duration = duration  # duration list
         self.time_seq = timeseq  # a time segment
-        self.count = 0  # count first for loop
+        self.journal = journal  # JobJournal or None
         self.countmax = len(var[1])  # length file list
         self.logname = logname  # title name of file log
         self.nul = 'NUL' if Loudnorm.OS == 'Windows' else '/dev/null'
+        self.analysis = '-vn' in self.passList[0].split()  # audio only
+        self.cache = AnalysisCache(Loudnorm.CACHEDIR)
+        self.options = 'loudnorm %s' % json_format(self.passList[0])
+        audiomap = re.search(r'(?<!\S)-map 0:\d+(?!\S)', self.passList[0])
+        self.combined = None  # the combined analysis has other targets
+        if (loudnorm_targets(self.passList[0]) ==
+                VolumeDetectThread.TARGETS):
+            self.combined = 'analysis %s' % (audiomap.group(0) if audiomap
+                                             else '')
+        self.lock = Lock()  # serializes log writing between jobs
+
+        self.bus = ProgressBus(partial(wx.CallAfter, pub.sendMessage))
 
         Thread.__init__(self)
         """initialize"""
@@ -102,204 +160,254 @@ class Loudnorm(Thread):
         """
         Subprocess initialize thread.
         """
-        summary = {'Input Integrated:': None, 'Input True Peak:': None,
-                   'Input LRA:': None, 'Input Threshold:': None,
-                   'Output Integrated:': None, 'Output True Peak:': None,
-                   'Output LRA:': None, 'Output Threshold:': None,
-                   'Normalization Type:': None, 'Target Offset:': None
-                   }
-        for (files,
-             folders,
-             duration) in itertools.zip_longest(self.filelist,
-                                                self.outputdir,
-                                                self.duration,
-                                                fillvalue='',
-                                                ):
-            basename = os.path.basename(files)  # name.ext
-            filename = os.path.splitext(basename)[0]  # name
-            source_ext = os.path.splitext(basename)[1].split('.')[1]  # ext
-            outext = source_ext if not self.ext else self.ext
-
-            # --------------- first pass
-            pass1 = ('{0} -nostdin -loglevel info -stats -hide_banner '
-                     '{1} -i "{2}" {3} {4} -y {5}'.format(Loudnorm.FFMPEG_URL,
-                                                          self.time_seq,
-                                                          files,
-                                                          self.passList[0],
-                                                          Loudnorm.FF_THREADS,
-                                                          self.nul,
-                                                          ))
-            self.count += 1
-            count = ('Loudnorm ebu: Getting statistics for measurements...\n  '
-                     'File %s/%s - Pass One' % (self.count, self.countmax,))
-            cmd = "%s\n%s" % (count, pass1)
-            wx.CallAfter(pub.sendMessage,
-                         "COUNT_EVT",
-                         count=count,
-                         duration=duration,
-                         fname=files,
-                         end='',
+        queue = list(enumerate(itertools.zip_longest(self.filelist,
+                                                     self.outputdir,
+                                                     self.duration,
+                                                     fillvalue='',
+                                                     )))
+        if not self.analysis:
+            for index, item in queue:
+                measured = self.measure(index, item, None)
+                if measured:
+                    self.encode(index, item, measured, None)
+                if self.stop_work_thread or self.not_exist:
+                    break
+        else:
+            analyzers = pool_size(self.countmax, '-threads 1', self.countmax)
+            encoders = pool_size(Loudnorm.FF_JOBS, Loudnorm.FF_THREADS,
+                                 self.countmax)
+            # NOTE the measuring pool exits first, so that all the
+            # results are queued before the encoding pool shutdown
+            with ThreadPoolExecutor(max_workers=encoders) as encoding, \
+                    ThreadPoolExecutor(max_workers=analyzers) as measuring:
+                for index, item in queue:
+                    future = measuring.submit(self.measure, index, item,
+                                              (index, 1))
+                    future.add_done_callback(
+                        partial(self.queued, encoding, index, item))
+
+        coalesced = self.bus.close()  # deliver the pending messages
+        logWrite('Coalesced progress messages: %s' % coalesced,
+                 '',
+                 self.logname,
+                 Loudnorm.LOGDIR,
+                 )
+        time.sleep(.5)
+        wx.CallAfter(pub.sendMessage, "END_EVT")
+    # --------------------------------------------------------------------#
+
+    def queued(self, encoding, index, item, future):
+        """
+        Queue the second pass of a measured file.
+        """
+        try:
+            measured = future.result()
+        except Exception as err:  # e.g. the journal, else it is lost
+            files, folders, duration = item
+            if self.journal:
+                self.journal.update(index, 1, 'failed')
+            self.bus.status(1, duration, job=(index, 1))
+            with self.lock:
+                logWrite('',
+                         'File %s/%s - Pass One\n%s: %s' % (
+                             index + 1, self.countmax, files, err),
+                         self.logname,
+                         Loudnorm.LOGDIR,
                          )
-            logWrite(cmd,
+            return
+        if measured:
+            encoding.submit(self.encode, index, item, measured, (index, 2))
+    # --------------------------------------------------------------------#
+
+    def measure(self, index, item, tag):
+        """
+        First pass: get the loudnorm statistics of a file.
+        Return a dict with the measured values or None.
+        """
+        if self.stop_work_thread or self.not_exist:
+            return None
+
+        files, folders, duration = item
+        count = ('Loudnorm ebu: Getting statistics for measurements...\n  '
+                 'File %s/%s - Pass One' % (index + 1, self.countmax,))
+        fingerprint = None
+        if self.analysis:
+            fingerprint = ProbeCache.shared(Loudnorm.CACHEDIR).get(
+                files, 'fingerprint')
+            measured = self.cache.get(fingerprint, self.time_seq,
+                                      self.options)
+            if not measured and self.combined:
+                record = self.cache.get(fingerprint, self.time_seq,
+                                        self.combined)
+                if record and record.get('loudnorm'):
+                    measured = record['loudnorm']
+            if measured:
+                self.bus.count(count='%s (cached statistics)' % count,
+                               duration=duration,
+                               fname=files,
+                               end='',
+                               job=tag,
+                               )
+                if self.journal:
+                    self.journal.update(index, 1, 'done')
+                self.bus.count(count='',
+                               duration='',
+                               fname='',
+                               end='ok',
+                               job=tag,
+                               )
+                return measured
+
+        pass1 = ('-nostdin -loglevel info -hide_banner '
+                 '{0} -i "{1}" {2} {3} -y {4}'.format(
+                     self.time_seq,
+                     files,
+                     json_format(self.passList[0]),
+                     Loudnorm.FF_THREADS,
+                     self.nul,
+                     ))
+        measured = self.process(pass1, count, files, duration, tag,
+                                (index, 1, None), parse=loudnorm_json)
+        if measured and self.analysis:
+            self.cache.put(fingerprint, self.time_seq, self.options,
+                           measured)
+        return measured
+    # --------------------------------------------------------------------#
+
+    def encode(self, index, item, measured, tag):
+        """
+        Second pass: apply the loudnorm filter with the measured
+        values.
+        """
+        if self.stop_work_thread or self.not_exist:
+            return
+
+        files, folders, duration = item
+        basename = os.path.basename(files)  # name.ext
+        filename = os.path.splitext(basename)[0]  # name
+        source_ext = os.path.splitext(basename)[1].split('.')[1]  # ext
+        outext = source_ext if not self.ext else self.ext
+        output = '%s/%s%s.%s' % (folders, filename, Loudnorm.SUFFIX, outext)
+        filters = ('%s:measured_I=%s:measured_LRA=%s:measured_TP=%s:'
+                   'measured_thresh=%s:offset=%s:linear=true:dual_mono='
+                   'true' % (self.passList[2],
+                             measured["input_i"],
+                             measured["input_lra"],
+                             measured["input_tp"],
+                             measured["input_thresh"],
+                             measured["target_offset"],
+                             )
+                   )
+        pass2 = ('-nostdin -loglevel info -hide_banner '
+                 '{0} -i "{1}" {2} -filter:a:{5} {3} {4} '
+                 '-y "{6}"'.format(self.time_seq,
+                                   files,
+                                   self.passList[1],
+                                   filters,
+                                   Loudnorm.FF_THREADS,
+                                   self.audioOUTmap[1],
+                                   output,
+                                   ))
+        count = ('Loudnorm ebu: apply EBU R128...\n  '
+                 'File %s/%s - Pass Two' % (index + 1, self.countmax,))
+        self.process(pass2, count, files, duration, tag, (index, 2, output))
+    # --------------------------------------------------------------------#
+
+    def process(self, args, count, files, duration, tag, step, parse=None):
+        """
+        Run a FFmpeg pass with the given arguments. Return the
+        output of the loudnorm filter (empty string if there is
+        not) or None on errors. 'step' is a tuple (index, pass,
+        output) for the journal. If 'parse' is given, return
+        the parsed output instead: the pass fails if it is empty.
+        """
+        runner = FFmpegRunner(Loudnorm.FFMPEG_URL, args)
+        self.bus.count(count=count,
+                       duration=duration,
+                       fname=files,
+                       end='',
+                       job=tag,
+                       )
+        with self.lock:
+            logWrite("%s\n%s" % (count, runner.cmd),
                      '',
                      self.logname,
                      Loudnorm.LOGDIR
                      )  # write n/n + command only
 
-            if not Loudnorm.OS == 'Windows':
-                pass1 = shlex.split(pass1)
-                info = None
-            else:   # Hide subprocess window on MS Windows
-                info = subprocess.STARTUPINFO()
-                info.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            try:
-                with subprocess.Popen(pass1,
-                                      stderr=subprocess.PIPE,
-                                      bufsize=1,
-                                      universal_newlines=True,
-                                      startupinfo=info,) as p1:
-
-                    for line in p1.stderr:
-                        wx.CallAfter(pub.sendMessage,
-                                     "UPDATE_EVT",
-                                     output=line,
-                                     duration=duration,
-                                     status=0
-                                     )
-                        if self.stop_work_thread:  # break first 'for' loop
-                            p1.terminate()
-                            break
-
-                        for k in summary.keys():
-                            if line.startswith(k):
-                                summary[k] = line.split(':')[1].split()[0]
-
-                    if p1.wait():  # will add '..failed' to txtctrl
-                        wx.CallAfter(pub.sendMessage,
-                                     "UPDATE_EVT",
-                                     output=line,
-                                     duration=duration,
-                                     status=p1.wait(),
-                                     )
-                        logWrite('',
-                                 "Exit status: %s" % p1.wait(),
-                                 self.logname,
-                                 Loudnorm.LOGDIR,
-                                 )  # append exit error number
-                        break
-
-            except (OSError, FileNotFoundError) as err:
-                e = "%s\n  %s" % (err, Loudnorm.NOT_EXIST_MSG)
-                wx.CallAfter(pub.sendMessage,
-                             "COUNT_EVT",
-                             count=e,
-                             duration=0,
-                             fname=files,
-                             end='error'
-                             )
-                break
-
-            if self.stop_work_thread:  # break first 'for' loop
-                p1.terminate()
-                break  # fermo il ciclo for, altrimenti passa avanti
-
-            if p1.wait() == 0:  # will add '..terminated' to txtctrl
-                wx.CallAfter(pub.sendMessage,
-                             "COUNT_EVT",
-                             count='',
-                             duration='',
-                             fname='',
-                             end='ok'
-                             )
-            # --------------- second pass ----------------#
-            filters = ('%s:measured_I=%s:measured_LRA=%s:measured_TP=%s:'
-                       'measured_thresh=%s:offset=%s:linear=true:dual_mono='
-                       'true' % (self.passList[2],
-                                 summary["Input Integrated:"],
-                                 summary["Input LRA:"],
-                                 summary["Input True Peak:"],
-                                 summary["Input Threshold:"],
-                                 summary["Target Offset:"]
-                                 )
-                       )
-            time.sleep(.5)
-
-            pass2 = ('{0} -nostdin -loglevel info -stats -hide_banner '
-                     '{1} -i "{2}" {3} -filter:a:{9} {4} {5} '
-                     '-y "{6}/{7}{10}.{8}"'.format(Loudnorm.FFMPEG_URL,
-                                                   self.time_seq,
-                                                   files,
-                                                   self.passList[1],
-                                                   filters,
-                                                   Loudnorm.FF_THREADS,
-                                                   folders,
-                                                   filename,
-                                                   outext,
-                                                   self.audioOUTmap[1],
-                                                   Loudnorm.SUFFIX,
-                                                   ))
-            count = ('Loudnorm ebu: apply EBU R128...\n  '
-                     'File %s/%s - Pass Two' % (self.count, self.countmax,))
-            cmd = "%s\n%s" % (count, pass2)
-            wx.CallAfter(pub.sendMessage,
-                         "COUNT_EVT",
-                         count=count,
-                         duration=duration,
-                         fname=files,
-                         end='',
-                         )
-            logWrite(cmd, '', self.logname, Loudnorm.LOGDIR)
-
-            if not Loudnorm.OS == 'Windows':
-                pass2 = shlex.split(pass2)
-                info = None
-            else:  # Hide subprocess window on MS Windows
-                info = subprocess.STARTUPINFO()
-                info.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            with subprocess.Popen(pass2,
-                                  stderr=subprocess.PIPE,
-                                  bufsize=1,
-                                  universal_newlines=True,
-                                  startupinfo=info,) as p2:
-
-                for line2 in p2.stderr:
-                    wx.CallAfter(pub.sendMessage,
-                                 "UPDATE_EVT",
-                                 output=line2,
-                                 duration=duration,
-                                 status=0,
-                                 )
-                    if self.stop_work_thread:  # break first 'for' loop
-                        p2.terminate()
-                        break
-
-                if p2.wait():  # will add '..failed' to txtctrl
-                    wx.CallAfter(pub.sendMessage,
-                                 "UPDATE_EVT",
-                                 output=line,
-                                 duration=duration,
-                                 status=p2.wait(),
-                                 )
+        if self.journal:
+            self.journal.update(step[0], step[1], 'running', step[2])
+
+        stats = []  # the lines printed by the loudnorm filter
+
+        def on_progress(progress):
+            self.bus.progress(progress, duration, job=tag)
+            if self.stop_work_thread:
+                runner.stop()
+
+        def on_output(line):
+            self.bus.output(line, duration, job=tag)
+            if self.stop_work_thread:
+                runner.stop()
+
+            if stats or line.startswith('[Parsed_loudnorm'):
+                stats.append(line)
+
+        runner.on_progress = on_progress
+        runner.on_output = on_output
+        try:
+            status = runner.run()
+
+        except (OSError, FileNotFoundError) as err:
+            self.not_exist = True
+            e = "%s\n  %s" % (err, Loudnorm.NOT_EXIST_MSG)
+            self.bus.count(count=e,
+                           duration=0,
+                           fname=files,
+                           end='error',
+                           job=tag,
+                           )
+            return None
+
+        if status:  # will add '..failed' to txtctrl
+            if self.journal:
+                self.journal.update(step[0], step[1], 'failed')
+            self.bus.status(status, duration, job=tag)
+            with self.lock:
+                logWrite('',
+                         "%s\nExit status: %s" % (count, status),
+                         self.logname,
+                         Loudnorm.LOGDIR,
+                         )  # append exit error number
+            return None
+
+        if self.stop_work_thread:
+            return None
+
+        output = ''.join(stats)
+        if parse:
+            output = parse(output)
+            if not output:
+                if self.journal:
+                    self.journal.update(step[0], step[1], 'failed')
+                self.bus.status(1, duration, job=tag)  # this job only
+                with self.lock:
                     logWrite('',
-                             "Exit status: %s" % p2.wait(),
+                             "%s\nNo loudnorm statistics found" % count,
                              self.logname,
                              Loudnorm.LOGDIR,
-                             )  # append exit error number
-
-            if self.stop_work_thread:  # break first 'for' loop
-                p2.terminate()
-                break  # fermo il ciclo for, altrimenti passa avanti
-
-            if p2.wait() == 0:  # will add '..terminated' to txtctrl
-                wx.CallAfter(pub.sendMessage,
-                             "COUNT_EVT",
-                             count='',
-                             duration='',
-                             fname='',
-                             end='ok'
                              )
-        time.sleep(.5)
-        wx.CallAfter(pub.sendMessage, "END_EVT")
+                return None
+
+        if self.journal:
+            self.journal.update(step[0], step[1], 'done')
+        self.bus.count(count='',
+                       duration='',
+                       fname='',
+                       end='ok',
+                       job=tag,
+                       )  # will add '..terminated' to txtctrl
+        return output
     # --------------------------------------------------------------------#
 
     def stop(self):
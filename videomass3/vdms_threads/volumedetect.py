@@ -5,7 +5,7 @@
 # Author: Gianluca Pernigoto <jeanlucperni@gmail.com>
 # Copyright: (c) 2018/2020 Gianluca Pernigoto <jeanlucperni@gmail.com>
 # license: GPL3
-# Rev: April.06.2020 *PEP8 compatible*
+# Rev: December.10.2020 *PEP8 compatible*
 #########################################################
 # This file is part of Videomass.
 
@@ -23,29 +23,310 @@
 #    along with Videomass.  If not, see <http://www.gnu.org/licenses/>.
 
 #########################################################
-import wx
 import os
-from pubsub import pub
-import subprocess
+import re
+import math
+import statistics
 import platform
-if not platform.system() == 'Windows':
-    import shlex
-from threading import Thread
+from concurrent.futures import ThreadPoolExecutor
+from threading import Thread, Lock, Event
+from videomass3.vdms_threads.ffmpeg_runner import FFmpegRunner, ProgressParser
+from videomass3.vdms_threads.pcm_analysis import PCMRunner
 from videomass3.vdms_io.make_filelog import write_log  # write initial log
+from videomass3.vdms_io.log_writer import log_writer
+from videomass3.vdms_utils.utils import (pool_size, loudnorm_json,
+                                         loudnorm_targets)
+
+
+def parse_volume(output):
+    """
+    Get the volumedetect values from the FFmpeg output text,
+    return [maxvol, medvol], e.g. ['-0.5 dB', '-20.1 dB'] or
+    None if the output has no audio volume data.
+    """
+    raw_list = output.split()  # splitta tutti gli spazi
+    if 'mean_volume:' not in raw_list or 'max_volume:' not in raw_list:
+        return None
+    medvol = "%s dB" % raw_list[raw_list.index("mean_volume:") + 1]
+    maxvol = "%s dB" % raw_list[raw_list.index("max_volume:") + 1]
+    return [maxvol, medvol]
+
+
+def parse_ebur128(output):
+    """
+    Get the values of the summary of the ebur128 filter from
+    the FFmpeg output text, return a dict e.g.
+    {'I': '-23.0', 'LRA': '5.4', 'true_peak': '-1.2'} (the
+    missing values are not included).
+    """
+    summary = output[output.rfind('Summary:'):]
+    if summary == output:
+        return {}
+    values = {}
+    for key, regex in (('I', r'\bI:\s+(\S+) LUFS'),
+                       ('LRA', r'\bLRA:\s+(\S+) LU\b'),
+                       ('true_peak', r'\bPeak:\s+(\S+) dBFS')):
+        found = re.search(regex, summary)
+        if found:
+            values[key] = found.group(1)
+    return values
+
+
+def parse_astats(output):
+    """
+    Get the "Overall" statistics of the astats filter from the
+    FFmpeg output text, return a dict e.g.
+    {'Peak level dB': '-1.0', 'RMS level dB': '-20.1', ...}
+    """
+    values = {}
+    overall = False
+    for line in output.splitlines():
+        if not line.startswith('[Parsed_astats'):
+            continue
+        text = line.split('] ', 1)[-1].strip()
+        if text == 'Overall':
+            overall = True
+        elif overall and ':' in text:
+            key, value = text.split(':', 1)
+            values[key.strip()] = value.strip()
+    return values
+
+
+def parse_analysis(output):
+    """
+    Get the measurement record of the combined analysis from the
+    FFmpeg output text (see VolumeDetectThread.FILTERS), a dict:
+
+        {'max_volume': '-0.5', 'mean_volume': '-20.1',  # volumedetect
+         'ebur128': {'I': '-23.0', ...},
+         'astats': {'Peak level dB': '-0.5', ...},
+         'loudnorm': {'input_i': '-23.05', ...} or None,
+         }
+
+    Return None if the output has no audio volume data.
+    """
+    volume = parse_volume(output)
+    if not volume:
+        return None
+    return {'max_volume': volume[0].split(' ')[0],
+            'mean_volume': volume[1].split(' ')[0],
+            'ebur128': parse_ebur128(output),
+            'astats': parse_astats(output),
+            'loudnorm': loudnorm_json(output),
+            }
+
+
+def volume_pair(record):
+    """
+    Return the [maxvol, medvol] volumedetect values of a
+    measurement record, e.g. ['-0.5 dB', '-20.1 dB']
+    """
+    return ['%s dB' % record['max_volume'], '%s dB' % record['mean_volume']]
+
+
+def fused_output(fused, filename, nul):
+    """
+    Return the null output which analyzes the audio of a file on
+    the first pass of a two pass encoding (see two_pass.TwoPass),
+    'fused' is the dict of the analysis, e.g.
+    {'inmap': '-map 0:1', 'audio': ['a.mkv'], ...}. Return an empty
+    string if the file is not listed in 'audio' (it has not the
+    audio stream to analyze): an output without streams would stop
+    the whole pass.
+    """
+    if filename not in fused.get('audio', []):
+        return ''
+    return '%s -vn -sn -dn -af %s -f null -y %s' % (fused['inmap'],
+                                                    VolumeDetectThread.FILTERS,
+                                                    nul)
+
+
+def gain_filter(record, normalize, target, stream):
+    """
+    Return the -filter:a option which brings the max volume
+    ('PEAK' normalize) or the mean volume ('RMS' normalize) of
+    a measurement record to the 'target' level in dBFS, e.g.
+    gain_filter(record, 'PEAK', -1.0, '1')
+    return '-filter:a:1 volume=0.500000dB' if max_volume is -1.5,
+    an empty string if the level is the target already (or it
+    is -inf, i.e. silence).
+    """
+    level = record['max_volume' if normalize == 'PEAK' else 'mean_volume']
+    offset = float(level) - float(target)
+    if offset == 0.0 or not math.isfinite(offset):
+        return ''
+    return '-filter:a:%s volume=%fdB' % (stream, -offset)
+
+
+def clock(seconds):
+    """
+    Format seconds as a FFmpeg time duration 'HH:MM:SS.mmm'
+    """
+    millis = int(round(seconds * 1000))
+    return '%02d:%02d:%02d.%03d' % (millis // 3600000,
+                                    millis // 60000 % 60,
+                                    millis // 1000 % 60,
+                                    millis % 1000)
+
+
+def sample_windows(timeseq, duration, count, length):
+    """
+    Return the time segments of 'count' windows of 'length'
+    seconds evenly spaced on the file duration (or on the time
+    segment 'timeseq', if any), e.g.
+    sample_windows('', 3600, 3, 30)
+    return ['-ss 00:00:00.000 -t 00:00:30.000',
+            '-ss 00:29:45.000 -t 00:00:30.000',
+            '-ss 00:59:30.000 -t 00:00:30.000']
+    Return None if the windows would cover the whole duration,
+    i.e. it is not worth sampling.
+    """
+    start, span = 0.0, duration
+    found = re.search(r'-ss\s+(\S+)', timeseq or '')
+    if found:
+        start = (ProgressParser.timestamp(found.group(1)) or 0) / 1000000
+        span = duration - start
+    segment = VolumeDetectThread.segment(timeseq)
+    if segment:
+        span = min(span, segment / 1000000)
+    if count < 2 or span <= count * length:
+        return None
+    step = (span - length) / (count - 1)
+    return ['-ss %s -t %s' % (clock(start + n * step), clock(length))
+            for n in range(count)]
+
+
+def coverage(windows):
+    """
+    Return the fraction of the sampled span analyzed by the
+    given windows of sample_windows (evenly spaced, from the
+    start to the end of the span).
+    """
+    starts = [ProgressParser.timestamp(re.search(r'-ss\s+(\S+)',
+                                                 x).group(1))
+              for x in windows]
+    length = VolumeDetectThread.segment(windows[0])
+    span = max(starts) - min(starts) + length
+    return min(1.0, length * len(windows) / span)
+
+
+def energy_mean(levels):
+    """
+    Return the mean power, in dB, of the given levels in dB
+    (-inf if there are not finite levels)
+    """
+    finite = [x for x in levels if math.isfinite(x)]
+    if not finite:
+        return float('-inf')
+    return 10 * math.log10(sum([10 ** (x / 10) for x in finite]) /
+                           len(finite))
+
+
+def combine_samples(records, coverage):
+    """
+    Estimate the measurement record of a whole file from the
+    records of its sampled windows (see sample_windows); the
+    windows without audio data (None) are ignored. The mean
+    volume and the integrated loudness are the mean power of
+    the windows, the max volume and the true peak the highest
+    ones (so they are lower bounds of the real values). The
+    'sampled' item has the number of windows, the 'coverage'
+    (analyzed fraction of the duration) and the 95% confidence
+    bound in dB of the mean volume, e.g.
+
+        {'max_volume': '-0.5', 'mean_volume': '-20.1',
+         'ebur128': {'I': '-23.0', 'true_peak': '-0.4'},
+         'astats': {}, 'loudnorm': None,
+         'sampled': {'windows': 12, 'coverage': '0.100',
+                     'confidence': '0.8'}}
+
+    Return None if no window has audio data. There are not
+    loudnorm measurements, the EBU mode needs a full analysis,
+    and the max volume must not be used for the PEAK mode: the
+    gain would clip the louder peaks out of the windows.
+    """
+    records = [x for x in records if x]
+    if not records:
+        return None
+    means = [float(x['mean_volume']) for x in records]
+    finite = [x for x in means if math.isfinite(x)]
+    if len(finite) > 1:
+        # finite population correction: the windows are a sample
+        # without replacement of the whole duration
+        error = (1.96 * statistics.stdev(finite) / math.sqrt(len(finite)) *
+                 math.sqrt(max(0.0, 1 - coverage)))
+    else:
+        error = float('inf')
+    ebur128 = {}
+    loudness = [float(x['ebur128']['I']) for x in records
+                if 'I' in x.get('ebur128', {})]
+    if loudness:
+        ebur128['I'] = '%.1f' % energy_mean(loudness)
+    peaks = [float(x['ebur128']['true_peak']) for x in records
+             if 'true_peak' in x.get('ebur128', {})]
+    if peaks:
+        ebur128['true_peak'] = '%.1f' % max(peaks)
+
+    return {'max_volume': '%.1f' % max([float(x['max_volume'])
+                                        for x in records]),
+            'mean_volume': '%.1f' % energy_mean(means),
+            'ebur128': ebur128,
+            'astats': {},
+            'loudnorm': None,
+            'sampled': {'windows': len(records),
+                        'coverage': '%.3f' % coverage,
+                        'confidence': '%.1f' % error,
+                        },
+            }
 
 
 class VolumeDetectThread(Thread):
     """
-    This class represents a separate subprocess thread to get
-    audio volume peak level when required for audio normalization
+    This class represents a separate thread to get the audio
+    volume peak level when required for audio normalization
     process.
 
+    Every file is decoded once for all the normalization modes:
+    its audio goes through the volumedetect, ebur128 (with true
+    peak), astats and loudnorm (measure only) filters at the same
+    time, and the results are a measurement record of each file
+    (see parse_analysis), so that the PEAK, RMS and EBU modes can
+    be applied later without decoding again.
+
+    The queued files are analyzed by a bounded pool of worker
+    threads, each one with its own FFmpeg process; the results
+    are kept in the same order of the queue. On a sampled
+    analysis (see the 'windows' argument) only a few windows of
+    each file are decoded, in parallel too, and the record of
+    the file is estimated by combine_samples. On a PCM analysis
+    (see the 'pcm' argument, it needs NumPy) the decoded samples
+    are read by a PCMRunner instead of the FFmpeg filters, and
+    the PCMStats of each file are kept on the `stats` list. The caller polls
+    the `progress` method to show the per-file progress and can
+    stop the analysis by the `cancel` method.
+
     NOTE: all error handling (including verification of the
     existence of files) is entrusted to ffmpeg, except for the
     lack of ffmpeg of course.
 
     """
-    def __init__(self, timeseq, filelist, audiomap, logdir, ffmpeg_url):
+    LOGNAME = 'volumedected.log'
+    # NOTE these filters do not change the audio, so they can be
+    # chained instead of splitting the audio; loudnorm does it and
+    # then must be the last one.
+    FILTERS = ('volumedetect,ebur128=peak=true:framelog=verbose,'
+               'astats,loudnorm=print_format=json')
+    # the sampled windows do not need the loudnorm and astats values
+    # (see combine_samples), loudnorm is the most expensive one
+    WINDOW_FILTERS = 'volumedetect,ebur128=peak=true:framelog=verbose'
+    # the loudnorm defaults: the target_offset of the measurements
+    # is valid for an EBU normalization with these targets only
+    TARGETS = loudnorm_targets(FILTERS)
+    SAMPLES = 12  # windows of a sampled analysis
+    WINDOW = 30  # seconds of each window
+
+    def __init__(self, timeseq, filelist, audiomap, logdir, ffmpeg_url,
+                 workers=None, windows=None, pcm=None):
         """
         Replace /dev/null with NUL on Windows.
 
@@ -55,17 +336,44 @@ class VolumeDetectThread(Thread):
                    parameters and the self.status of the output error,
                    in the form:
                    ([[maxvol, medvol], [etc,etc]], None or "str errors")
+                   with an item for each file, None for the files
+                   without audio volume data.
+        self.results: the measurement record of each file of the
+                      list, None for the files without audio volume
+                      data (see parse_analysis).
+        workers: max concurrent FFmpeg processes, if None the
+                 number of cpus (no more than the queued files).
+        windows: None or a list with the time segments to sample
+                 for each file (None for a full analysis of the
+                 file), see sample_windows.
+        pcm: None or a list with a tuple (channels, duration in
+             seconds) of the audio of each file, to analyze the
+             PCM samples (see pcm_analysis).
         """
         self.filelist = filelist
         self.time_seq = timeseq
         self.audiomap = audiomap
-        logdir = logdir
+        self.logdir = logdir
         self.ffmpeg_url = ffmpeg_url
         self.status = None
         self.data = None
+        self.results = []  # measurement record or None of each file
+        self.pcm = pcm
+        self.stats = [None] * len(filelist)  # PCMStats of each file
         self.nul = 'NUL' if platform.system() == 'Windows' else '/dev/null'
-        self.logf = os.path.join(logdir, 'volumedected.log')
-        write_log('volumedected.log', logdir)
+        self.windows = windows or [None] * len(filelist)
+        self.tasks = []  # [(file index, filename, time segment), ...]
+        for index, files in enumerate(filelist):
+            for timeseq in self.windows[index] or [self.time_seq]:
+                self.tasks.append((index, files, timeseq))
+        self.workers = workers or pool_size(0, '', len(self.tasks))
+        self.lock = Lock()
+        self.cancelled = Event()
+        self.failed = Event()  # the pending files are skipped on errors
+        self.runners = set()  # the running FFmpegRunner objects
+        self.fractions = [0.0] * len(self.tasks)  # progress of each task
+        self.current = ''  # the last started file
+        write_log(VolumeDetectThread.LOGNAME, logdir)
         # set initial file LOG
 
         Thread.__init__(self)
@@ -77,78 +385,218 @@ class VolumeDetectThread(Thread):
         """
         Audio volume data is getted by the thread's caller using
         the thread.data method (see IO_tools).
-        NOTE: wx.callafter(pub...) do not send data to pop-up
-              dialog, but a empty string that is useful to get
-              the end of the process to close of the pop-up.
-        """
-        volume = list()
-
-        for files in self.filelist:
-            cmd = ('{0} {1} -i "{2}" -hide_banner {3} -af volumedetect '
-                   '-vn -sn -dn -f null {4}').format(self.ffmpeg_url,
-                                                     self.time_seq,
-                                                     files,
-                                                     self.audiomap,
-                                                     self.nul)
-            self.logWrite(cmd)
-
-            if not platform.system() == 'Windows':
-                cmd = shlex.split(cmd)
-                info = None
-            else:  # Hide subprocess window on MS Windows
-                info = subprocess.STARTUPINFO()
-                info.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            try:
-                p = subprocess.Popen(cmd,
-                                     stdout=subprocess.PIPE,
-                                     stderr=subprocess.STDOUT,
-                                     universal_newlines=True,
-                                     startupinfo=info,
-                                     )
-                output = p.communicate()
-
-            except (OSError, FileNotFoundError) as e:  # ffmpeg do not exist
-                self.status = e
-                break
-
-            else:
-                if p.returncode:  # if error occurred
-                    self.status = output[0]
-                    break
+        """
+        self.results = [None] * len(self.windows)
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                results = list(pool.map(self.task,
+                                        range(len(self.tasks)),
+                                        [x[1] for x in self.tasks],
+                                        [x[2] for x in self.tasks]))
+            for vol, err in results:
+                if err and not self.status:
+                    self.status = err  # the first error of the queue
+            records = []
+            for index, windows in enumerate(self.windows):
+                found = [rec for task, (rec, err) in zip(self.tasks, results)
+                         if task[0] == index]
+                if windows:
+                    records.append(combine_samples(found, coverage(windows)))
                 else:
-                    raw_list = output[0].split()  # splitta tutti gli spazi
-                    if 'mean_volume:' in raw_list:
-                        mean_volume = raw_list.index("mean_volume:")
-                        # mean_volume is indx integear
-                        medvol = "%s dB" % raw_list[mean_volume + 1]
-                        max_volume = raw_list.index("max_volume:")
-                        # max_volume is indx integear
-                        maxvol = "%s dB" % raw_list[max_volume + 1]
-                        volume.append([maxvol, medvol])
-
-        self.data = (volume, self.status)
-
-        if self.status:
-            self.logError()
-
-        wx.CallAfter(pub.sendMessage,
-                     "RESULT_EVT",
-                     status=''
-                     )
+                    records.append(found[0])
+            self.results = records
+
+        except Exception as err:  # the caller always gets the data
+            self.status = self.status or str(err)
+
+        finally:
+            volume = [volume_pair(rec) if rec else None
+                      for rec in self.results]
+            self.data = (volume, self.status)
+
+            if self.status:
+                self.logError()
+            log_writer(VolumeDetectThread.LOGNAME, self.logdir).flush()
+    # ----------------------------------------------------------------#
+
+    def task(self, index, files, timeseq):
+        """
+        Run `detect` on a task, return (None, error message) if
+        it raises: a file with an unexpected output does not stop
+        the analysis of the others.
+        """
+        try:
+            return self.detect(index, files, timeseq)
+        except Exception as err:
+            return None, '%s: %s' % (files, err)
+    # ----------------------------------------------------------------#
+
+    def detect(self, index, files, timeseq):
+        """
+        Analyze a task (a queued file or one of its windows) on a
+        worker of the pool, return (measurement record or None,
+        error or None)
+        """
+        if self.cancelled.is_set() or self.failed.is_set():
+            return None, None
+        if self.pcm:
+            return self.pcm_detect(index, files, timeseq)
+
+        if self.windows[self.tasks[index][0]]:
+            filters = VolumeDetectThread.WINDOW_FILTERS
+        else:
+            filters = VolumeDetectThread.FILTERS
+        args = ('{0} -i "{1}" -hide_banner {2} -af {3} '
+                '-vn -sn -dn -f null {4}').format(timeseq,
+                                                  files,
+                                                  self.audiomap,
+                                                  filters,
+                                                  self.nul)
+        lines = []
+        duration = VolumeDetectThread.segment(timeseq)
+
+        def on_output(line):
+            nonlocal duration
+            lines.append(line)
+            if duration is None:
+                found = re.search(r'Duration: (\d+:\d+:\d+\.?\d*)', line)
+                if found:
+                    duration = ProgressParser.timestamp(found.group(1))
+
+        def on_progress(progress):
+            if duration and progress.out_time_us is not None:
+                self.fractions[index] = min(1.0,
+                                            progress.out_time_us / duration)
+
+        runner = FFmpegRunner(self.ffmpeg_url, args,
+                              on_progress=on_progress,
+                              on_output=on_output)
+        self.logWrite(runner.cmd)
+        with self.lock:
+            if self.cancelled.is_set():
+                return None, None
+            self.runners.add(runner)
+            self.current = files
+        try:
+            status = runner.run()
+
+        except (OSError, FileNotFoundError) as e:  # ffmpeg do not exist
+            self.failed.set()
+            return None, e
+
+        finally:
+            with self.lock:
+                self.runners.discard(runner)
+
+        self.fractions[index] = 1.0
+        if runner.stopped:
+            return None, None
+        if status:  # if error occurred
+            self.failed.set()
+            return None, ''.join(lines)
+        return parse_analysis(''.join(lines)), None
+    # ----------------------------------------------------------------#
+
+    def pcm_detect(self, index, files, timeseq):
+        """
+        Like `detect` but with the PCM samples analysis
+        """
+        owner = self.tasks[index][0]
+        channels, duration = self.pcm[owner]
+        segment = VolumeDetectThread.segment(timeseq)
+        if segment:
+            duration = segment / 1000000
+
+        def on_progress(seconds):
+            if duration:
+                self.fractions[index] = min(1.0, seconds / duration)
+
+        runner = PCMRunner(self.ffmpeg_url,
+                           '%s -i "%s" %s' % (timeseq, files, self.audiomap),
+                           channels or 2,
+                           on_progress=on_progress)
+        self.logWrite(runner.cmd)
+        with self.lock:
+            if self.cancelled.is_set():
+                return None, None
+            self.runners.add(runner)
+            self.current = files
+        try:
+            status = runner.run()
+
+        except (OSError, FileNotFoundError) as e:  # ffmpeg do not exist
+            self.failed.set()
+            return None, e
+
+        finally:
+            with self.lock:
+                self.runners.discard(runner)
+
+        self.fractions[index] = 1.0
+        if runner.stopped:
+            return None, None
+        if status:  # if error occurred
+            self.failed.set()
+            return None, runner.error
+        if not runner.stats.power.size:
+            return None, None  # no audio samples
+        self.stats[owner] = runner.stats
+        return runner.stats.record(), None
+    # ----------------------------------------------------------------#
+
+    @staticmethod
+    def segment(timeseq):
+        """
+        Return the microseconds of the -t option of the time
+        segment or None if not set or not valid.
+        """
+        found = re.search(r'-t\s+(\S+)', timeseq or '')
+        if not found:
+            return None
+        duration = ProgressParser.timestamp(found.group(1))
+        return duration if duration else None
+    # ----------------------------------------------------------------#
+
+    def progress(self):
+        """
+        Return (done, fraction, current) where done is the number
+        of the analyzed files, fraction the overall progress from
+        0.0 to 1.0 and current the last started file.
+        """
+        if not self.fractions:
+            return 0, 1.0, ''
+        done = len(self.filelist) - len(set([task[0] for task, x in
+                                              zip(self.tasks, self.fractions)
+                                              if x < 1.0]))
+        return (done,
+                sum(self.fractions) / len(self.fractions),
+                self.current)
+    # ----------------------------------------------------------------#
+
+    def cancel(self):
+        """
+        Stop the analysis: the running FFmpeg processes are
+        terminated and the pending files are not analyzed.
+        """
+        with self.lock:
+            self.cancelled.set()
+            runners = list(self.runners)
+        for runner in runners:
+            runner.stop()
     # ----------------------------------------------------------------#
 
     def logWrite(self, cmd):
         """
         write ffmpeg command log
         """
-        with open(self.logf, "a") as log:
-            log.write("%s\n" % (cmd))
+        log_writer(VolumeDetectThread.LOGNAME,
+                   self.logdir).write("%s\n" % (cmd))
     # ----------------------------------------------------------------#
 
     def logError(self):
         """
         write ffmpeg volumedected errors
         """
-        with open(self.logf, "a") as logerr:
-            logerr.write("\n[FFMPEG] volumedetect "
-                         "ERRORS:\n%s\n" % (self.status))
+        log_writer(VolumeDetectThread.LOGNAME,
+                   self.logdir).write("\n[FFMPEG] volumedetect "
+                                      "ERRORS:\n%s\n" % (self.status))
@@ -34,6 +34,7 @@ import sys
 from threading import Thread
 import time
 from pubsub import pub
+from videomass3.vdms_io.log_writer import log_writer
 
 
 def logWrite(cmd, sterr, logname, logdir):
@@ -46,8 +47,7 @@ def logWrite(cmd, sterr, logname, logdir):
     else:
         apnd = "%s\n\n" % (cmd)
 
-    with open(os.path.join(logdir, logname), "a") as log:
-        log.write(apnd)
+    log_writer(logname, logdir).write(apnd)
 
 
 class Ydl_DL_Exec(Thread):
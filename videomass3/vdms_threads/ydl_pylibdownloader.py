@@ -30,6 +30,7 @@ import itertools
 from threading import Thread
 import time
 from pubsub import pub
+from videomass3.vdms_io.log_writer import log_writer
 try:
     import youtube_dl
 except (ModuleNotFoundError, ImportError) as nomodule:
@@ -46,8 +47,7 @@ def logWrite(cmd, sterr, logname, logdir):
     else:
         apnd = "%s\n\n" % (cmd)
 
-    with open(os.path.join(logdir, logname), "a") as log:
-        log.write(apnd)
+    log_writer(logname, logdir).write(apnd)
 
 
 class MyLogger(object):
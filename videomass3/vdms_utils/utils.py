@@ -28,6 +28,8 @@ import shutil
 import os
 import glob
 import math
+import json
+import heapq
 
 
 def format_bytes(n):
@@ -100,6 +102,306 @@ def time_human(seconds):
 # ------------------------------------------------------------------------
 
 
+def pool_size(jobs, threads, items, cpus=None):
+    """
+    Returns the number of FFmpeg processes to run at the same time.
+    'jobs' is the "max concurrent jobs" setting, 'threads' is the
+    FFmpeg -threads option string (e.g. '-threads 4') and 'items' is
+    the number of queued files. If the -threads option is not 0
+    (auto), jobs * threads will not exceed the available cpus, e.g.
+    pool_size('8', '-threads 4', 20, cpus=16)
+    return int(4)
+    If 'jobs' is 0 (automatic) the available cpus are the limit.
+    """
+    cpus = cpus if cpus else (os.cpu_count() or 1)
+    try:
+        size = int(jobs)
+    except (TypeError, ValueError):
+        size = 1
+    if size == 0:
+        size = cpus
+    try:
+        nthreads = int(str(threads).split()[-1])
+    except (IndexError, ValueError):
+        nthreads = 0
+    if nthreads > 0:
+        size = min(size, cpus // nthreads)
+
+    return max(1, min(size, items))
+# ------------------------------------------------------------------------
+
+
+def timeseq_range(timeseq):
+    """
+    Given a time sequence string, e.g. '-ss 00:01:00 -t 00:02:30',
+    return a tuple (start, length) in seconds. If there is not a
+    time sequence, return (0, None) object
+    """
+    if not timeseq:
+        return 0, None
+
+    opt = timeseq.split()
+    start = time_seconds(opt[opt.index('-ss') + 1])
+    length = time_seconds(opt[opt.index('-t') + 1])
+
+    return start, length
+# ------------------------------------------------------------------------
+
+
+def segment_workers(threads, cpus=None):
+    """
+    Return the number of FFmpeg processes encoding the segments
+    of a file at the same time, by the available cpus and the
+    FFmpeg -threads option string (e.g. '-threads 4'), not by the
+    "max concurrent jobs" setting of the batch: cpus // threads,
+    or cpus // 4 if the threads are 0 (auto), at least 2, e.g.
+    segment_workers('-threads 4', cpus=16)
+    return int(4)
+    """
+    cpus = cpus if cpus else (os.cpu_count() or 1)
+    try:
+        nthreads = int(str(threads).split()[-1])
+    except (IndexError, ValueError):
+        nthreads = 0
+
+    return max(2, cpus // (nthreads if nthreads > 0 else 4))
+# ------------------------------------------------------------------------
+
+
+def segment_ranges(keyframes, start, end, chunks, minlen=30.0, offset=0.0):
+    """
+    Split the time range from start to end (seconds) in about
+    'chunks' segments cut on the given keyframes timestamps, each
+    at least 'minlen' seconds long, e.g.
+    segment_ranges([0.0, 50.0, 100.0, 150.0], 0, 200, 2)
+    It return a list of tuples [(start, length), ...] as
+    [(0, 100.0), (100.0, 100.0)]
+    The keyframes are timestamps of the stream, 'offset' is the
+    start time of the container (e.g. 1.4 on MPEG-TS): the range
+    and the segments are relative to it, as the -ss input option.
+    """
+    step = max((end - start) / max(chunks, 1), minlen)
+    cuts = [start]
+    target = start + step
+    for key in sorted([x - offset for x in keyframes]):
+        if key > end - minlen:
+            break
+        if key >= target and key - cuts[-1] >= minlen:
+            cuts.append(key)
+            target = key + step
+    cuts.append(end)
+
+    return [(a, b - a) for a, b in zip(cuts, cuts[1:])]
+# ------------------------------------------------------------------------
+
+
+def passlog_option(command, logfile):
+    """
+    Add the -passlogfile option to the given two-pass command
+    string. libx265 does not use it: its statistics file
+    (x265_2pass.log) is written on the working directory of the
+    process instead, so the command is returned unchanged, e.g.
+    passlog_option('-c:v libvpx-vp9 -pass 1', '/tmp/job/passlog')
+    return '-c:v libvpx-vp9 -pass 1 -passlogfile "/tmp/job/passlog"'
+    """
+    if '-x265-params' in command.split():
+        return command
+
+    return '%s -passlogfile "%s"' % (command, logfile)
+# ------------------------------------------------------------------------
+
+
+def loglevel_info(options):
+    """
+    Return the given FFmpeg options string with its -loglevel
+    option raised to 'info' if it is a lower level, so that the
+    filters printing at the info level (e.g. volumedetect) can be
+    read; the other options and the higher levels are kept, e.g.
+    loglevel_info('-loglevel warning -stats -hide_banner')
+    return '-loglevel info -stats -hide_banner'
+    """
+    levels = ('quiet', 'panic', 'fatal', 'error', 'warning')
+    args = options.split()
+    for index, arg in enumerate(args[:-1]):
+        if arg in ('-loglevel', '-v'):
+            flags, sep, level = args[index + 1].rpartition('+')
+            if level in levels:
+                args[index + 1] = '%s%sinfo' % (flags, sep)
+    return ' '.join(args)
+# ------------------------------------------------------------------------
+
+
+def loudnorm_json(output):
+    """
+    Given the FFmpeg output of a loudnorm filter with the option
+    print_format=json, return the measured statistics as dict,
+    e.g. {'input_i': '-27.61', 'input_tp': '-4.47', ...}
+    If there are not statistics return None object
+    """
+    start, end = output.rfind('{'), output.rfind('}')
+    if start == -1 or end < start:
+        return None
+    try:
+        data = json.loads(output[start:end + 1])
+    except ValueError:
+        return None
+
+    return data if 'input_i' in data else None
+# ------------------------------------------------------------------------
+
+
+def loudnorm_targets(command):
+    """
+    Return the I, TP and LRA targets of the loudnorm filter of the
+    given command string as a dict of floats, the loudnorm defaults
+    for the unset ones, e.g.
+    loudnorm_targets('-af loudnorm=I=-16:TP=-1.5:print_format=json')
+    return {'I': -16.0, 'TP': -1.5, 'LRA': 7.0}
+    """
+    targets = {'I': -24.0, 'TP': -2.0, 'LRA': 7.0}
+    for arg in command.split():
+        if arg.startswith('loudnorm='):
+            for opt in arg[len('loudnorm='):].split(':'):
+                key, sep, value = opt.partition('=')
+                if key in targets and sep:
+                    try:
+                        targets[key] = float(value)
+                    except ValueError:
+                        pass
+    return targets
+# ------------------------------------------------------------------------
+
+
+def job_order(durations, sizes, policy):
+    """
+    Return the indexes of the queued files in the order of the given
+    policy: 'longest' (longest first, it minimizes the total time of
+    a batch on a parallel pool), 'shortest' (shortest first, it gives
+    the first results sooner) or 'drop' (drop order). The duration
+    is compared first, then the size of the files, e.g.
+    job_order([60, 30, 90], [0, 0, 0], 'longest')
+    return [2, 0, 1]
+    """
+    indexes = list(range(len(durations)))
+    if policy not in ('longest', 'shortest'):
+        return indexes
+
+    def key(i):
+        return (durations[i] or 0, sizes[i] if i < len(sizes) else 0)
+
+    return sorted(indexes, key=key, reverse=policy == 'longest')
+# ------------------------------------------------------------------------
+
+
+def batch_estimate(costs, workers):
+    """
+    Simulate a batch on a pool of 'workers', with the jobs started
+    in the given order and each one taking the given cost (seconds).
+    Return a tuple (finish, first, mean) with the time when the
+    batch is finished, when the first job is done and the mean
+    completion time of the jobs, e.g.
+    batch_estimate([90, 60, 30], 2)
+    return (90, 60, 80.0)
+    """
+    if not costs:
+        return 0, 0, 0
+    pool = [0] * max(1, workers)  # time when each worker is free
+    ends = []
+    for cost in costs:
+        start = heapq.heappop(pool)
+        ends.append(start + cost)
+        heapq.heappush(pool, start + cost)
+
+    return max(ends), min(ends), sum(ends) / len(ends)
+# ------------------------------------------------------------------------
+
+
+def select_jobs(varargs, duration, indexes):
+    """
+    Return the given varargs of a batch and its duration list with
+    the files at the given indexes only, in the same order. The
+    lists of files, output dirs and volumes are changed, as well as
+    the files count. Raise ValueError if the volume list has not
+    an item for each file, since the volumes would be applied to
+    the wrong files.
+    """
+    varargs = list(varargs)
+    count = len(varargs[1])
+    if varargs[7] and isinstance(varargs[7], list) and \
+            len(varargs[7]) != count:
+        raise ValueError('%s volumes for %s files' % (len(varargs[7]),
+                                                      count))
+    for n in (1, 3, 7):  # file list, output dirs, volume list
+        if isinstance(varargs[n], list) and len(varargs[n]) == count:
+            varargs[n] = [varargs[n][i] for i in indexes]
+    varargs[9] = len(indexes)  # countmax
+    if len(duration) == count:
+        duration = [duration[i] for i in indexes]
+
+    return varargs, duration
+# ------------------------------------------------------------------------
+
+
+def duplicates(keys):
+    """
+    Return the indexes of the items of the 'keys' list equal to
+    an item at a previous index (None is never a duplicate), e.g.
+    duplicates(['a', None, 'b', 'a', None, 'b'])
+    return [3, 5]
+    """
+    seen, dups = set(), []
+    for index, key in enumerate(keys):
+        if key is None:
+            continue
+        if key in seen:
+            dups.append(index)
+        seen.add(key)
+
+    return dups
+# ------------------------------------------------------------------------
+
+
+def scan_files(top, extensions, skip=None):
+    """
+    Walk lazily the directory tree of 'top' by os.scandir and
+    yield the pathnames of the files with one of the given
+    extensions (a set of lowercase names without dot, e.g.
+    {'mkv', 'mp4'}), sorted by name in each directory. The
+    symbolic links to directories and the unreadable ones are
+    not followed. If 'skip' is a set, the pathnames found in it
+    are not yielded and the yielded ones are added to it, e.g.
+    for f in scan_files('/media/card', {'mov', 'mp4'}):
+        print(f)
+    """
+    dirs = [top]
+    while dirs:
+        try:
+            with os.scandir(dirs.pop()) as entries:
+                entries = sorted(entries, key=lambda x: x.name)
+        except OSError:
+            continue
+        subdirs = []
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                    continue
+                if not entry.is_file():
+                    continue
+            except OSError:
+                continue
+            ext = os.path.splitext(entry.name)[1][1:].lower()
+            if ext not in extensions:
+                continue
+            if skip is not None:
+                if entry.path in skip:
+                    continue
+                skip.add(entry.path)
+            yield entry.path
+        dirs.extend(reversed(subdirs))  # the first one on top
+# ------------------------------------------------------------------------
+
+
 def copy_restore(src, dest):
     """
     Restore file. File name is owner choice and can be an preset